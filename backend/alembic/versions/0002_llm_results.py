@@ -0,0 +1,38 @@
+"""llm_results
+
+Revision ID: 0002_llm_results
+Revises: 0001_init
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_llm_results"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """目的: ワーカー間 single-flight 用のLLM結果受け渡しテーブルを作成する。"""
+    op.create_table(
+        "llm_results",
+        sa.Column("key", sa.String(length=64), primary_key=True, nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """目的: llm_results テーブルを削除する。"""
+    op.drop_table("llm_results")
@@ -0,0 +1,56 @@
+"""analysis_jobs
+
+Revision ID: 0003_analysis_jobs
+Revises: 0002_llm_results
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_analysis_jobs"
+down_revision = "0002_llm_results"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """目的: 非同期の推移分析ジョブ（状態と結果）を保存するテーブルを作成する。"""
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.String(length=36), primary_key=True, nullable=False),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("base_dataset_id", sa.Integer(), nullable=False),
+        sa.Column("target_dataset_id", sa.Integer(), nullable=False),
+        sa.Column("prompt_version", sa.String(length=16), nullable=False),
+        sa.Column("engine", sa.String(length=128), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("result", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("error", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["base_dataset_id"], ["datasets.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["target_dataset_id"], ["datasets.id"], ondelete="CASCADE"),
+    )
+    op.create_index(
+        "ix_analysis_jobs_lookup",
+        "analysis_jobs",
+        ["kind", "base_dataset_id", "target_dataset_id", "prompt_version", "engine"],
+    )
+
+
+def downgrade() -> None:
+    """目的: analysis_jobs テーブルを削除する。"""
+    op.drop_index("ix_analysis_jobs_lookup", table_name="analysis_jobs")
+    op.drop_table("analysis_jobs")
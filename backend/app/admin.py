@@ -0,0 +1,20 @@
+"""
+運用者向け（/admin/*）機能の認可。
+
+- ADMIN_TOKEN が未設定なら管理機能は無効（常に拒否する）
+- リクエストは X-Admin-Token ヘッダでトークンを渡す
+"""
+
+import os
+import secrets
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def admin_token() -> str:
+    return os.getenv("ADMIN_TOKEN", "")
+
+
+def is_admin_token(value: str | None) -> bool:
+    expected = admin_token()
+    return bool(expected) and value is not None and secrets.compare_digest(value, expected)
@@ -1,7 +1,15 @@
+import heapq
 import json
+import math
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
 
-from .llm import LLMClient
+from .llm import DEFAULT_PROMPT_TOKEN_BUDGET, LLMClient, agenerate_text, astream_text, estimate_tokens
+from .llm_metrics import astream_with_labels, llm_call_labels
+from .timing import span
+
+# stats / compare / キーワード・価格帯分析の出力が変わる変更をしたら上げる（データセットGETの ETag に含める）
+ANALYSIS_VERSION = "1"
 
 
 def generate_template_analysis(stats: dict) -> dict:
@@ -53,93 +61,188 @@ def _safe_float(v):
         return None
 
 
-def compress_stats_for_prompt(
-    stats: dict,
-    *,
-    max_columns: int = 30,
-    max_top_values_per_column: int = 3,
-) -> dict:
-    """
-    B-2-2: LLMへ送る入力を最小化する。
-    - 行データは送らず、B-1 stats を必要な要素だけ抽出する
-    - サイズ肥大化しやすい top_values / columns 数を制限する
-    """
-    rows = _safe_int(stats.get("rows"))
-    columns = stats.get("columns") or []
+def _compress_column(c: dict, max_top_values_per_column: int) -> dict:
+    """stats の1列分から、プロンプトに必要な要素だけを取り出す。"""
+    item: dict = {
+        "name": c.get("name"),
+        "kind": c.get("kind"),
+        "present_count": _safe_int(c.get("present_count")),
+        "non_empty_count": _safe_int(c.get("non_empty_count")),
+    }
 
-    # 安定した順序（非空が多い列を優先、同率は名前で固定）
-    def sort_key(c: dict):
-        name = str(c.get("name") or "")
-        non_empty = _safe_int(c.get("non_empty_count"))
-        return (-non_empty, name)
-
-    ordered = sorted([c for c in columns if isinstance(c, dict)], key=sort_key)
-    limited = ordered[: max(0, int(max_columns))]
-
-    out_cols: list[dict] = []
-    for c in limited:
-        item: dict = {
-            "name": c.get("name"),
-            "kind": c.get("kind"),
-            "present_count": _safe_int(c.get("present_count")),
-            "non_empty_count": _safe_int(c.get("non_empty_count")),
+    numeric = c.get("numeric")
+    if isinstance(numeric, dict):
+        item["numeric"] = {
+            "count": _safe_int(numeric.get("count")),
+            "min": _safe_float(numeric.get("min")),
+            "max": _safe_float(numeric.get("max")),
+            "avg": _safe_float(numeric.get("avg")),
         }
+    else:
+        item["numeric"] = None
 
-        numeric = c.get("numeric")
-        if isinstance(numeric, dict):
-            item["numeric"] = {
-                "count": _safe_int(numeric.get("count")),
-                "min": _safe_float(numeric.get("min")),
-                "max": _safe_float(numeric.get("max")),
-                "avg": _safe_float(numeric.get("avg")),
-            }
-        else:
-            item["numeric"] = None
-
-        top_values = c.get("top_values")
-        if isinstance(top_values, list):
-            tv = []
-            for t in top_values[: max(0, int(max_top_values_per_column))]:
-                if not isinstance(t, dict):
-                    continue
-                tv.append({"value": t.get("value"), "count": _safe_int(t.get("count"))})
-            item["top_values"] = tv
-        else:
-            item["top_values"] = None
+    top_values = c.get("top_values")
+    if isinstance(top_values, list):
+        tv = []
+        for t in top_values[: max(0, int(max_top_values_per_column))]:
+            if not isinstance(t, dict):
+                continue
+            tv.append({"value": t.get("value"), "count": _safe_int(t.get("count"))})
+        item["top_values"] = tv
+    else:
+        item["top_values"] = None
+    return item
 
-        out_cols.append(item)
 
-    return {
-        "rows": rows,
-        "columns_count": len(columns),
-        "included_columns_count": len(out_cols),
-        "columns": out_cols,
-    }
+def _prompt_column_sort_key(c: dict):
+    """安定した順序（非空が多い列を優先、同率は名前で固定）"""
+    name = str(c.get("name") or "")
+    non_empty = _safe_int(c.get("non_empty_count"))
+    return (-non_empty, name)
 
 
-def _render_prompt(instructions: str, summary: dict, *, truncated: bool) -> str:
-    summary_json = json.dumps(summary, ensure_ascii=False, sort_keys=True)
-    note = ""
-    if truncated:
-        note = (
-            "\n\n注意: 入力サイズ上限のため、statsの一部（列や頻出値など）を省略しています。\n"
-            "省略により根拠が不足する場合は、断定せず「要確認」としてください。"
-        )
+_TRUNCATED_NOTE = (
+    "\n\n注意: 入力サイズ上限のため、statsの一部（列や頻出値など）を省略しています。\n"
+    "省略により根拠が不足する場合は、断定せず「要確認」としてください。"
+)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _fragment_cost(fragment: str) -> tuple[int, int]:
+    """(推定トークン数, 文字数)"""
+    return estimate_tokens(fragment), len(fragment)
+
+
+class PromptColumn:
+    """
+    プロンプトに載せる1列分の JSON 断片（列ごとに1回だけ直列化・見積もりし、組み立てではそのまま連結する）。
+    - sort_keys では top_values が列の最後のキーになるため、列本体（head）と頻出値の断片に分けて持てる
+    - コストには区切りの ", " を含める（断片ごとの推定値の和は、連結後の推定値以上になる）
+    """
+
+    def __init__(self, value: float, column: dict):
+        self.value = value
+        self.column = column
+        base = {k: v for k, v in column.items() if k != "top_values"}
+        self.head = _dumps(base)[:-1] + ', "top_values": '
+        self.top_values = [_dumps(tv) for tv in column["top_values"] or []]
+        # 頻出値なしの場合の "null}" は、"[]}" 以上のコストになる
+        self.cost = _fragment_cost(self.head + "null}, ")
+        self.top_value_costs = [_fragment_cost(tv + ", ") for tv in self.top_values]
+
+    def render(self, top_values_count: int | None = None) -> str:
+        """top_values_count 件までの頻出値を含めた列の JSON（None なら元のまま、0 なら null）。"""
+        if top_values_count is None:
+            if self.column["top_values"] is None:
+                return self.head + "null}"
+            top_values_count = len(self.top_values)
+        elif top_values_count == 0:
+            return self.head + "null}"
+        return self.head + "[" + ", ".join(self.top_values[:top_values_count]) + "]}"
+
+
+def _render_prompt(instructions: str, stats: dict, columns: list[str], *, truncated: bool) -> str:
+    """列の断片を連結して stats_summary_json を組み立てる（json.dumps(sort_keys=True) と同じ形）。"""
+    summary_json = (
+        '{"columns": ['
+        + ", ".join(columns)
+        + f'], "columns_count": {len(stats.get("columns") or [])}, '
+        + f'"included_columns_count": {len(columns)}, "rows": {_safe_int(stats.get("rows"))}}}'
+    )
+    note = _TRUNCATED_NOTE if truncated else ""
     return f"{instructions}\n\nstats_summary_json:\n{summary_json}{note}\n"
 
 
+def _column_information_value(col: dict, rows: int) -> float:
+    """
+    列の情報価値（大きいほど優先してプロンプトに含める）。
+    - 値が埋まっている割合（0〜1）を基本とし、数値統計がある列は +0.5
+    """
+    non_empty = _safe_int(col.get("non_empty_count"))
+    value = min(1.0, non_empty / rows) if rows > 0 else (1.0 if non_empty > 0 else 0.0)
+    numeric = col.get("numeric")
+    if isinstance(numeric, dict) and _safe_int(numeric.get("count")) > 0:
+        value += 0.5
+    return value
+
+
+def rank_columns_for_prompt(
+    stats: dict,
+    *,
+    max_top_values_per_column: int,
+    max_columns: int | None = None,
+) -> list[PromptColumn]:
+    """
+    列を情報価値の降順に並べ、プロンプト用の断片にして返す（max_columns を指定した場合はその数まで）。
+    列の中身は _compress_column で必要な要素だけに絞ったもの（行データは送らない）。
+    """
+    rows = _safe_int(stats.get("rows"))
+    raw_columns = [c for c in stats.get("columns") or [] if isinstance(c, dict)]
+    keys = ((-_column_information_value(c, rows), i) for i, c in enumerate(raw_columns))
+    ranked = sorted(keys) if max_columns is None else heapq.nsmallest(max(0, int(max_columns)), keys)
+    return [PromptColumn(-neg_value, _compress_column(raw_columns[i], max_top_values_per_column)) for neg_value, i in ranked]
+
+
+def select_stats_within_budget(
+    ranked: list[PromptColumn],
+    *,
+    fixed_cost: tuple[int, int],
+    max_tokens: float,
+    max_chars: float,
+) -> dict[int, int]:
+    """
+    rank_columns_for_prompt の結果から、予算内に収まる列/頻出値を1パスで選ぶ。
+    - 列と頻出値を「情報価値」の降順に並べ、予算に収まるものから順に採用する（貪欲法）
+    - 頻出値の価値 = 列の価値 × その値の出現割合。頻出値は列が採用済みで、上位から連続する場合のみ採用する
+    - fixed_cost: 列以外の部分（指示文・概要・注意書き）の (推定トークン, 文字数)
+    戻り値: 採用した列の index → 含める頻出値の件数
+    """
+    # 候補: (価値の降順, 列index, 頻出値の順（列本体は -1）, 推定トークン, 文字数)
+    candidates: list[tuple[float, int, int, int, int]] = []
+    for ci, col in enumerate(ranked):
+        candidates.append((-col.value, ci, -1, *col.cost))
+        non_empty = max(1, col.column["non_empty_count"])
+        for ti, (tv, cost) in enumerate(zip(col.column["top_values"] or [], col.top_value_costs)):
+            share = min(1.0, tv["count"] / non_empty)
+            candidates.append((-col.value * share, ci, ti, *cost))
+    candidates.sort()
+
+    used_tokens, used_chars = fixed_cost
+    next_top_value: dict[int, int] = {}
+    for _, ci, ti, tokens, chars in candidates:
+        if used_tokens + tokens > max_tokens or used_chars + chars > max_chars:
+            continue
+        if ti == -1:
+            next_top_value[ci] = 0
+        elif next_top_value.get(ci) == ti:
+            next_top_value[ci] = ti + 1
+        else:
+            continue
+        used_tokens += tokens
+        used_chars += chars
+    return next_top_value
+
+
+@span("prompt", "Prompt build")
 def build_prompt_v1(
     stats: dict,
     *,
     max_columns: int = 30,
     max_top_values_per_column: int = 3,
-    max_prompt_chars: int = 9000,
+    max_prompt_tokens: int = DEFAULT_PROMPT_TOKEN_BUDGET,
+    max_prompt_chars: int | None = None,
 ) -> str:
     """
     B-2-2: プロンプト v1（品質より再現性を優先）
     - 出力フォーマットを指示（見出し＋箇条書き）
     - stats入力を必要最小限に圧縮
-    - 入力サイズ上限を超える場合は段階的に省略する
+    - 入力がトークン予算（max_prompt_tokens、任意で文字数上限 max_prompt_chars も）を超える場合は、
+      全列の中から情報価値の低い列/頻出値を省略する（select_stats_within_budget）
+    - max_columns は予算がない場合（max_prompt_tokens <= 0 かつ max_prompt_chars なし）だけの列数の上限
+    - 列の断片は1回ずつ直列化・見積もりし、プロンプトは最後に1回だけ組み立てる
     """
     instructions = (
         "あなたはデータ分析アシスタントです。以下のデータセット統計（JSON）だけを根拠に、"
@@ -161,87 +264,68 @@ def build_prompt_v1(
         "- ...\n"
     )
 
-    # Tier 0: まずは指定上限で圧縮
-    summary0 = compress_stats_for_prompt(
+    max_tokens = max_prompt_tokens if max_prompt_tokens > 0 else math.inf
+    max_chars = max_prompt_chars if max_prompt_chars is not None else math.inf
+    budgeted = max_tokens != math.inf or max_chars != math.inf
+    ranked = rank_columns_for_prompt(
         stats,
-        max_columns=max_columns,
         max_top_values_per_column=max_top_values_per_column,
+        max_columns=None if budgeted else max_columns,
     )
-    prompt0 = _render_prompt(instructions, summary0, truncated=False)
-    if len(prompt0) <= max_prompt_chars:
-        return prompt0
-
-    # Tier 1: top_values を落とす（肥大化しやすい）
-    summary1 = dict(summary0)
-    cols1 = []
-    for c in summary0.get("columns") or []:
-        if not isinstance(c, dict):
-            continue
-        c2 = dict(c)
-        c2["top_values"] = None
-        cols1.append(c2)
-    summary1["columns"] = cols1
-    prompt1 = _render_prompt(instructions, summary1, truncated=True)
-    if len(prompt1) <= max_prompt_chars:
-        return prompt1
-
-    # Tier 2: columns をさらに絞る
-    summary2 = dict(summary1)
-    cols2 = (summary1.get("columns") or [])[:10]
-    summary2["columns"] = cols2
-    summary2["included_columns_count"] = len(cols2)
-    prompt2 = _render_prompt(instructions, summary2, truncated=True)
-    if len(prompt2) <= max_prompt_chars:
-        return prompt2
-
-    # Tier 3: 最低限の概要（列名だけ）
-    columns = stats.get("columns") or []
-    names = []
-    for c in columns:
-        if isinstance(c, dict) and c.get("name"):
-            names.append(str(c.get("name")))
 
-    # 列名は長くなり得るので、まずは一定長で丸めておく（再現性とサイズ制御優先）
-    names = [n[:64] for n in names]
+    def render(selection: dict[int, int | None], *, truncated: bool) -> str:
+        order = sorted(selection, key=lambda ci: _prompt_column_sort_key(ranked[ci].column))
+        return _render_prompt(instructions, stats, [ranked[ci].render(selection[ci]) for ci in order], truncated=truncated)
 
-    # Tier 3 でも max_columns を尊重する（表示する列名の上限）
-    max_names = min(50, max(0, int(max_columns)))
+    # 列以外の部分の見積もり（included_columns_count の桁は、全列数の桁数ぶん多めに見込む）
+    fixed_tokens, fixed_chars = _fragment_cost(_render_prompt(instructions, stats, [], truncated=False))
+    count_digits = len(str(len(stats.get("columns") or [])))
+    fixed_tokens += count_digits
+    fixed_chars += count_digits
+    total_tokens = fixed_tokens + sum(c.cost[0] + sum(t for t, _ in c.top_value_costs) for c in ranked)
+    total_chars = fixed_chars + sum(c.cost[1] + sum(ch for _, ch in c.top_value_costs) for c in ranked)
+    if total_tokens <= max_tokens and total_chars <= max_chars:
+        return render(dict.fromkeys(range(len(ranked))), truncated=False)
+
+    # 省略する場合は注意書きも固定費に含め、残りの予算で列を選ぶ
+    note_tokens, note_chars = _fragment_cost(_TRUNCATED_NOTE)
+    fixed_cost = (fixed_tokens + note_tokens, fixed_chars + note_chars)
+    if fixed_cost[0] > max_tokens or fixed_cost[1] > max_chars:
+        # 指示文だけで予算を超える場合は JSON 自体を省略する（JSONを壊さない）
+        fallback = (
+            f"{instructions}\n\n"
+            "注意: 入力サイズ上限のため、stats_summary_json は省略されました。\n"
+            "統計に基づく推論は行わず、必要な追加情報を列挙してください。\n"
+        )
+        return fallback[:max_prompt_chars] if max_prompt_chars is not None else fallback
+
+    selection = select_stats_within_budget(ranked, fixed_cost=fixed_cost, max_tokens=max_tokens, max_chars=max_chars)
+    return render(selection, truncated=True)
+
+
+def generate_llm_analysis_text(
+    stats: dict, llm: LLMClient, *, max_prompt_tokens: int = DEFAULT_PROMPT_TOKEN_BUDGET
+) -> str:
+    prompt = build_prompt_v1(stats, max_prompt_tokens=max_prompt_tokens)
+    with llm_call_labels("dataset", "v1"), span("llm", "LLM call"):
+        return llm.generate(prompt)
+
+
+async def agenerate_llm_analysis_text(
+    stats: dict, llm: LLMClient, *, max_prompt_tokens: int = DEFAULT_PROMPT_TOKEN_BUDGET
+) -> str:
+    """generate_llm_analysis_text の非同期版。"""
+    prompt = build_prompt_v1(stats, max_prompt_tokens=max_prompt_tokens)
+    with llm_call_labels("dataset", "v1"), span("llm", "LLM call"):
+        return await agenerate_text(llm, prompt)
 
-    summary3 = {
-        "rows": _safe_int(stats.get("rows")),
-        "columns_count": len(columns),
-        "included_columns_count": min(len(names), max_names),
-        "column_names": sorted(names)[:max_names],
-    }
 
-    # それでも上限を超える場合、列名の件数を段階的に減らして必ず収める（JSONは壊さない）
-    while True:
-        prompt3 = _render_prompt(instructions, summary3, truncated=True)
-        if len(prompt3) <= max_prompt_chars:
-            return prompt3
-        cols = summary3.get("column_names") or []
-        if len(cols) <= 1:
-            # instructions が長すぎる場合など、ここまで縮めても入らないケース。
-            # その場合は、列名を落として最小概要のみ返す。
-            summary3["column_names"] = []
-            summary3["included_columns_count"] = 0
-            prompt_min = _render_prompt(instructions, summary3, truncated=True)
-            if len(prompt_min) <= max_prompt_chars:
-                return prompt_min
-            # それでも収まらない場合は JSON 自体を省略し、指示文のみ返す（JSONを壊さない）
-            fallback = (
-                f"{instructions}\n\n"
-                "注意: 入力サイズ上限のため、stats_summary_json は省略されました。\n"
-                "統計に基づく推論は行わず、必要な追加情報を列挙してください。\n"
-            )
-            return fallback[:max_prompt_chars]
-        summary3["column_names"] = cols[: max(1, len(cols) // 2)]
-        summary3["included_columns_count"] = len(summary3["column_names"])
-
-
-def generate_llm_analysis_text(stats: dict, llm: LLMClient) -> str:
-    prompt = build_prompt_v1(stats)
-    return llm.generate(prompt)
+def astream_llm_analysis_text(
+    stats: dict, llm: LLMClient, *, max_prompt_tokens: int = DEFAULT_PROMPT_TOKEN_BUDGET
+) -> AsyncIterator[str]:
+    """generate_llm_analysis_text のストリーミング版（チャンク単位で返す）。"""
+    prompt = build_prompt_v1(stats, max_prompt_tokens=max_prompt_tokens)
+    return astream_with_labels(astream_text(llm, prompt), "dataset", "v1")
 
 
 def build_comparison_prompt_v1(comparison_data: dict) -> str:
@@ -648,12 +732,41 @@ def generate_comparison_analysis_text(
     Returns:
         LLM生成の分析テキスト
     """
+    prompt = build_comparison_prompt(comparison_data, version=version)
+    with llm_call_labels("compare", version), span("llm", "LLM call"):
+        return llm.generate(prompt)
+
+
+async def agenerate_comparison_analysis_text(
+    comparison_data: dict,
+    llm: LLMClient,
+    version: str = "v1"
+) -> str:
+    """generate_comparison_analysis_text の非同期版。"""
+    prompt = build_comparison_prompt(comparison_data, version=version)
+    with llm_call_labels("compare", version), span("llm", "LLM call"):
+        return await agenerate_text(llm, prompt)
+
+
+def astream_comparison_analysis_text(
+    comparison_data: dict,
+    llm: LLMClient,
+    version: str = "v1"
+) -> AsyncIterator[str]:
+    """generate_comparison_analysis_text のストリーミング版（チャンク単位で返す）。"""
+    prompt = build_comparison_prompt(comparison_data, version=version)
+    return astream_with_labels(astream_text(llm, prompt), "compare", version)
+
+
+COMPARE_PROMPT_VERSIONS = ("v1", "v2")
+
+
+@span("prompt", "Prompt build")
+def build_comparison_prompt(comparison_data: dict, version: str = "v1") -> str:
+    """目的: プロンプトバージョン（"v1" or "v2"）に応じて比較分析プロンプトを生成する。"""
     if version == "v2":
-        prompt = build_comparison_prompt_v2(comparison_data)
-    else:
-        prompt = build_comparison_prompt_v1(comparison_data)
-    
-    return llm.generate(prompt)
+        return build_comparison_prompt_v2(comparison_data)
+    return build_comparison_prompt_v1(comparison_data)
 
 
 def calculate_stats_diff(base_stats: dict, target_stats: dict) -> dict:
@@ -661,8 +774,8 @@ def calculate_stats_diff(base_stats: dict, target_stats: dict) -> dict:
     目的: 2つのデータセット統計情報の差分を計算する（E-0-2）。
     
     Args:
-        base_stats: 基準データの統計情報（getDatasetStats の結果）
-        target_stats: 比較対象データの統計情報（getDatasetStats の結果）
+        base_stats: 基準データの統計情報（cachedDatasetStats の結果）
+        target_stats: 比較対象データの統計情報（cachedDatasetStats の結果）
     
     Returns:
         差分情報を含む辞書
@@ -959,6 +1072,7 @@ def extract_keywords_from_titles(
     return keyword_freq
 
 
+@span("keywords", "Keyword analysis")
 def compare_keywords(
     base_rows: list[dict],
     target_rows: list[dict],
@@ -1029,6 +1143,7 @@ def compare_keywords(
     }
 
 
+@span("price", "Price analysis")
 def compare_price_ranges(
     base_rows: list[dict],
     target_rows: list[dict],
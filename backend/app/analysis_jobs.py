@@ -0,0 +1,154 @@
+"""
+非同期の分析ジョブ（202 + ポーリング）の保存と状態遷移。
+
+- 状態: queued → running → succeeded / failed
+- 結果（レスポンスJSON）はDBに保存し、再取得時にLLMを呼び直さない
+- 同じ条件（種類/データセット/プロンプト版/分析エンジン）で実行中または成功済みのジョブがあれば、それを再利用する
+  （データセットは取り込み後に変化しないため、成功済みの結果はそのまま使える）
+  確認と登録は条件ごとの advisory lock（トランザクション終了で解放）の中で行い、同時のPOSTでジョブを重複させない
+- ワーカーが落ちて running のまま残ったジョブは、一定時間（ANALYSIS_JOB_STALE_SECONDS）で failed とみなす
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text, update
+
+from .db import SessionLocal
+from .models import AnalysisJob
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+COMPARE_KIND = "compare_analysis"
+
+
+def job_stale_seconds() -> float:
+    return float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "900"))
+
+
+def serialize_job(job: AnalysisJob) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": {
+            "base": job.base_dataset_id,
+            "target": job.target_dataset_id,
+            "version": job.prompt_version,
+        },
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": job.result,
+        "error": job.error,
+    }
+
+
+def _expire_if_stale(db, job: AnalysisJob) -> bool:
+    """古い queued/running のジョブを failed にする（コミットは呼び出し側で行う）。変更したら True。"""
+    if job.status not in (QUEUED, RUNNING):
+        return False
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=job_stale_seconds())
+    if job.created_at >= stale_before:
+        return False
+    job.status = FAILED
+    job.finished_at = datetime.now(timezone.utc)
+    job.error = {
+        "status": 504,
+        "detail": {
+            "error": {
+                "code": "ANALYSIS_JOB_STALE",
+                "message": "Analysis job did not finish in time (worker may have restarted)",
+                "retryable": True,
+            }
+        },
+    }
+    return True
+
+
+def create_or_reuse_compare_job(base: int, target: int, version: str, engine: str) -> tuple[dict, bool]:
+    """
+    推移分析ジョブを登録する。
+    戻り値: (ジョブ, 新規作成したか)。False の場合は既存ジョブを再利用しており、ワーカーを起動しなくてよい。
+    """
+    db = SessionLocal()
+    try:
+        # 同じ条件の確認〜登録を直列化する（コミットまで保持）
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtextextended(:key, 0))"),
+            {"key": f"{COMPARE_KIND}:{base}:{target}:{version}:{engine}"},
+        )
+        statement = (
+            select(AnalysisJob)
+            .where(
+                AnalysisJob.kind == COMPARE_KIND,
+                AnalysisJob.base_dataset_id == base,
+                AnalysisJob.target_dataset_id == target,
+                AnalysisJob.prompt_version == version,
+                AnalysisJob.engine == engine,
+                AnalysisJob.status.in_((QUEUED, RUNNING, SUCCEEDED)),
+            )
+            .order_by(AnalysisJob.created_at.desc())
+        )
+        for job in db.execute(statement).scalars():
+            _expire_if_stale(db, job)
+            # LLM障害中にテンプレートで代替した結果は、回復後に作り直せるよう再利用しない
+            if job.status == FAILED or (job.result or {}).get("degraded"):
+                continue
+            reused = serialize_job(job)
+            db.commit()
+            return reused, False
+
+        job = AnalysisJob(
+            id=str(uuid.uuid4()),
+            kind=COMPARE_KIND,
+            base_dataset_id=base,
+            target_dataset_id=target,
+            prompt_version=version,
+            engine=engine,
+            status=QUEUED,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return serialize_job(job), True
+    finally:
+        db.close()
+
+
+def load_job(job_id: str) -> dict | None:
+    db = SessionLocal()
+    try:
+        job = db.get(AnalysisJob, job_id)
+        if job is None:
+            return None
+        if _expire_if_stale(db, job):
+            db.commit()
+        return serialize_job(job)
+    finally:
+        db.close()
+
+
+def _update_job(job_id: str, **values) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def mark_job_running(job_id: str) -> None:
+    _update_job(job_id, status=RUNNING, started_at=datetime.now(timezone.utc))
+
+
+def mark_job_succeeded(job_id: str, result: dict) -> None:
+    _update_job(job_id, status=SUCCEEDED, result=result, finished_at=datetime.now(timezone.utc))
+
+
+def mark_job_failed(job_id: str, error: dict) -> None:
+    _update_job(job_id, status=FAILED, error=error, finished_at=datetime.now(timezone.utc))
@@ -0,0 +1,103 @@
+"""
+レスポンス圧縮（Accept-Encoding に応じて br / gzip、HTTP_COMPRESSION_MIN_BYTES 以上の本文だけ）。
+
+- 純粋なASGIミドルウェアとして、本文を1回で送るレスポンス（JSON など）だけを圧縮する
+  ストリーミング（SSE など more_body のあるもの）は溜めると逐次表示にならないため、そのまま流す
+- 対象は JSON とテキスト系（text/event-stream を除く）で、すでに Content-Encoding があるものは触らない
+- 圧縮しうるレスポンスには Vary: Accept-Encoding を付け、プロキシがエンコーディングごとにキャッシュできるようにする
+- 圧縮すると表現が変わるため、強い ETag は弱い ETag（W/"..."）にする（If-None-Match は弱い比較なので 304 はそのまま）
+- 圧縮レベルは応答時間とのバランスで決めた値（benchmarks/bench_response.py で bytes と時間を比べられる）
+"""
+
+import gzip
+import os
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# 同じ q 値ならこの順に選ぶ
+COMPRESSORS = {
+    "br": lambda body: brotli.compress(body, quality=BROTLI_QUALITY),
+    "gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+}
+
+
+def compression_min_bytes() -> int:
+    return int(os.getenv("HTTP_COMPRESSION_MIN_BYTES", "1024"))
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Accept-Encoding（q 値付き）から使うエンコーディングを選ぶ（どれも受け付けなければ None）。"""
+    weights: dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[token] = weight
+
+    best: tuple[str, float] | None = None
+    for encoding in COMPRESSORS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (encoding, weight)
+    return best[0] if best else None
+
+
+def _is_compressible(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if content_type == "text/event-stream":
+        return False
+    return content_type.startswith("text/") or content_type == "application/json" or content_type.endswith("+json")
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        minimum_size = compression_min_bytes()
+        if scope["type"] != "http" or minimum_size <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        pending_start: Message | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                # 最初の本文を見るまで（1回で送るか・大きさ）ヘッダの送信を保留する
+                pending_start = message
+                return
+            if message["type"] == "http.response.body" and pending_start is not None:
+                start, pending_start = pending_start, None
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                body = message.get("body", b"")
+                if _is_compressible(headers):
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding is not None and not message.get("more_body", False) and len(body) >= minimum_size:
+                        body = COMPRESSORS[encoding](body)
+                        headers["content-encoding"] = encoding
+                        headers["content-length"] = str(len(body))
+                        etag = headers.get("etag")
+                        if etag is not None and not etag.startswith("W/"):
+                            headers["etag"] = f"W/{etag}"
+                        message = {**message, "body": body}
+                await send({**start, "headers": headers.raw})
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
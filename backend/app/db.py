@@ -1,7 +1,15 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+from .metrics import registry
+from .slow_queries import slow_query_log
+
 DATABASE_URL = os.environ["DATABASE_URL"]
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
@@ -9,3 +17,80 @@ SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 class Base(DeclarativeBase):
     pass
+
+
+# --- クエリ計測（リクエストごとの件数・DB時間・最も遅い文） ---
+
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("operation",)
+)
+
+
+class QueryStats:
+    """1リクエスト中に実行したSQLの集計（スレッドプールからも記録されるためロックで保護する）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: str | None = None
+        self.closed = False
+
+    def close(self) -> None:
+        """以降の記録を無視する（レスポンス送信後に実行する BackgroundTasks のSQLを数えないため）。"""
+        with self._lock:
+            self.closed = True
+
+    def record(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > self.slowest_seconds:
+                self.slowest_seconds = seconds
+                self.slowest_statement = statement
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("db_query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    """ブロック内（スレッドプールで実行した処理を含む）のSQLを QueryStats に集計する。"""
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:16].split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    operation = _operation(statement)
+    db_query_duration.observe(elapsed, operation)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    slow_query_log.maybe_record(conn.engine, operation, statement, parameters, elapsed, executemany)
+
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(exception_context):
+    # 失敗した文は after_cursor_execute が呼ばれないため、開始時刻だけ取り除く
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
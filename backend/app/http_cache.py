@@ -0,0 +1,37 @@
+"""
+取り込み後に変化しないデータセットの GET（詳細・stats・compare）の HTTP キャッシュ（ETag / Cache-Control / 304）。
+
+- ETag は 種類・ANALYSIS_VERSION・データセットID・取り込み日時 から作る強い ETag
+  （IDの再利用（テストの RESTART IDENTITY 等）で別の内容に同じ ETag が付かないよう、取り込み日時も含める）
+- 集計・抽出ロジックを変えたら analysis.ANALYSIS_VERSION を上げ、以前の ETag を無効にする
+- If-None-Match が一致すれば本文を作らず 304 を返す（データセットの存在確認の1クエリだけで済む）
+- Cache-Control の max-age は DATASET_CACHE_MAX_AGE_SECONDS（0 なら no-cache で毎回 ETag で再検証させる）
+  削除されたデータセットは max-age の間ブラウザ・プロキシに残りうるため、長くしすぎないこと
+"""
+
+import hashlib
+import os
+from datetime import datetime
+
+
+def dataset_cache_max_age_seconds() -> int:
+    return int(os.getenv("DATASET_CACHE_MAX_AGE_SECONDS", "60"))
+
+
+def cache_control() -> str:
+    max_age = dataset_cache_max_age_seconds()
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def make_etag(kind: str, version: str, datasets: list[tuple[int, datetime]]) -> str:
+    """datasets は (dataset_id, created_at) の並び（compare は base, target の順）。"""
+    key = ";".join([kind, version, *(f"{dataset_id}@{created_at.isoformat()}" for dataset_id, created_at in datasets)])
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match（"*" またはカンマ区切りの ETag 一覧）が etag に一致するか（弱い比較）。"""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in (c.removeprefix("W/") for c in candidates)
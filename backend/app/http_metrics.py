@@ -0,0 +1,213 @@
+"""
+HTTPリクエストの計測（ルート別のレイテンシ・ステータス・リクエスト/レスポンスサイズ・処理中の件数・SQL）。
+
+- 純粋なASGIミドルウェアとして実装し、レスポンス本文をバッファしない（SSEのストリーミングを妨げない）
+- ラベルの route はパスのテンプレート（例: /datasets/{dataset_id}/stats）を使い、IDごとに系列が増えないようにする
+  （どのルートにも一致しないパスは "<unmatched>" にまとめる）
+- レイテンシはレスポンス本文を送り終えるまで（ストリーミングは最後のチャンクまで）を計測する
+  （送信後に実行する BackgroundTasks の時間・SQL・区間は含めない）
+- 同期エンドポイントと run_in_threadpool が共有するスレッドプールの使用状況は、/metrics の取得時に読む
+- リクエスト中のSQL（件数・DB時間・最も遅い文）を集計し、Server-Timing ヘッダ・ログ・メトリクスに出す
+  件数が DB_QUERY_WARN_THRESHOLD を超えたリクエストは、N+1 の疑いとして警告ログを出す
+- app.timing.span で計測した処理区間（DB取得・統計・価格帯/キーワード分析・プロンプト生成・LLM呼び出し）も
+  Server-Timing（db と各区間、total）に並べ、区間のあったリクエストは内訳をログに出す
+"""
+
+import logging
+import os
+import time
+from functools import lru_cache
+
+import anyio.to_thread
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .db import QueryStats, track_queries
+from .metrics import registry
+from .timing import SpanTimings, server_timing_entry, track_spans
+
+logger = logging.getLogger("prism.backend.http")
+
+UNMATCHED_ROUTE = "<unmatched>"
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response body is fully sent",
+    ("method", "route"),
+)
+http_request_size = registry.histogram(
+    "http_request_size_bytes", "HTTP request body size", ("method", "route"), buckets=SIZE_BUCKETS
+)
+http_response_size = registry.histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), buckets=SIZE_BUCKETS
+)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed", ("method", "route")
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Total SQL execution time per HTTP request", ("method", "route")
+)
+http_request_db_query_warnings = registry.counter(
+    "http_request_db_query_warnings_total",
+    "HTTP requests whose SQL statement count exceeded DB_QUERY_WARN_THRESHOLD",
+    ("method", "route"),
+)
+threadpool_tokens = registry.gauge("threadpool_tokens_total", "Worker threads available to the event loop")
+threadpool_in_use = registry.gauge("threadpool_tokens_in_use", "Worker threads currently borrowed")
+threadpool_waiting = registry.gauge("threadpool_tasks_waiting", "Tasks waiting for a worker thread")
+threadpool_saturated = registry.counter(
+    "threadpool_saturated_requests_total",
+    "HTTP requests that arrived while every worker thread was in use",
+    ("method", "route"),
+)
+
+
+def update_threadpool_gauges() -> None:
+    """スレッドプール（anyio の既定リミッタ）の使用状況をゲージに反映する（イベントループ上で呼ぶ）。"""
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    threadpool_tokens.set(stats.total_tokens)
+    threadpool_in_use.set(stats.borrowed_tokens)
+    threadpool_waiting.set(stats.tasks_waiting)
+
+
+def query_warn_threshold() -> int:
+    return int(os.getenv("DB_QUERY_WARN_THRESHOLD", "50"))
+
+
+def _server_timing(queries: QueryStats, spans: SpanTimings, total_seconds: float) -> bytes:
+    entries = []
+    if queries.count:
+        entries.append(server_timing_entry("db", queries.total_seconds, f"{queries.count} queries"))
+    for name, entry in spans.items():
+        desc = entry["desc"] or name
+        if entry["count"] > 1:
+            desc += f" x{entry['count']}"
+        entries.append(server_timing_entry(name, entry["seconds"], desc))
+    entries.append(server_timing_entry("total", total_seconds))
+    return ", ".join(entries).encode("latin-1", errors="replace")
+
+
+def _one_line(statement: str | None, limit: int = 200) -> str:
+    return " ".join((statement or "").split())[:limit]
+
+
+def _report_queries(method: str, route: str, stats: QueryStats) -> None:
+    http_request_db_queries.observe(stats.count, method, route)
+    if stats.count == 0:
+        return
+    http_request_db_duration.observe(stats.total_seconds, method, route)
+    summary = (
+        f"{method} {route} - DB: {stats.count} queries, {stats.total_seconds * 1000:.1f}ms "
+        f"(slowest {stats.slowest_seconds * 1000:.1f}ms: {_one_line(stats.slowest_statement)})"
+    )
+    threshold = query_warn_threshold()
+    if threshold > 0 and stats.count > threshold:
+        http_request_db_query_warnings.inc(method, route)
+        logger.warning(f"{summary} - exceeds DB_QUERY_WARN_THRESHOLD={threshold} (possible N+1)")
+    else:
+        logger.info(summary)
+
+
+def _report_spans(method: str, route: str, status: int, spans: SpanTimings, queries: QueryStats, total_seconds: float) -> None:
+    if not spans:
+        return
+    fields = {"total": total_seconds * 1000, "db": queries.total_seconds * 1000}
+    fields.update({name: entry["seconds"] * 1000 for name, entry in spans.items()})
+    logger.info(
+        f"{method} {route} - timings: status={status} " + " ".join(f"{k}_ms={v:.1f}" for k, v in fields.items()),
+        extra={"timings_ms": {k: round(v, 1) for k, v in fields.items()}},
+    )
+
+
+class HttpMetricsMiddleware:
+    def __init__(self, app: ASGIApp, routes: list[BaseRoute]):
+        self.app = app
+        self.routes = routes
+        # パスにIDを含むため、解決結果は件数を制限してキャッシュする
+        self._resolve = lru_cache(maxsize=2048)(self._resolve_route)
+
+    def _resolve_route(self, method: str, path: str, root_path: str) -> str:
+        scope = {"type": "http", "method": method, "path": path, "root_path": root_path}
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or UNMATCHED_ROUTE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._resolve(method, scope["path"], scope.get("root_path", ""))
+        started_at = time.perf_counter()
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        if limiter.borrowed_tokens >= limiter.total_tokens:
+            threadpool_saturated.inc(method, route)
+
+        async def receive_wrapper() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        finished = False
+
+        def finish() -> None:
+            # 最後の本文を送った時点で締める（その後に Starlette が同じ呼び出しの中で実行する
+            # BackgroundTasks の時間とSQLは、このリクエストに数えない）
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            queries.close()
+            spans.close()
+            elapsed = time.perf_counter() - started_at
+            http_in_flight.dec(method, route)
+            http_request_duration.observe(elapsed, method, route)
+            http_requests.inc(method, route, str(status))
+            http_request_size.observe(request_bytes, method, route)
+            http_response_size.observe(response_bytes, method, route)
+            _report_queries(method, route, queries)
+            _report_spans(method, route, status, spans, queries, elapsed)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if queries.count or spans:
+                    timing = _server_timing(queries, spans, time.perf_counter() - started_at)
+                    headers = [*message.get("headers", []), (b"server-timing", timing)]
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        http_in_flight.inc(method, route)
+        with track_queries() as queries, track_spans() as spans:
+            try:
+                await self.app(scope, receive_wrapper, send_wrapper)
+            finally:
+                finish()
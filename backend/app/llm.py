@@ -1,4 +1,12 @@
+import asyncio
+import hashlib
+import inspect
+import json
 import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from typing import Protocol
 
@@ -20,12 +28,15 @@ class LLMError(RuntimeError):
         *,
         code: str | None = None,
         retryable: bool | None = None,
+        retry_after: float | None = None,
     ):
         super().__init__(message)
         if code is not None:
             self.code = code
         if retryable is not None:
             self.retryable = retryable
+        # プロバイダが待機時間を指示した場合（Retry-After 等）の秒数
+        self.retry_after = retry_after
 
 
 class LLMTimeoutError(LLMError):
@@ -43,6 +54,10 @@ class LLMRateLimitError(LLMError):
     retryable = True
 
 
+class LLMLocalRateLimitError(LLMRateLimitError):
+    """クライアント側のレート制限（llm_ratelimit）でプロバイダに送らずに断った場合（プロバイダ障害ではない）。"""
+
+
 class LLMInputTooLargeError(LLMError):
     code = "LLM_INPUT_TOO_LARGE"
     retryable = False
@@ -59,6 +74,165 @@ class LLMClient(Protocol):
     def generate(self, prompt: str) -> str:  # pragma: no cover (実装側で検証する)
         """prompt を入力に、LLMの生成結果テキストを返す。"""
 
+    async def agenerate(self, prompt: str) -> str:  # pragma: no cover (実装側で検証する)
+        """generate の非同期版（イベントループ上で待機し、スレッドを占有しない）。"""
+
+    def astream(self, prompt: str) -> AsyncIterator[str]:  # pragma: no cover (実装側で検証する)
+        """生成結果テキストを、届いた順にチャンク単位で返す。"""
+
+
+def prompt_cache_key(config: "LLMConfig", prompt: str) -> str:
+    """provider/model/prompt から、同一呼び出しを識別するキー（sha256）を作る。"""
+    h = hashlib.sha256()
+    h.update((config.provider or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update((config.model or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    プロンプトのトークン数を概算する（外部トークナイザに依存しない）。
+    - ASCII はおおよそ 4 文字で 1 トークン
+    - 日本語などの非ASCII文字はおおよそ 1 文字 1 トークン
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    other_chars = len(text) - ascii_chars
+    return other_chars + (ascii_chars + 3) // 4
+
+
+# モデルごとのプロンプト入力トークン予算（応答時間とコストを抑えるための上限で、コンテキスト長ではない）
+DEFAULT_PROMPT_TOKEN_BUDGET = 3000
+MODEL_PROMPT_TOKEN_BUDGETS: dict[str, int] = {
+    "gemini-2.0-flash": 4000,
+    "gemini-1.5-flash": 4000,
+    "gemini-1.5-pro": 8000,
+}
+
+
+def prompt_token_budget(config: "LLMConfig") -> int:
+    """
+    プロンプト入力のトークン予算を返す。
+    - LLM_PROMPT_TOKEN_BUDGET が指定されていればそれを使う
+    - 未指定の場合はモデル名（"models/" 接頭辞やバージョン接尾辞は無視）から既定値を引く
+    """
+    if config.prompt_token_budget > 0:
+        return config.prompt_token_budget
+    model = (config.model or "").strip().removeprefix("models/")
+    for name, budget in MODEL_PROMPT_TOKEN_BUDGETS.items():
+        if model == name or model.startswith(f"{name}-"):
+            return budget
+    return DEFAULT_PROMPT_TOKEN_BUDGET
+
+
+async def agenerate_text(llm: LLMClient, prompt: str) -> str:
+    """
+    LLMクライアントから非同期にテキストを得る。
+    - agenerate（コルーチン）を持つ実装はそれを使う
+    - 同期 generate しか持たない実装（テスト用のFake等）はスレッドで実行する
+    """
+    agenerate = getattr(llm, "agenerate", None)
+    if agenerate is not None and inspect.iscoroutinefunction(agenerate):
+        return await agenerate(prompt)
+    return await asyncio.to_thread(llm.generate, prompt)
+
+
+async def astream_text(llm: LLMClient, prompt: str) -> AsyncIterator[str]:
+    """
+    LLMクライアントからテキストをストリーミングで得る。
+    - astream を持たない実装は、生成結果全体を1チャンクとして返す
+    """
+    astream = getattr(llm, "astream", None)
+    if astream is not None and inspect.isasyncgenfunction(astream):
+        async for chunk in astream(prompt):
+            yield chunk
+        return
+    yield await agenerate_text(llm, prompt)
+
+
+# リクエスト全体の締め切り（time.monotonic() の値）。エンドポイントで設定し、各層の待機/タイムアウトの上限にする
+_request_deadline: ContextVar[float | None] = ContextVar("llm_request_deadline", default=None)
+
+
+def deadline_remaining_seconds() -> float | None:
+    """現在のリクエストの締め切りまでの残り秒数（締め切りがなければ None）。"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def attempt_timeout_seconds(timeout_seconds: float) -> float:
+    """1回の呼び出しのタイムアウトを、締め切りまでの残り時間で切り詰める（締め切り超過なら LLMTimeoutError）。"""
+    remaining = deadline_remaining_seconds()
+    if remaining is None:
+        return timeout_seconds
+    if remaining <= 0:
+        raise LLMTimeoutError("LLM request deadline exceeded")
+    return min(timeout_seconds, remaining)
+
+
+@asynccontextmanager
+async def _deadline_scope(deadline: float):
+    current = _request_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _request_deadline.set(deadline)
+    try:
+        async with asyncio.timeout(max(0.0, deadline - time.monotonic())) as scope:
+            yield
+    except TimeoutError as e:
+        if scope.expired():
+            raise LLMTimeoutError("LLM request deadline exceeded") from e
+        raise
+    finally:
+        _request_deadline.reset(token)
+
+
+@asynccontextmanager
+async def llm_deadline(seconds: float | None):
+    """
+    ブロック内のLLM呼び出しに、リクエスト全体の締め切りを設ける（0/None なら何もしない）。
+    - 再試行・ヘッジ・各試行のタイムアウトは、残り時間を超えないように切り詰められる
+    - 締め切りを過ぎた場合は待機中の呼び出しをキャンセルし、LLMTimeoutError を送出する
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    async with _deadline_scope(time.monotonic() + seconds):
+        yield
+
+
+async def astream_within_deadline(chunks: AsyncIterator[str], seconds: float | None) -> AsyncIterator[str]:
+    """
+    ストリーミングの生成全体に締め切りを設ける（llm_deadline のストリーミング版）。
+    - チャンクの受け渡し（yield）中は締め切りを外し、呼び出し側の処理時間で文脈が混ざらないようにする
+    """
+    if not seconds or seconds <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+    deadline = time.monotonic() + seconds
+    iterator = aiter(chunks)
+    try:
+        while True:
+            async with _deadline_scope(deadline):
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
 
 @dataclass(frozen=True)
 class LLMConfig:
@@ -66,6 +240,36 @@ class LLMConfig:
     api_key: str | None
     model: str
     timeout_seconds: float
+    # 応答キャッシュ（0 の場合は無効）
+    cache_ttl_seconds: float = 0.0
+    cache_max_entries: int = 256
+    # retryable な例外の再試行（0 で再試行しない）
+    max_retries: int = 2
+    retry_base_delay_seconds: float = 0.5
+    retry_max_delay_seconds: float = 8.0
+    retry_deadline_seconds: float = 30.0
+    # クライアント側レート制限（0 の場合はその軸を制限しない）
+    rate_limit_rpm: int = 0
+    rate_limit_tpm: int = 0
+    rate_limit_max_wait_seconds: float = 10.0
+    rate_limit_output_tokens: int = 1024
+    rate_limit_state_dir: str = "/tmp"
+    # 同一プロンプトの同時呼び出しの相乗り（shared はPostgres経由でワーカー間も対象にする）
+    single_flight: bool = True
+    single_flight_shared: bool = False
+    single_flight_wait_seconds: float = 60.0
+    single_flight_poll_seconds: float = 0.2
+    # サーキットブレーカー（retryable な失敗が連続 N 回で open。0 で無効）
+    circuit_failure_threshold: int = 5
+    circuit_open_seconds: float = 30.0
+    # プロンプト入力のトークン予算（0 の場合はモデルごとの既定値）
+    prompt_token_budget: int = 0
+    # 分析リクエスト1件あたりのLLM待ちの締め切り（再試行・ヘッジを含む。0 の場合は設けない）
+    request_deadline_seconds: float = 0.0
+    # ヘッジ: 1本目が直近の応答時間の pN を過ぎても返らなければ2本目を投げる（0 の場合は無効）
+    hedge_percentile: float = 0.0
+    hedge_initial_delay_seconds: float = 2.0
+    hedge_min_samples: int = 20
 
     @staticmethod
     def from_env() -> "LLMConfig":
@@ -73,11 +277,53 @@ class LLMConfig:
         api_key = os.getenv("LLM_API_KEY")
         model = os.getenv("LLM_MODEL", "stub").strip()
         timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+        cache_ttl_seconds = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0"))
+        cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+        max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        retry_base_delay_seconds = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+        retry_max_delay_seconds = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "8"))
+        retry_deadline_seconds = float(os.getenv("LLM_RETRY_DEADLINE_SECONDS", "30"))
+        rate_limit_rpm = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+        rate_limit_tpm = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+        rate_limit_max_wait_seconds = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "10"))
+        rate_limit_output_tokens = int(os.getenv("LLM_RATE_LIMIT_OUTPUT_TOKENS", "1024"))
+        rate_limit_state_dir = os.getenv("LLM_RATE_LIMIT_STATE_DIR", "/tmp")
+        single_flight = _env_flag("LLM_SINGLE_FLIGHT", "1")
+        single_flight_shared = _env_flag("LLM_SINGLE_FLIGHT_SHARED", "0")
+        single_flight_wait_seconds = float(os.getenv("LLM_SINGLE_FLIGHT_WAIT_SECONDS", "60"))
+        circuit_failure_threshold = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+        circuit_open_seconds = float(os.getenv("LLM_CIRCUIT_OPEN_SECONDS", "30"))
+        prompt_token_budget = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "0"))
+        request_deadline_seconds = float(os.getenv("LLM_REQUEST_DEADLINE_SECONDS", "0"))
+        hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+        hedge_initial_delay_seconds = float(os.getenv("LLM_HEDGE_INITIAL_DELAY_SECONDS", "2"))
+        hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
         return LLMConfig(
             provider=provider,
             api_key=api_key,
             model=model,
             timeout_seconds=timeout_seconds,
+            cache_ttl_seconds=cache_ttl_seconds,
+            cache_max_entries=cache_max_entries,
+            max_retries=max_retries,
+            retry_base_delay_seconds=retry_base_delay_seconds,
+            retry_max_delay_seconds=retry_max_delay_seconds,
+            retry_deadline_seconds=retry_deadline_seconds,
+            rate_limit_rpm=rate_limit_rpm,
+            rate_limit_tpm=rate_limit_tpm,
+            rate_limit_max_wait_seconds=rate_limit_max_wait_seconds,
+            rate_limit_output_tokens=rate_limit_output_tokens,
+            rate_limit_state_dir=rate_limit_state_dir,
+            single_flight=single_flight,
+            single_flight_shared=single_flight_shared,
+            single_flight_wait_seconds=single_flight_wait_seconds,
+            circuit_failure_threshold=circuit_failure_threshold,
+            circuit_open_seconds=circuit_open_seconds,
+            prompt_token_budget=prompt_token_budget,
+            request_deadline_seconds=request_deadline_seconds,
+            hedge_percentile=hedge_percentile,
+            hedge_initial_delay_seconds=hedge_initial_delay_seconds,
+            hedge_min_samples=hedge_min_samples,
         )
 
 
@@ -92,16 +338,63 @@ class StubLLMClient:
         # 具体的なプロンプト設計は B-2-2 で詰める。
         return "STUB_LLM_RESPONSE"
 
+    async def agenerate(self, prompt: str) -> str:
+        return self.generate(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        yield self.generate(prompt)
+
 
 def build_llm_client(config: LLMConfig) -> LLMClient:
     provider = (config.provider or "").strip().lower()
     if provider in ("stub", "none", "disabled"):
-        return StubLLMClient(config)
+        client: LLMClient = StubLLMClient(config)
+    elif provider in ("gemini", "google_ai_studio", "google-ai-studio"):
+        client = GeminiAiStudioClient(config)
+    else:
+        raise LLMError(f"Unsupported LLM_PROVIDER: {config.provider}")
+
+    # 計測は最も内側に置き、プロバイダへの実際の呼び出し（再試行/ヘッジの各試行）を数える
+    from .llm_metrics import InstrumentedLLMClient
 
-    if provider in ("gemini", "google_ai_studio", "google-ai-studio"):
-        return GeminiAiStudioClient(config)
+    client = InstrumentedLLMClient(client, config)
+
+    # レート制限は再試行より内側に置き、再試行の各試行も枠を消費するようにする
+    if config.rate_limit_rpm > 0 or config.rate_limit_tpm > 0:
+        from .llm_ratelimit import FileTokenBucket, RateLimit, RateLimitedLLMClient, bucket_path
+
+        client = RateLimitedLLMClient(
+            client, FileTokenBucket(bucket_path(config), RateLimit.from_config(config))
+        )
 
-    raise LLMError(f"Unsupported LLM_PROVIDER: {config.provider}")
+    # ヘッジはレート制限の外側（2本目も枠を消費する）、再試行の内側（ヘッジした1組を1回の試行とする）に置く
+    if config.hedge_percentile > 0:
+        from .llm_hedge import HedgedLLMClient
+
+        client = HedgedLLMClient(client, config)
+
+    if config.max_retries > 0:
+        from .llm_retry import RetryingLLMClient, RetryPolicy
+
+        client = RetryingLLMClient(client, RetryPolicy.from_config(config))
+
+    # ブレーカーは再試行の外側に置き、再試行し尽くした論理呼び出し1回を失敗1回として数える
+    if config.circuit_failure_threshold > 0:
+        from .llm_circuit import CircuitBreakerLLMClient, get_circuit_breaker
+
+        client = CircuitBreakerLLMClient(client, get_circuit_breaker(config))
+
+    if config.single_flight:
+        from .singleflight import SingleFlightLLMClient
+
+        client = SingleFlightLLMClient(client, config)
+
+    # キャッシュは最も外側に置き、ヒット時は相乗り/再試行の処理を通らないようにする
+    if config.cache_ttl_seconds > 0:
+        from .llm_cache import CachingLLMClient
+
+        client = CachingLLMClient(client, config)
+    return client
 
 
 class GeminiAiStudioClient:
@@ -121,12 +414,13 @@ class GeminiAiStudioClient:
             "GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com"
         ).rstrip("/")
 
-    def generate(self, prompt: str) -> str:
+    def _build_request(self, method: str, prompt: str) -> tuple[str, dict, dict]:
+        """Gemini API の URL / クエリ / ペイロードを組み立てる（sync/async 共通）。"""
         model = (self.config.model or "").strip() or "gemini-2.0-flash"
         if not model.startswith("models/"):
             model = f"models/{model}"
 
-        url = f"{self.base_url}/v1beta/{model}:generateContent"
+        url = f"{self.base_url}/v1beta/{model}:{method}"
         params = {"key": self.config.api_key}
         payload = {
             "contents": [
@@ -136,43 +430,72 @@ class GeminiAiStudioClient:
                 }
             ]
         }
+        return url, params, payload
 
-        timeout = httpx.Timeout(self.config.timeout_seconds)
-        try:
-            with httpx.Client(timeout=timeout) as client:
-                resp = client.post(url, params=params, json=payload)
-        except httpx.TimeoutException as e:
-            raise LLMTimeoutError("Gemini request timed out") from e
-        except httpx.RequestError as e:
-            # DNS/connection reset etc.
-            raise LLMProviderError(f"Gemini request failed: {type(e).__name__}") from e
+    @staticmethod
+    def _raise_for_status(resp) -> None:
+        """HTTPエラーを B-2-3 の分類例外へマップする。"""
+        if resp.status_code < 400:
+            return
 
-        # エラー時はB-2-3の分類に寄せる
-        if resp.status_code >= 400:
+        msg = None
+        try:
+            j = resp.json()
+            if isinstance(j, dict) and isinstance(j.get("error"), dict):
+                msg = j["error"].get("message")
+        except Exception:
             msg = None
+
+        message = msg or f"Gemini API error (status={resp.status_code})"
+        retry_after = GeminiAiStudioClient._parse_retry_after(resp)
+        if resp.status_code in (401, 403):
+            raise LLMAuthError(message)
+        if resp.status_code == 429:
+            raise LLMRateLimitError(message, retry_after=retry_after)
+        if resp.status_code == 413:
+            raise LLMInputTooLargeError(message)
+        if resp.status_code == 400 and any(
+            k in message.lower()
+            for k in ("too large", "too long", "exceed", "exceeded", "maximum", "limit")
+        ):
+            raise LLMInputTooLargeError(message)
+        if 500 <= resp.status_code <= 599:
+            raise LLMProviderError(message, retry_after=retry_after)
+        raise LLMError(message)
+
+    @staticmethod
+    def _parse_retry_after(resp) -> float | None:
+        """
+        待機時間の指示を秒数で取り出す。
+        - HTTP の Retry-After ヘッダ（秒数）
+        - Gemini のエラー詳細 google.rpc.RetryInfo の retryDelay（例: "7s"）
+        """
+        headers = getattr(resp, "headers", None) or {}
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
             try:
-                j = resp.json()
-                if isinstance(j, dict) and isinstance(j.get("error"), dict):
-                    msg = j["error"].get("message")
-            except Exception:
-                msg = None
-
-            message = msg or f"Gemini API error (status={resp.status_code})"
-            if resp.status_code in (401, 403):
-                raise LLMAuthError(message)
-            if resp.status_code == 429:
-                raise LLMRateLimitError(message)
-            if resp.status_code == 413:
-                raise LLMInputTooLargeError(message)
-            if resp.status_code == 400 and any(
-                k in message.lower()
-                for k in ("too large", "too long", "exceed", "exceeded", "maximum", "limit")
-            ):
-                raise LLMInputTooLargeError(message)
-            if 500 <= resp.status_code <= 599:
-                raise LLMProviderError(message)
-            raise LLMError(message)
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+
+        try:
+            j = resp.json()
+            details = j["error"].get("details") or []
+        except Exception:
+            return None
+        for d in details:
+            if not isinstance(d, dict):
+                continue
+            delay = d.get("retryDelay")
+            if isinstance(delay, str) and delay.endswith("s"):
+                try:
+                    return max(0.0, float(delay[:-1]))
+                except ValueError:
+                    continue
+        return None
 
+    @staticmethod
+    def _parse_response(resp) -> str:
         try:
             data = resp.json()
         except Exception as e:
@@ -197,4 +520,87 @@ class GeminiAiStudioClient:
         except Exception as e:
             raise LLMProviderError("Failed to parse Gemini response") from e
 
+    def generate(self, prompt: str) -> str:
+        url, params, payload = self._build_request("generateContent", prompt)
+
+        timeout = httpx.Timeout(attempt_timeout_seconds(self.config.timeout_seconds))
+        try:
+            with httpx.Client(timeout=timeout) as client:
+                resp = client.post(url, params=params, json=payload)
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError("Gemini request timed out") from e
+        except httpx.RequestError as e:
+            # DNS/connection reset etc.
+            raise LLMProviderError(f"Gemini request failed: {type(e).__name__}") from e
+
+        # エラー時はB-2-3の分類に寄せる
+        self._raise_for_status(resp)
+        return self._parse_response(resp)
+
+    async def agenerate(self, prompt: str) -> str:
+        """generate の非同期版。待ち時間中にワーカースレッドを占有しない。"""
+        url, params, payload = self._build_request("generateContent", prompt)
+
+        timeout = httpx.Timeout(attempt_timeout_seconds(self.config.timeout_seconds))
+        try:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                resp = await client.post(url, params=params, json=payload)
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError("Gemini request timed out") from e
+        except httpx.RequestError as e:
+            raise LLMProviderError(f"Gemini request failed: {type(e).__name__}") from e
 
+        self._raise_for_status(resp)
+        return self._parse_response(resp)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        streamGenerateContent（SSE）で生成途中のテキストを順次返す。
+        - 最初のチャンクが届いた時点で呼び出し元に渡せるため、体感待ち時間を短縮できる
+        """
+        url, params, payload = self._build_request("streamGenerateContent", prompt)
+        params = {**params, "alt": "sse"}
+
+        timeout = httpx.Timeout(attempt_timeout_seconds(self.config.timeout_seconds))
+        emitted = False
+        try:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                async with client.stream("POST", url, params=params, json=payload) as resp:
+                    if resp.status_code >= 400:
+                        await resp.aread()
+                        self._raise_for_status(resp)
+
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if not data:
+                            continue
+                        try:
+                            event = json.loads(data)
+                        except ValueError as e:
+                            raise LLMProviderError("Gemini stream returned non-JSON event") from e
+                        text = self._extract_chunk_text(event)
+                        if text:
+                            emitted = True
+                            yield text
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError("Gemini request timed out") from e
+        except httpx.RequestError as e:
+            raise LLMProviderError(f"Gemini request failed: {type(e).__name__}") from e
+
+        if not emitted:
+            raise LLMProviderError("Gemini API returned empty text")
+
+    @staticmethod
+    def _extract_chunk_text(event: dict) -> str:
+        """ストリームの1イベント（GenerateContentResponse断片）からテキストを取り出す。"""
+        if not isinstance(event, dict):
+            return ""
+        candidates = event.get("candidates") or []
+        if not candidates or not isinstance(candidates[0], dict):
+            return ""
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(
+            p["text"] for p in parts if isinstance(p, dict) and isinstance(p.get("text"), str)
+        )
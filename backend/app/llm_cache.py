@@ -0,0 +1,119 @@
+"""
+LLM応答キャッシュ。
+
+- 同一プロンプト（provider/model込み）の生成結果をプロセス内に一定時間保持する
+- データセットは取り込み後に変化しないため、同じ入力から作られたプロンプトの結果は再利用できる
+- ストリーミング時は、全チャンクを結合した最終テキストをキャッシュに格納する
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Hashable
+from typing import Any
+
+from .llm import LLMClient, LLMConfig, agenerate_text, astream_text, prompt_cache_key
+
+
+class ResponseCache:
+    """TTL付きのLRUキャッシュ（スレッドセーフ）。LLM応答以外（取り込み後に変化しない集計結果など）にも使う。"""
+
+    def __init__(self, *, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# リクエストごとにクライアントを組み立てるため、キャッシュ本体はプロセス内で共有する
+_caches: dict[tuple[float, int], ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(config: LLMConfig) -> ResponseCache:
+    key = (config.cache_ttl_seconds, config.cache_max_entries)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = ResponseCache(
+                ttl_seconds=config.cache_ttl_seconds,
+                max_entries=config.cache_max_entries,
+            )
+            _caches[key] = cache
+        return cache
+
+
+def clear_response_caches() -> None:
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.clear()
+
+
+class CachingLLMClient:
+    """LLMClient をラップし、プロンプト単位で生成結果をキャッシュする。"""
+
+    def __init__(self, inner: LLMClient, config: LLMConfig, cache: ResponseCache | None = None):
+        self.inner = inner
+        self.config = config
+        self.cache = cache if cache is not None else get_response_cache(config)
+
+    def generate(self, prompt: str) -> str:
+        key = prompt_cache_key(self.config, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        text = self.inner.generate(prompt)
+        self.cache.set(key, text)
+        return text
+
+    async def agenerate(self, prompt: str) -> str:
+        key = prompt_cache_key(self.config, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        text = await agenerate_text(self.inner, prompt)
+        self.cache.set(key, text)
+        return text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        key = prompt_cache_key(self.config, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        # 途中で失敗/切断した場合は不完全なテキストになるため、最後まで届いた場合のみ格納する
+        chunks: list[str] = []
+        async for chunk in astream_text(self.inner, prompt):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.set(key, "".join(chunks))
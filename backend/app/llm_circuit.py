@@ -0,0 +1,171 @@
+"""
+LLM呼び出しのサーキットブレーカー。
+
+- retryable な失敗（タイムアウト/429/5xx）が連続して閾値に達したら open にし、
+  一定時間はLLMを呼ばずに LLMCircuitOpenError を即座に返す（呼び出し側はテンプレ分析へ切り替える）
+- open の時間が過ぎたら half-open にし、1件だけ試行（probe）を通して回復を確認する
+  - probe 成功 → closed、probe 失敗 → 再び open
+- 非retryable な例外（認証エラー等）はプロバイダ障害ではないため、回数に数えない
+- クライアント側のレート制限で送らずに断った場合（LLMLocalRateLimitError）はプロバイダの状態が分からないため、
+  成功にも失敗にも数えない
+"""
+
+import threading
+import time
+from collections.abc import AsyncIterator
+
+from .llm import LLMClient, LLMConfig, LLMError, LLMLocalRateLimitError, agenerate_text, astream_text
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMCircuitOpenError(LLMError):
+    code = "LLM_CIRCUIT_OPEN"
+    retryable = True
+
+
+class CircuitBreaker:
+    def __init__(self, *, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """呼び出しを通してよいか判定する。通せない場合は LLMCircuitOpenError を送出する。"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.open_seconds - now
+                if remaining > 0:
+                    raise LLMCircuitOpenError(
+                        "LLM circuit is open; skipping call", retry_after=remaining
+                    )
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            # HALF_OPEN: 同時に通す probe は1件だけ
+            if self.probe_in_flight:
+                raise LLMCircuitOpenError("LLM circuit is half-open; probe in progress")
+            self.probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self, e: LLMError) -> None:
+        with self._lock:
+            if isinstance(e, LLMLocalRateLimitError):
+                self.probe_in_flight = False
+                return
+            if not e.retryable:
+                # プロバイダは応答しているので、probe 中なら回復とみなす
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    self.consecutive_failures = 0
+                self.probe_in_flight = False
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """結果が判定できないまま終わった呼び出し（キャンセル等）の probe 枠を戻す。"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+            }
+
+
+# リクエストごとにクライアントを組み立てるため、ブレーカーの状態は provider/model ごとにプロセス内で共有する
+_breakers: dict[tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(config: LLMConfig) -> CircuitBreaker:
+    key = (config.provider, config.model)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=config.circuit_failure_threshold,
+                open_seconds=config.circuit_open_seconds,
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def circuit_snapshots() -> dict[str, dict]:
+    with _breakers_lock:
+        return {f"{provider}/{model}": b.snapshot() for (provider, model), b in sorted(_breakers.items())}
+
+
+def reset_circuit_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+class CircuitBreakerLLMClient:
+    """LLMClient をラップし、サーキットブレーカーの判定と結果の記録を行う。"""
+
+    def __init__(self, inner: LLMClient, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+
+    def generate(self, prompt: str) -> str:
+        self.breaker.before_call()
+        try:
+            text = self.inner.generate(prompt)
+        except LLMError as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return text
+
+    async def agenerate(self, prompt: str) -> str:
+        self.breaker.before_call()
+        try:
+            text = await agenerate_text(self.inner, prompt)
+        except LLMError as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        self.breaker.before_call()
+        try:
+            async for chunk in astream_text(self.inner, prompt):
+                yield chunk
+        except LLMError as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
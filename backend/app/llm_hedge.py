@@ -0,0 +1,204 @@
+"""
+LLM呼び出しのヘッジ（テールレイテンシ対策）。
+
+- 1本目が直近の応答時間の pN（LLM_HEDGE_PERCENTILE）を過ぎても返らない場合、同じプロンプトで2本目を投げ、
+  先に成功した方を採用する（残りはキャンセルする）
+- 応答時間は provider/model ごと・通常/ストリーミングごとにプロセス内で集計する
+  （ストリーミングは最初のチャンクまでの時間で判定し、最初のチャンクを返した方に以降も従う）
+- サンプルが LLM_HEDGE_MIN_SAMPLES 件に満たないうちは LLM_HEDGE_INITIAL_DELAY_SECONDS 後にヘッジする
+- リクエストの締め切り（llm_deadline）までの残りが遅延の閾値より短い場合は、2本目が間に合わないためヘッジしない
+- 同期 generate はスレッドを余分に占有するためヘッジしない
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+
+from .llm import (
+    LLMClient,
+    LLMConfig,
+    agenerate_text,
+    astream_text,
+    deadline_remaining_seconds,
+)
+
+LATENCY_WINDOW = 256
+
+
+class LatencyTracker:
+    """直近の応答時間（秒）とヘッジの発生状況を保持する。"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=window)
+        self._counts = {"calls": 0, "hedged": 0, "hedge_won": 0}
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self, event: str) -> None:
+        """event: calls（論理呼び出し）/ hedged（2本目を投げた）/ hedge_won（2本目が先着した）"""
+        with self._lock:
+            self._counts[event] += 1
+
+    def percentile(self, p: float, min_samples: int = 1) -> float | None:
+        """最近接順位法のパーセンタイル（サンプルが min_samples 未満なら None）。"""
+        with self._lock:
+            if not self._samples or len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"samples": len(self._samples), **self._counts}
+
+
+# リクエストごとにクライアントを組み立てるため、応答時間の分布は provider/model/種類ごとにプロセス内で共有する
+_trackers: dict[tuple[str, str, str], LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(config: LLMConfig, mode: str) -> LatencyTracker:
+    key = (config.provider, config.model, mode)
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[key] = tracker
+        return tracker
+
+
+def hedge_snapshots() -> dict[str, dict]:
+    with _trackers_lock:
+        return {f"{provider}/{model}:{mode}": t.snapshot() for (provider, model, mode), t in sorted(_trackers.items())}
+
+
+def reset_latency_trackers() -> None:
+    with _trackers_lock:
+        _trackers.clear()
+
+
+def _consume(tasks: list[asyncio.Task]) -> None:
+    """未完了の試行をキャンセルし、完了済みの例外は回収済みにする（未回収の警告を出さない）。"""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+
+class HedgedLLMClient:
+    """LLMClient をラップし、遅い呼び出しに2本目（ヘッジ）を重ねて先着の成功を返す。"""
+
+    def __init__(self, inner: LLMClient, config: LLMConfig):
+        self.inner = inner
+        self.config = config
+
+    def hedge_delay(self, tracker: LatencyTracker) -> float:
+        observed = tracker.percentile(self.config.hedge_percentile, self.config.hedge_min_samples)
+        return observed if observed is not None else self.config.hedge_initial_delay_seconds
+
+    @staticmethod
+    def _can_hedge(delay: float) -> bool:
+        remaining = deadline_remaining_seconds()
+        return remaining is None or remaining > delay
+
+    def generate(self, prompt: str) -> str:
+        return self.inner.generate(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        tracker = get_latency_tracker(self.config, "generate")
+        delay = self.hedge_delay(tracker)
+        tracker.count("calls")
+
+        async def attempt() -> str:
+            started_at = time.monotonic()
+            text = await agenerate_text(self.inner, prompt)
+            tracker.record(time.monotonic() - started_at)
+            return text
+
+        tasks = [asyncio.create_task(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._can_hedge(delay):
+                tracker.count("hedged")
+                tasks.append(asyncio.create_task(attempt()))
+
+            pending = set(tasks)
+            while pending:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for index, task in enumerate(tasks):
+                    if task.done() and task.exception() is None:
+                        if index > 0:
+                            tracker.count("hedge_won")
+                        return task.result()
+            # すべて失敗した場合は、1本目の例外を返す
+            raise tasks[0].exception()
+        finally:
+            _consume(tasks)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        tracker = get_latency_tracker(self.config, "stream")
+        delay = self.hedge_delay(tracker)
+        tracker.count("calls")
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump(index: int) -> None:
+            # 試行ごとのストリームを1つのタスク内で読み切り、(試行番号, 種類, 値) をキューに渡す
+            started_at = time.monotonic()
+            first = True
+            try:
+                async for chunk in astream_text(self.inner, prompt):
+                    if first:
+                        tracker.record(time.monotonic() - started_at)
+                        first = False
+                    await queue.put((index, "chunk", chunk))
+            except Exception as e:
+                await queue.put((index, "error", e))
+                return
+            await queue.put((index, "done", None))
+
+        tasks = [asyncio.create_task(pump(0))]
+        hedge_at: float | None = time.monotonic() + delay
+        winner: int | None = None
+        errors: dict[int, Exception] = {}
+        try:
+            while True:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                try:
+                    index, kind, value = await asyncio.wait_for(queue.get(), timeout)
+                except TimeoutError:
+                    hedge_at = None
+                    if self._can_hedge(delay):
+                        tracker.count("hedged")
+                        tasks.append(asyncio.create_task(pump(1)))
+                    continue
+
+                if winner is not None and index != winner:
+                    continue
+                if kind == "error":
+                    if winner is not None:
+                        raise value
+                    errors[index] = value
+                    if len(errors) == len(tasks):
+                        raise errors[0]
+                    continue
+
+                if winner is None:
+                    # 最初のチャンク（または空の完了）を返した試行に以降も従い、他はキャンセルする
+                    winner = index
+                    hedge_at = None
+                    if index > 0:
+                        tracker.count("hedge_won")
+                    _consume([t for i, t in enumerate(tasks) if i != index])
+                if kind == "done":
+                    return
+                yield value
+        finally:
+            _consume(tasks)
@@ -0,0 +1,159 @@
+"""
+LLM呼び出しの計測（呼び出し数・応答時間・プロンプト/出力サイズ）。
+
+- 最も内側（プロバイダ呼び出しそのもの）に置き、再試行やヘッジの各試行を1回として数える
+  （キャッシュヒットや相乗り、ローカルのレート制限で止めた呼び出しは数えない）
+- ラベル: provider / model / analysis（dataset / compare）/ prompt_version（v1 / v2）/ code（OK または LLMError.code）
+- analysis / prompt_version は分析関数が llm_call_labels で設定し、各試行の開始時に参照する
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .llm import LLMClient, LLMConfig, LLMError, agenerate_text, astream_text, estimate_tokens
+from .metrics import registry
+
+LABELS = ("provider", "model", "analysis", "prompt_version")
+
+llm_calls = registry.counter(
+    "llm_calls_total", "LLM provider calls by result code (OK or LLMError.code)", (*LABELS, "code")
+)
+llm_call_duration = registry.histogram(
+    "llm_call_duration_seconds",
+    "LLM provider call latency (streams: until the last chunk)",
+    LABELS,
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+llm_first_chunk = registry.histogram(
+    "llm_stream_first_chunk_seconds",
+    "Time to the first chunk of a streaming LLM call",
+    LABELS,
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0),
+)
+llm_prompt_chars = registry.histogram(
+    "llm_prompt_chars",
+    "Prompt length in characters",
+    LABELS,
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+llm_prompt_tokens = registry.histogram(
+    "llm_prompt_tokens",
+    "Estimated prompt tokens (estimate_tokens)",
+    LABELS,
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+llm_output_chars = registry.histogram(
+    "llm_output_chars",
+    "Generated text length in characters",
+    LABELS,
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000),
+)
+
+_call_labels: ContextVar[tuple[str, str]] = ContextVar("llm_call_labels", default=("unknown", "unknown"))
+
+
+@contextmanager
+def llm_call_labels(analysis: str, prompt_version: str):
+    """ブロック内のLLM呼び出しに、分析の種類とプロンプト版のラベルを付ける。"""
+    token = _call_labels.set((analysis, prompt_version))
+    try:
+        yield
+    finally:
+        _call_labels.reset(token)
+
+
+async def astream_with_labels(chunks: AsyncIterator[str], analysis: str, prompt_version: str) -> AsyncIterator[str]:
+    """llm_call_labels のストリーミング版（チャンクを取り出す間だけラベルを設定する）。"""
+    iterator = aiter(chunks)
+    try:
+        while True:
+            with llm_call_labels(analysis, prompt_version):
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _error_code(e: BaseException) -> str:
+    if isinstance(e, LLMError):
+        return e.code
+    if isinstance(e, asyncio.CancelledError):
+        # ヘッジで負けた試行や、リクエストの締め切りで打ち切った試行
+        return "CANCELLED"
+    return "UNEXPECTED_ERROR"
+
+
+class _CallRecorder:
+    def __init__(self, config: LLMConfig, prompt: str):
+        self.labels = (config.provider, config.model, *_call_labels.get())
+        self.started_at = time.monotonic()
+        llm_prompt_chars.observe(len(prompt), *self.labels)
+        llm_prompt_tokens.observe(estimate_tokens(prompt), *self.labels)
+
+    def first_chunk(self) -> None:
+        llm_first_chunk.observe(time.monotonic() - self.started_at, *self.labels)
+
+    def succeeded(self, output_chars: int) -> None:
+        llm_call_duration.observe(time.monotonic() - self.started_at, *self.labels)
+        llm_output_chars.observe(output_chars, *self.labels)
+        llm_calls.inc(*self.labels, "OK")
+
+    def failed(self, e: BaseException) -> None:
+        llm_call_duration.observe(time.monotonic() - self.started_at, *self.labels)
+        llm_calls.inc(*self.labels, _error_code(e))
+
+
+class InstrumentedLLMClient:
+    """LLMClient をラップし、呼び出しごとの応答時間・サイズ・結果コードを記録する。"""
+
+    def __init__(self, inner: LLMClient, config: LLMConfig):
+        self.inner = inner
+        self.config = config
+
+    def generate(self, prompt: str) -> str:
+        recorder = _CallRecorder(self.config, prompt)
+        try:
+            text = self.inner.generate(prompt)
+        except BaseException as e:
+            recorder.failed(e)
+            raise
+        recorder.succeeded(len(text))
+        return text
+
+    async def agenerate(self, prompt: str) -> str:
+        recorder = _CallRecorder(self.config, prompt)
+        try:
+            text = await agenerate_text(self.inner, prompt)
+        except BaseException as e:
+            recorder.failed(e)
+            raise
+        recorder.succeeded(len(text))
+        return text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        recorder = _CallRecorder(self.config, prompt)
+        output_chars = 0
+        first = True
+        try:
+            async for chunk in astream_text(self.inner, prompt):
+                if first:
+                    recorder.first_chunk()
+                    first = False
+                output_chars += len(chunk)
+                yield chunk
+        except GeneratorExit:
+            # 呼び出し側が途中で読むのをやめた（クライアント切断など）
+            recorder.failed(asyncio.CancelledError())
+            raise
+        except BaseException as e:
+            recorder.failed(e)
+            raise
+        recorder.succeeded(output_chars)
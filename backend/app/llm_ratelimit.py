@@ -0,0 +1,171 @@
+"""
+LLM呼び出しのクライアント側レート制限（トークンバケット）。
+
+- requests-per-minute / tokens-per-minute の2つのバケットを持つ
+- バケットの状態はファイルに置き、flock で排他することで同一ホストの複数 uvicorn ワーカー間で共有する
+- 非同期の呼び出しでは、バケットの確保（flock とファイルI/O）をスレッドで実行しイベントループを止めない
+- 枠が空くまで短時間（max_wait_seconds まで）待ってから呼び出す。待ちきれない場合は
+  プロバイダに送らず LLMLocalRateLimitError（LLMRateLimitError の一種、retry_after 付き）を返し、クォータを無駄に消費しない
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from .llm import LLMClient, LLMConfig, LLMLocalRateLimitError, agenerate_text, astream_text, estimate_tokens
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests_per_minute: int
+    tokens_per_minute: int
+    max_wait_seconds: float
+    output_tokens_reserve: int
+
+    @staticmethod
+    def from_config(config: LLMConfig) -> "RateLimit":
+        return RateLimit(
+            requests_per_minute=config.rate_limit_rpm,
+            tokens_per_minute=config.rate_limit_tpm,
+            max_wait_seconds=config.rate_limit_max_wait_seconds,
+            output_tokens_reserve=config.rate_limit_output_tokens,
+        )
+
+
+class FileTokenBucket:
+    """
+    ファイルで状態を共有するトークンバケット。
+    - 状態: {"requests": 残量, "tokens": 残量, "updated_at": UNIX時刻}
+    - プロセス間で共有するため、時刻には monotonic ではなく time.time() を使う
+    """
+
+    def __init__(self, path: str, limit: RateLimit):
+        self.path = path
+        self.limit = limit
+
+    def _capacity(self) -> tuple[float, float]:
+        return float(self.limit.requests_per_minute), float(self.limit.tokens_per_minute)
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        枠を確保できれば消費して 0 を返す。確保できなければ何も消費せず、必要な待機秒数を返す。
+        requests/tokens のどちらかが 0（無制限）の場合、そのバケットは判定しない。
+        """
+        req_cap, tok_cap = self._capacity()
+        # バケット容量を超えるコストは永遠に満たせないため、容量で頭打ちにする
+        cost = min(float(tokens), tok_cap) if tok_cap > 0 else 0.0
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            state = self._read(fd)
+            if state is None:
+                state = {"requests": req_cap, "tokens": tok_cap, "updated_at": now}
+
+            elapsed = max(0.0, now - float(state.get("updated_at") or now))
+            req_level = min(req_cap, float(state.get("requests", req_cap)) + elapsed * req_cap / 60.0)
+            tok_level = min(tok_cap, float(state.get("tokens", tok_cap)) + elapsed * tok_cap / 60.0)
+
+            wait = 0.0
+            if req_cap > 0 and req_level < 1.0:
+                wait = max(wait, (1.0 - req_level) * 60.0 / req_cap)
+            if tok_cap > 0 and tok_level < cost:
+                wait = max(wait, (cost - tok_level) * 60.0 / tok_cap)
+
+            if wait <= 0:
+                if req_cap > 0:
+                    req_level -= 1.0
+                if tok_cap > 0:
+                    tok_level -= cost
+
+            self._write(fd, {"requests": req_level, "tokens": tok_level, "updated_at": now})
+            return wait
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @staticmethod
+    def _read(fd: int) -> dict | None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        raw = b""
+        while True:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            raw += chunk
+        if not raw:
+            return None
+        try:
+            state = json.loads(raw)
+        except ValueError:
+            return None
+        return state if isinstance(state, dict) else None
+
+    @staticmethod
+    def _write(fd: int, state: dict) -> None:
+        data = json.dumps(state).encode("utf-8")
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, data)
+
+
+def bucket_path(config: LLMConfig) -> str:
+    """provider/model ごとに別のバケットファイルを使う（モデルごとにクォータが異なるため）。"""
+    safe_model = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in (config.model or "default"))
+    return os.path.join(config.rate_limit_state_dir, f"prism-llm-ratelimit-{config.provider}-{safe_model}.json")
+
+
+class RateLimitedLLMClient:
+    """LLMClient をラップし、呼び出し前にトークンバケットで枠を確保する。"""
+
+    def __init__(self, inner: LLMClient, bucket: FileTokenBucket):
+        self.inner = inner
+        self.bucket = bucket
+
+    def _cost(self, prompt: str) -> int:
+        return estimate_tokens(prompt) + self.bucket.limit.output_tokens_reserve
+
+    def _next_wait(self, cost: int, started_at: float) -> float:
+        return self._checked_wait(self.bucket.try_acquire(cost), started_at)
+
+    async def _anext_wait(self, cost: int, started_at: float) -> float:
+        # flock とファイルI/Oはブロッキング（他ワーカーがロック中なら待つ）ため、イベントループの外で実行する
+        return self._checked_wait(await asyncio.to_thread(self.bucket.try_acquire, cost), started_at)
+
+    def _checked_wait(self, wait: float, started_at: float) -> float:
+        if wait <= 0:
+            return 0.0
+        waited = time.monotonic() - started_at
+        if waited + wait > self.bucket.limit.max_wait_seconds:
+            raise LLMLocalRateLimitError(
+                f"Local LLM rate limit exceeded (would wait {wait:.1f}s)",
+                retry_after=wait,
+            )
+        return wait
+
+    def generate(self, prompt: str) -> str:
+        cost = self._cost(prompt)
+        started_at = time.monotonic()
+        while (wait := self._next_wait(cost, started_at)) > 0:
+            time.sleep(wait)
+        return self.inner.generate(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        cost = self._cost(prompt)
+        started_at = time.monotonic()
+        while (wait := await self._anext_wait(cost, started_at)) > 0:
+            await asyncio.sleep(wait)
+        return await agenerate_text(self.inner, prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        cost = self._cost(prompt)
+        started_at = time.monotonic()
+        while (wait := await self._anext_wait(cost, started_at)) > 0:
+            await asyncio.sleep(wait)
+        async for chunk in astream_text(self.inner, prompt):
+            yield chunk
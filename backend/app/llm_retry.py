@@ -0,0 +1,166 @@
+"""
+LLM呼び出しの再試行（指数バックオフ＋ジッタ）。
+
+- LLMError.retryable が True の例外のみ再試行する（B-2-3 の分類をそのまま使う）
+- Retry-After（LLMError.retry_after）がある場合は、少なくともその秒数は待つ
+- 全体の締め切り（deadline）やリクエストの締め切り（llm_deadline）を超える待機はせず、直前の例外をそのまま返す
+- 例外の種類（LLMError.code）ごとの再試行回数を共有レジストリの llm_retries_total に数える（/metrics にも出る）
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from .llm import (
+    LLMClient,
+    LLMConfig,
+    LLMError,
+    agenerate_text,
+    astream_text,
+    deadline_remaining_seconds,
+)
+from .metrics import registry
+
+logger = logging.getLogger("prism.backend.llm")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int
+    base_delay_seconds: float
+    max_delay_seconds: float
+    deadline_seconds: float
+
+    @staticmethod
+    def from_config(config: LLMConfig) -> "RetryPolicy":
+        return RetryPolicy(
+            max_retries=config.max_retries,
+            base_delay_seconds=config.retry_base_delay_seconds,
+            max_delay_seconds=config.retry_max_delay_seconds,
+            deadline_seconds=config.retry_deadline_seconds,
+        )
+
+    def backoff(self, retry_number: int) -> float:
+        """retry_number 回目（1始まり）の待機秒数（full jitter）。"""
+        cap = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** (retry_number - 1)))
+        return random.uniform(0, max(0.0, cap))
+
+
+llm_retries = registry.counter(
+    "llm_retries_total", "LLM retries by LLMError.code and outcome (retried / recovered / exhausted)", ("code", "outcome")
+)
+RETRY_OUTCOMES = ("retried", "recovered", "exhausted")
+
+
+def retry_stats() -> dict[str, dict[str, int]]:
+    """llm_retries_total を例外コードごとの {retried, recovered, exhausted} にまとめる（/llm/retry-stats 用）。"""
+    stats: dict[str, dict[str, int]] = {}
+    for sample in llm_retries.snapshot():
+        labels = sample["labels"]
+        item = stats.setdefault(labels["code"], dict.fromkeys(RETRY_OUTCOMES, 0))
+        item[labels["outcome"]] = int(sample["value"])
+    return stats
+
+
+class _RetryState:
+    """1回の論理呼び出しにおける再試行の進行状況。"""
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.started_at = time.monotonic()
+        self.retries = 0
+        self.last_code: str | None = None
+
+    def next_delay(self, e: LLMError) -> float | None:
+        """再試行する場合は待機秒数を、諦める場合は None を返す。"""
+        if not e.retryable or self.retries >= self.policy.max_retries:
+            return None
+
+        delay = self.policy.backoff(self.retries + 1)
+        retry_after = getattr(e, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, float(retry_after))
+
+        elapsed = time.monotonic() - self.started_at
+        if elapsed + delay >= self.policy.deadline_seconds:
+            return None
+        remaining = deadline_remaining_seconds()
+        if remaining is not None and delay >= remaining:
+            return None
+
+        self.retries += 1
+        self.last_code = e.code
+        llm_retries.inc(e.code, "retried")
+        logger.warning(
+            f"LLM call failed ({e.code}); retrying in {delay:.2f}s "
+            f"(retry {self.retries}/{self.policy.max_retries})"
+        )
+        return delay
+
+    def give_up(self, e: LLMError) -> None:
+        if e.retryable:
+            llm_retries.inc(e.code, "exhausted")
+
+    def succeeded(self) -> None:
+        if self.retries > 0 and self.last_code is not None:
+            llm_retries.inc(self.last_code, "recovered")
+
+
+class RetryingLLMClient:
+    """LLMClient をラップし、retryable な例外をバックオフ付きで再試行する。"""
+
+    def __init__(self, inner: LLMClient, policy: RetryPolicy):
+        self.inner = inner
+        self.policy = policy
+
+    def generate(self, prompt: str) -> str:
+        state = _RetryState(self.policy)
+        while True:
+            try:
+                text = self.inner.generate(prompt)
+            except LLMError as e:
+                delay = state.next_delay(e)
+                if delay is None:
+                    state.give_up(e)
+                    raise
+                time.sleep(delay)
+                continue
+            state.succeeded()
+            return text
+
+    async def agenerate(self, prompt: str) -> str:
+        state = _RetryState(self.policy)
+        while True:
+            try:
+                text = await agenerate_text(self.inner, prompt)
+            except LLMError as e:
+                delay = state.next_delay(e)
+                if delay is None:
+                    state.give_up(e)
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            state.succeeded()
+            return text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        # 一部でもチャンクを返した後に再試行すると出力が重複するため、再試行は最初のチャンクまでに限る
+        state = _RetryState(self.policy)
+        while True:
+            emitted = False
+            try:
+                async for chunk in astream_text(self.inner, prompt):
+                    emitted = True
+                    yield chunk
+            except LLMError as e:
+                delay = None if emitted else state.next_delay(e)
+                if delay is None:
+                    state.give_up(e)
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            state.succeeded()
+            return
@@ -1,24 +1,45 @@
 import csv
 import io
+import json
 import logging
 import os
+from collections.abc import AsyncIterator, Callable, Hashable
 from datetime import datetime, timezone
 from functools import lru_cache
 
-from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import BackgroundTasks, Body, Depends, FastAPI, UploadFile, File, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import func, select, text, delete
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
 
+from .admin import is_admin_token
+from .compression import CompressionMiddleware
 from .db import SessionLocal
+from .http_cache import cache_control, etag_matches, make_etag
+from .http_metrics import HttpMetricsMiddleware, update_threadpool_gauges
+from .analysis_jobs import (
+    create_or_reuse_compare_job,
+    load_job,
+    mark_job_failed,
+    mark_job_running,
+    mark_job_succeeded,
+)
 from .analysis import (
-    build_comparison_prompt_v2,
+    ANALYSIS_VERSION,
+    COMPARE_PROMPT_VERSIONS,
+    agenerate_comparison_analysis_text,
+    agenerate_llm_analysis_text,
+    astream_comparison_analysis_text,
+    astream_llm_analysis_text,
     calculate_stats_diff,
     compare_keywords,
     compare_price_ranges,
-    generate_comparison_analysis_text,
     generate_comparison_template_analysis,
-    generate_llm_analysis_text,
     generate_template_analysis,
 )
 from .llm import (
@@ -30,9 +51,22 @@ from .llm import (
     LLMProviderError,
     LLMRateLimitError,
     LLMTimeoutError,
+    astream_within_deadline,
     build_llm_client,
+    llm_deadline,
+    prompt_token_budget,
 )
+from .llm_cache import ResponseCache
+from .llm_circuit import LLMCircuitOpenError, circuit_snapshots
+from .llm_hedge import hedge_snapshots
+from .llm_retry import retry_stats
+from .metrics import registry as metrics_registry, render_prometheus
+from .singleflight import SingleFlight
+from .slow_queries import slow_query_log, slow_query_threshold_ms
+from .timing import span
+from .memory_profile import MemoryProfileMiddleware, memory_records, start_memory_profile_if_enabled, tracing_summary
 from .models import Dataset, DatasetRow
+from .profiling import ProfilingMiddleware, profile_store
 
 # D-3: ログ設定
 logging.basicConfig(
@@ -42,7 +76,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("prism.backend")
 
-app = FastAPI(title="Prism Backend", version="0.1.0")
+# JSON は orjson で直列化する（compare / stats の大きな dict で標準の json より速い）
+app = FastAPI(title="Prism Backend", version="0.1.0", default_response_class=ORJSONResponse)
 
 # A-2: データセット詳細で返すサンプル行数（固定）
 SAMPLE_ROWS_LIMIT = 10
@@ -54,6 +89,15 @@ STRING_TOP_VALUES_LIMIT = 5
 # 例: "1", "-1", "1.2", ".5", "1e3", "-1.2E-3"
 NUMERIC_REGEX = r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$"
 
+# POST /datasets/stats:batch で1回に指定できるデータセット数の上限
+STATS_BATCH_MAX_IDS = 100
+
+# compare で返せる項目（include= で絞れる。並びはレスポンスの項目順）
+# stats → comparison / price → price_range_analysis / keywords → keyword_analysis
+COMPARE_SECTIONS = ("stats", "price", "keywords")
+COMPARE_PRICE_COLUMN = "UnitPrice"
+COMPARE_TITLE_COLUMN = "Title"
+
 # CORS（ブラウザアクセス向け）
 # 例: "http://localhost:3001,http://127.0.0.1:3001" のようにカンマ区切り
 originsEnv = os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:3001,http://127.0.0.1:3001")
@@ -69,6 +113,104 @@ def getLlmClient(config: LLMConfig = Depends(getLlmConfig)) -> LLMClient:
     return build_llm_client(config)
 
 
+def requireAdmin(x_admin_token: str | None = Header(default=None)) -> None:
+    """目的: /admin/* と /metrics に出ない /llm/* の内部状態を ADMIN_TOKEN を知る運用者だけに限定する（未設定なら無効）。"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# 同じデータセット（ペア）の stats / compare を同時に要求された場合、計算を1回にまとめる（ワーカー内）
+# 結果の dict は相乗りした呼び出し間で共有されるため、呼び出し側で書き換えないこと
+computeFlight = SingleFlight()
+
+
+# 取り込み後に変化しないデータセットの stats / compare 結果のキャッシュ（ANALYSIS_CACHE_TTL_SECONDS=0 で無効）
+# computeFlight と同様、キャッシュした dict は呼び出し間で共有されるため書き換えないこと
+computeCache = ResponseCache(
+    ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "0")),
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "64")),
+)
+
+
+def cachedCompute(key: Hashable, compute: Callable[[], dict]) -> dict:
+    """目的: computeCache が有効なら結果をキャッシュから返し、なければ計算して格納する（例外は格納しない）。"""
+    if computeCache.ttl_seconds <= 0:
+        return compute()
+    cached = computeCache.get(key)
+    if cached is not None:
+        return cached
+    value = compute()
+    computeCache.set(key, value)
+    return value
+
+
+async def loadDatasetStats(dataset_id: int) -> dict:
+    """目的: cachedDatasetStats をスレッドで実行する（同一dataset_idの同時要求は相乗り）。"""
+    return await computeFlight.run(("stats", dataset_id), lambda: run_in_threadpool(cachedDatasetStats, dataset_id))
+
+
+async def loadComparison(base: int, target: int) -> dict:
+    """目的: cachedComparison をスレッドで実行する（同一ペアの同時要求は相乗り）。"""
+    return await computeFlight.run(("compare", base, target), lambda: run_in_threadpool(cachedComparison, base, target))
+
+
+def datasetEtag(kind: str, *datasetIds: int) -> str | None:
+    """目的: データセットの取り込み日時から ETag を作る（存在しないIDがあれば None とし、本体の 404 に任せる）。"""
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(Dataset.id, Dataset.created_at).where(Dataset.id.in_(datasetIds))).all()
+    except SQLAlchemyError as e:
+        logger.error(f"ETag lookup ({kind}) - DB error: {type(e).__name__}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"DB error: {type(e).__name__}")
+    finally:
+        db.close()
+    createdAt = {r.id: r.created_at for r in rows}
+    if any(datasetId not in createdAt for datasetId in datasetIds):
+        return None
+    return make_etag(kind, ANALYSIS_VERSION, [(datasetId, createdAt[datasetId]) for datasetId in datasetIds])
+
+
+def conditionalGet(request: Request, etag: str | None, compute: Callable[[], dict]) -> Response:
+    """目的: ETag と Cache-Control を付け、If-None-Match が一致すれば本文を作らずに 304 を返す。
+
+    本文は jsonable_encoder を通さずに orjson で直接直列化する（中身は DB由来の dict / list / 数値 / 文字列 / datetime だけ）。
+    """
+    if etag is None:
+        return ORJSONResponse(compute())
+    headers = {"ETag": etag, "Cache-Control": cache_control()}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(compute(), headers=headers)
+
+
+def toLlmHttpException(e: LLMError) -> HTTPException:
+    """目的: LLM例外を一貫したHTTPステータス/エラーJSONへ変換する（B-2-3）。"""
+    status_code = 500
+    if isinstance(e, LLMTimeoutError):
+        status_code = 504
+    elif isinstance(e, LLMRateLimitError):
+        status_code = 503
+    elif isinstance(e, LLMAuthError):
+        status_code = 503
+    elif isinstance(e, LLMInputTooLargeError):
+        status_code = 413
+    elif isinstance(e, LLMProviderError):
+        status_code = 502
+    elif isinstance(e, LLMCircuitOpenError):
+        status_code = 503
+
+    return HTTPException(
+        status_code=status_code,
+        detail={
+            "error": {
+                "code": getattr(e, "code", "LLM_ERROR"),
+                "message": str(e),
+                "retryable": bool(getattr(e, "retryable", False)),
+            }
+        },
+    )
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowOrigins,
@@ -76,12 +218,215 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Accept-Encoding に応じて br / gzip で圧縮する（計測のミドルウェアより内側に置き、送信したバイト数を記録させる）
+app.add_middleware(CompressionMiddleware)
+# ?profile=1 の管理者リクエストだけをサンプリングする（それ以外はクエリ文字列の確認のみ）
+app.add_middleware(ProfilingMiddleware)
+# MEMORY_PROFILE=1 のときだけ tracemalloc を開始し、リクエストごとのピーク確保量と確保元を記録する
+start_memory_profile_if_enabled()
+app.add_middleware(MemoryProfileMiddleware)
+# 計測は最も外側に置き、CORS等のミドルウェアも含めた処理時間を記録する
+app.add_middleware(HttpMetricsMiddleware, routes=app.routes)
+
+def buildSignificantChanges(comparison_data: dict) -> list[dict]:
+    """目的: 比較結果から、平均値が変化した数値カラム（注目すべき変化）を抽出する。"""
+    comparison = comparison_data.get("comparison") or {}
+    columns_change = comparison.get("columns_change") or []
+
+    significant_changes = []
+    for col in columns_change:
+        if not isinstance(col, dict):
+            continue
+        
+        col_name = col.get("name")
+        diff_stats = col.get("diff")
+        base_stats = col.get("base")
+        target_stats = col.get("target")
+        
+        # 数値カラムで平均値が変化している場合
+        if isinstance(diff_stats, dict) and isinstance(base_stats, dict) and isinstance(target_stats, dict):
+            diff_avg = diff_stats.get("avg")
+            base_avg = base_stats.get("avg")
+            target_avg = target_stats.get("avg")
+            
+            if diff_avg is not None and diff_avg != 0:
+                significant_changes.append({
+                    "column": col_name,
+                    "type": "avg",
+                    "base": base_avg,
+                    "target": target_avg,
+                    "diff": diff_avg
+                })
+    return significant_changes
+
+
+def buildTemplateComparisonResponse(comparison_data: dict) -> dict:
+    """目的: LLMなしのテンプレート推移分析レスポンスを組み立てる。"""
+    template = generate_comparison_template_analysis(comparison_data)
+
+    # comparison_summary を作成（簡易版）
+    comparison = comparison_data.get("comparison") or {}
+    rows_change = comparison.get("rows_change") or {}
+
+    return {
+        "base_dataset": comparison_data.get("base_dataset"),
+        "target_dataset": comparison_data.get("target_dataset"),
+        "comparison_summary": {
+            "rows_change": rows_change,
+            "significant_changes": []  # テンプレート版では省略
+        },
+        **template
+    }
+
+
+def degradedFields(e: LLMError) -> dict:
+    """目的: LLMを呼ばずテンプレートで代替したことを示すフィールドを返す。"""
+    return {"degraded": True, "degraded_reason": e.code}
+
+
+def isAnalysisLlmEnabled() -> bool:
+    """目的: 分析にLLMを使うか（ANALYSIS_USE_LLM）を判定する。"""
+    return os.getenv("ANALYSIS_USE_LLM", "0").strip() in ("1", "true", "yes", "on")
+
+
+def formatSseEvent(event: str, data: dict) -> str:
+    """目的: Server-Sent Events の1イベント分の文字列を組み立てる。"""
+    payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sseResponse(events: AsyncIterator[str]) -> StreamingResponse:
+    # プロキシ（nginx等）にバッファリングさせず、チャンクをそのまま流す
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def templateAnalysisEvents(meta: dict, template: dict) -> AsyncIterator[str]:
+    """目的: テンプレート分析（LLMなし）をストリーミング版と同じイベント形式で返す。"""
+    yield formatSseEvent("meta", {**meta, "generated_at": template["generated_at"]})
+    yield formatSseEvent("delta", {"text": template["analysis_text"]})
+    yield formatSseEvent("done", template)
+
+
+async def startAnalysisStream(
+    chunks: AsyncIterator[str],
+    meta: dict,
+    logPrefix: str,
+    fallbackTemplate: Callable[[], dict],
+) -> StreamingResponse:
+    """
+    目的: LLMのチャンクを SSE（meta → delta* → done）として返すレスポンスを作る。
+    - 最初のチャンクまでに起きたLLM例外は、非ストリーミング版と同じHTTPエラーで返す
+    - サーキットブレーカーが open の場合は、テンプレート分析を degraded として返す
+    - ストリーム開始後の例外は error イベントとして通知する
+    """
+    try:
+        first = await anext(chunks)
+    except StopAsyncIteration:
+        first = ""
+    except LLMCircuitOpenError as e:
+        logger.warning(f"{logPrefix} - LLM circuit open; falling back to template analysis")
+        degraded = degradedFields(e)
+        return sseResponse(templateAnalysisEvents({**meta, **degraded}, {**fallbackTemplate(), **degraded}))
+    except LLMError as e:
+        logger.error(f"{logPrefix} - LLM error: {type(e).__name__} - {str(e)}", exc_info=True)
+        raise toLlmHttpException(e)
+
+    async def events() -> AsyncIterator[str]:
+        yield formatSseEvent("meta", meta)
+        parts = []
+        if first:
+            parts.append(first)
+            yield formatSseEvent("delta", {"text": first})
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield formatSseEvent("delta", {"text": chunk})
+        except LLMError as e:
+            logger.error(f"{logPrefix} - LLM error during stream: {type(e).__name__} - {str(e)}", exc_info=True)
+            httpException = toLlmHttpException(e)
+            yield formatSseEvent("error", {"status": httpException.status_code, **httpException.detail})
+            return
+        text = "".join(parts)
+        logger.info(f"{logPrefix} - LLM stream finished (text_length={len(text)})")
+        yield formatSseEvent("done", {"generated_at": meta["generated_at"], "analysis_text": text})
+
+    return sseResponse(events())
+
 
 @app.get("/health")
-def health():
+async def health():
     """目的: 稼働確認用のヘルスチェック結果を返す。"""
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def getMetrics():
+    """目的: HTTP/LLM/スレッドプールのメトリクスを Prometheus のテキスト形式で返す（ワーカープロセス単位）。"""
+    update_threadpool_gauges()
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/llm/retry-stats")
+async def getLlmRetryStats():
+    """目的: LLM呼び出しの再試行回数を例外コード別に返す（retried / recovered / exhausted。/metrics の llm_retries_total と同じ値）。"""
+    return {"retries": retry_stats()}
+
+@app.get("/llm/circuit", dependencies=[Depends(requireAdmin)])
+async def getLlmCircuitState():
+    """目的: LLMサーキットブレーカーの状態（provider/model別）を返す。"""
+    return {"breakers": circuit_snapshots()}
+
+@app.get("/llm/hedge-stats", dependencies=[Depends(requireAdmin)])
+async def getLlmHedgeStats():
+    """目的: LLMヘッジの発生状況（provider/model/種類別の呼び出し数・ヘッジ数・2本目の先着数）を返す。"""
+    return {"hedges": hedge_snapshots()}
+
+@app.get("/llm/metrics")
+async def getLlmMetrics():
+    """目的: LLM呼び出しの計測値（呼び出し数・応答時間・プロンプト/出力サイズ）を provider/model/プロンプト版/結果コード別に返す（公開の /metrics にある llm_* 系列のJSON版なので認可は不要）。"""
+    return {"metrics": metrics_registry.snapshot(prefix="llm_")}
+
+@app.get("/admin/slow-queries", dependencies=[Depends(requireAdmin)])
+async def getSlowQueries():
+    """目的: DB_SLOW_QUERY_MS を超えたSQL（新しい順、実行計画付き）を返す（ワーカープロセス単位）。"""
+    return {
+        "threshold_ms": slow_query_threshold_ms(),
+        "capacity": slow_query_log.capacity,
+        "queries": slow_query_log.entries(),
+    }
+
+@app.delete("/admin/slow-queries", status_code=204, dependencies=[Depends(requireAdmin)])
+async def clearSlowQueries():
+    """目的: 記録済みの遅いSQLを消去する。"""
+    slow_query_log.clear()
+    return None  # 204 No Content
+
+@app.get("/admin/profiles", dependencies=[Depends(requireAdmin)])
+async def listProfiles():
+    """目的: ?profile=1 で取得したリクエストのプロファイル一覧（新しい順、スタック本体なし）を返す。"""
+    return {"profiles": profile_store.summaries()}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(requireAdmin)])
+async def getProfile(profile_id: int):
+    """目的: プロファイルを collapsed 形式（flamegraph.pl / speedscope で読めるテキスト）で返す。"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"])
+
+@app.get("/admin/memory", dependencies=[Depends(requireAdmin)])
+async def getMemoryProfile():
+    """目的: MEMORY_PROFILE=1 で記録したリクエストごとのピーク確保量と確保元（新しい順）を返す（ワーカープロセス単位）。"""
+    return {**tracing_summary(), "requests": memory_records.entries()}
+
+@app.delete("/admin/memory", status_code=204, dependencies=[Depends(requireAdmin)])
+async def clearMemoryProfile():
+    """目的: 記録済みのリクエストごとのメモリ計測を消去する。"""
+    memory_records.clear()
+    return None  # 204 No Content
+
 @app.get("/datasets")
 def listDatasets():
     """目的: データセット一覧（行数付き）を返す。"""
@@ -119,111 +464,53 @@ def listDatasets():
     finally:
         db.close()
 
-@app.get("/datasets/compare/analysis")
-def compareDatasetAnalysis(
-    base: int, 
-    target: int, 
-    version: str = "v1",
-    llm: LLMClient = Depends(getLlmClient)
-):
-    """目的: 2つのデータセットの差分を分析し、LLMによる推移分析テキストを返す（E-0-3, E-2-2-1-3）
-    
-    Args:
-        base: 基準データセットID
-        target: 比較対象データセットID
-        version: プロンプトバージョン ("v1" or "v2")
-        llm: LLMクライアント
+async def buildComparisonAnalysis(
+    base: int,
+    target: int,
+    version: str,
+    llm: LLMClient | None,
+    logPrefix: str,
+    deadlineSeconds: float = 0.0,
+) -> dict:
+    """目的: 推移分析（compare + LLM）のレスポンスを組み立てる。同期エンドポイントと非同期ジョブで共用する。
+
+    llm は LLM無効（テンプレート分析）の場合のみ None でよい。
+    deadlineSeconds はLLM待ちの締め切り（0 の場合は設けない。ジョブは利用者を待たせないため設けない）。
     """
-    logger.info(f"GET /datasets/compare/analysis?base={base}&target={target}&version={version} - Generating comparison analysis")
-    
     # 1. 比較結果を取得（E-0-2のエンドポイントを再利用）
-    comparison_data = compareDatasets(base, target)
+    # DBアクセスは同期のためスレッドで実行し、LLM待ちの間はスレッドを占有しない（同一ペアの同時要求は相乗り）
+    comparison_data = await loadComparison(base, target)
     
     # 2. LLM使用の判定
-    use_llm = os.getenv("ANALYSIS_USE_LLM", "0").strip() in ("1", "true", "yes", "on")
+    use_llm = isAnalysisLlmEnabled()
     
     if not use_llm:
-        logger.info(f"GET /datasets/compare/analysis - Using template analysis (LLM disabled)")
-        template = generate_comparison_template_analysis(comparison_data)
-        
-        # comparison_summary を作成（簡易版）
-        comparison = comparison_data.get("comparison") or {}
-        rows_change = comparison.get("rows_change") or {}
-        
-        return {
-            "base_dataset": comparison_data.get("base_dataset"),
-            "target_dataset": comparison_data.get("target_dataset"),
-            "comparison_summary": {
-                "rows_change": rows_change,
-                "significant_changes": []  # テンプレート版では省略
-            },
-            **template
-        }
+        logger.info(f"{logPrefix} - Using template analysis (LLM disabled)")
+        return buildTemplateComparisonResponse(comparison_data)
     
     # 3. LLMによる推移分析
     generated_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     try:
-        logger.info(f"GET /datasets/compare/analysis - Calling LLM (version={version})")
-        text = generate_comparison_analysis_text(comparison_data, llm, version=version)
-        logger.info(f"GET /datasets/compare/analysis - LLM call succeeded (text_length={len(text)})")
+        logger.info(f"{logPrefix} - Calling LLM (version={version})")
+        async with llm_deadline(deadlineSeconds):
+            text = await agenerate_comparison_analysis_text(comparison_data, llm, version=version)
+        logger.info(f"{logPrefix} - LLM call succeeded (text_length={len(text)})")
+    except LLMCircuitOpenError as e:
+        # LLM障害中は待たずにテンプレート分析で即答する（degraded として明示）
+        logger.warning(f"{logPrefix} - LLM circuit open; falling back to template analysis")
+        return {**buildTemplateComparisonResponse(comparison_data), **degradedFields(e)}
     except LLMError as e:
         logger.error(
-            f"GET /datasets/compare/analysis - LLM error: {type(e).__name__} - {str(e)}",
+            f"{logPrefix} - LLM error: {type(e).__name__} - {str(e)}",
             exc_info=True
         )
         # B-2-3: エラーハンドリング（PoCでも最低限）
-        status_code = 500
-        if isinstance(e, LLMTimeoutError):
-            status_code = 504
-        elif isinstance(e, LLMRateLimitError):
-            status_code = 503
-        elif isinstance(e, LLMAuthError):
-            status_code = 503
-        elif isinstance(e, LLMInputTooLargeError):
-            status_code = 413
-        elif isinstance(e, LLMProviderError):
-            status_code = 502
-        
-        raise HTTPException(
-            status_code=status_code,
-            detail={
-                "error": {
-                    "code": getattr(e, "code", "LLM_ERROR"),
-                    "message": str(e),
-                    "retryable": bool(getattr(e, "retryable", False)),
-                }
-            },
-        )
+        raise toLlmHttpException(e)
     
     # 4. comparison_summary を作成（注目すべき変化を抽出）
     comparison = comparison_data.get("comparison") or {}
     rows_change = comparison.get("rows_change") or {}
-    columns_change = comparison.get("columns_change") or []
-    
-    significant_changes = []
-    for col in columns_change:
-        if not isinstance(col, dict):
-            continue
-        
-        col_name = col.get("name")
-        diff_stats = col.get("diff")
-        base_stats = col.get("base")
-        target_stats = col.get("target")
-        
-        # 数値カラムで平均値が変化している場合
-        if isinstance(diff_stats, dict) and isinstance(base_stats, dict) and isinstance(target_stats, dict):
-            diff_avg = diff_stats.get("avg")
-            base_avg = base_stats.get("avg")
-            target_avg = target_stats.get("avg")
-            
-            if diff_avg is not None and diff_avg != 0:
-                significant_changes.append({
-                    "column": col_name,
-                    "type": "avg",
-                    "base": base_avg,
-                    "target": target_avg,
-                    "diff": diff_avg
-                })
+    significant_changes = buildSignificantChanges(comparison_data)
     
     # 5. レスポンス返却
     return {
@@ -237,95 +524,285 @@ def compareDatasetAnalysis(
         "generated_at": generated_at
     }
 
-@app.get("/datasets/compare")
-def compareDatasets(base: int, target: int):
-    """目的: 2つのデータセットの統計情報を比較し、差分を返す（E-0-2）。"""
-    logger.info(f"GET /datasets/compare?base={base}&target={target} - Comparing datasets")
+@app.get("/datasets/compare/analysis")
+async def compareDatasetAnalysis(
+    base: int, 
+    target: int, 
+    version: str = "v1",
+    llm: LLMClient = Depends(getLlmClient),
+    config: LLMConfig = Depends(getLlmConfig),
+):
+    """目的: 2つのデータセットの差分を分析し、LLMによる推移分析テキストを返す（E-0-3, E-2-2-1-3）
     
-    # 1. クエリパラメータの検証（同一ID指定はエラー）
+    Args:
+        base: 基準データセットID
+        target: 比較対象データセットID
+        version: プロンプトバージョン ("v1" or "v2")
+        llm: LLMクライアント
+        config: LLM設定（リクエストの締め切り LLM_REQUEST_DEADLINE_SECONDS を参照する）
+    """
+    logger.info(f"GET /datasets/compare/analysis?base={base}&target={target}&version={version} - Generating comparison analysis")
+    return await buildComparisonAnalysis(
+        base, target, version, llm, "GET /datasets/compare/analysis", config.request_deadline_seconds
+    )
+
+def analysisEngine(config: LLMConfig) -> str:
+    """目的: 分析に使うエンジン（テンプレート or provider/model）を、ジョブ結果の再利用判定用の文字列で返す。"""
+    if not isAnalysisLlmEnabled():
+        return "template"
+    return f"{config.provider}/{config.model}"
+
+
+async def runComparisonAnalysisJob(
+    jobId: str, base: int, target: int, version: str, llm: LLMClient | None
+) -> None:
+    """目的: 推移分析ジョブを実行し、結果またはエラーをDBへ保存する（レスポンス返却後にバックグラウンドで動く）。"""
+    logPrefix = f"analysis-job {jobId}"
+    await run_in_threadpool(mark_job_running, jobId)
+    try:
+        result = await buildComparisonAnalysis(base, target, version, llm, logPrefix)
+    except HTTPException as e:
+        logger.warning(f"{logPrefix} - Failed (status={e.status_code})")
+        await run_in_threadpool(mark_job_failed, jobId, {"status": e.status_code, "detail": e.detail})
+        return
+    except Exception as e:
+        logger.error(f"{logPrefix} - Unexpected error: {type(e).__name__}", exc_info=True)
+        await run_in_threadpool(
+            mark_job_failed, jobId, {"status": 500, "detail": f"Internal error: {type(e).__name__}"}
+        )
+        return
+    await run_in_threadpool(mark_job_succeeded, jobId, jsonable_encoder(result))
+    logger.info(f"{logPrefix} - Succeeded")
+
+@app.post("/datasets/compare/analysis/jobs", status_code=202)
+async def createCompareAnalysisJob(
+    base: int,
+    target: int,
+    response: Response,
+    backgroundTasks: BackgroundTasks,
+    version: str = "v1",
+    llm: LLMClient = Depends(getLlmClient),
+    config: LLMConfig = Depends(getLlmConfig),
+):
+    """目的: /datasets/compare/analysis をジョブとして受け付け、すぐに job_id を返す（LLMが遅くてもプロキシでタイムアウトしない）。
+
+    結果は GET /analysis-jobs/{job_id} でポーリングして取得する。
+    同じ条件のジョブが実行中/成功済みであれば、新たにLLMを呼ばずにそのジョブを返す。
+    """
+    logPrefix = "POST /datasets/compare/analysis/jobs"
+    logger.info(f"{logPrefix}?base={base}&target={target}&version={version} - Creating analysis job")
     if base == target:
-        logger.warning(f"GET /datasets/compare - Same ID specified: base={base}, target={target}")
         raise HTTPException(
             status_code=400,
             detail="Cannot compare dataset with itself. Please specify different dataset IDs."
         )
-    
-    db = SessionLocal()
-    try:
-        # 2. 両データセットの存在チェック
-        base_dataset_statement = select(Dataset.id, Dataset.filename, Dataset.created_at).where(Dataset.id == base)
-        base_dataset_row = db.execute(base_dataset_statement).first()
-        if base_dataset_row is None:
-            logger.warning(f"GET /datasets/compare - Base dataset not found: {base}")
-            raise HTTPException(status_code=404, detail=f"Dataset not found: base={base}")
-        
-        target_dataset_statement = select(Dataset.id, Dataset.filename, Dataset.created_at).where(Dataset.id == target)
-        target_dataset_row = db.execute(target_dataset_statement).first()
-        if target_dataset_row is None:
-            logger.warning(f"GET /datasets/compare - Target dataset not found: {target}")
-            raise HTTPException(status_code=404, detail=f"Dataset not found: target={target}")
-        
-        # 3. 行数を取得
-        base_rows_statement = (
-            select(func.count(DatasetRow.id))
-            .select_from(DatasetRow)
-            .where(DatasetRow.dataset_id == base)
+    # 未知の版はジョブとして保存しない（prompt_version は String(16)、再利用判定のキーにもなる）
+    if version not in COMPARE_PROMPT_VERSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported version: {version}. Use one of: {', '.join(COMPARE_PROMPT_VERSIONS)}"
         )
-        base_rows = db.execute(base_rows_statement).scalar_one()
-        
-        target_rows_statement = (
-            select(func.count(DatasetRow.id))
-            .select_from(DatasetRow)
-            .where(DatasetRow.dataset_id == target)
+    try:
+        job, created = await run_in_threadpool(
+            create_or_reuse_compare_job, base, target, version, analysisEngine(config)
         )
-        target_rows = db.execute(target_rows_statement).scalar_one()
+    except IntegrityError:
+        # 外部キー違反 = いずれかのデータセットが存在しない
+        logger.warning(f"{logPrefix} - Dataset not found: base={base}, target={target}")
+        raise HTTPException(status_code=404, detail=f"Dataset not found: base={base} or target={target}")
+    except SQLAlchemyError as e:
+        logger.error(f"{logPrefix} - DB error: {type(e).__name__}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"DB error: {type(e).__name__}")
 
-        # 4. 価格帯分析のために行データ（JSONB）を取得（E-2-2改善タスク1）
-        base_jsonb_statement = (
-            select(DatasetRow.data)
-            .where(DatasetRow.dataset_id == base)
-            .order_by(DatasetRow.row_index)
-        )
-        base_jsonb_rows = db.execute(base_jsonb_statement).scalars().all()
-        
-        target_jsonb_statement = (
-            select(DatasetRow.data)
-            .where(DatasetRow.dataset_id == target)
-            .order_by(DatasetRow.row_index)
-        )
-        target_jsonb_rows = db.execute(target_jsonb_statement).scalars().all()
+    if created:
+        backgroundTasks.add_task(runComparisonAnalysisJob, job["job_id"], base, target, version, llm)
+    else:
+        logger.info(f"{logPrefix} - Reusing job {job['job_id']} (status={job['status']})")
 
+    statusUrl = f"/analysis-jobs/{job['job_id']}"
+    response.headers["Location"] = statusUrl
+    return {"job_id": job["job_id"], "status": job["status"], "status_url": statusUrl}
+
+@app.get("/analysis-jobs/{job_id}")
+def getAnalysisJob(job_id: str):
+    """目的: 分析ジョブの状態と、完了していれば結果（失敗時はエラー）を返す。"""
+    try:
+        job = load_job(job_id)
     except SQLAlchemyError as e:
-        logger.error(f"GET /datasets/compare - DB error: {type(e).__name__}", exc_info=True)
+        logger.error(f"GET /analysis-jobs/{job_id} - DB error: {type(e).__name__}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"DB error: {type(e).__name__}")
-    finally:
-        db.close()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
 
-    # 5. getDatasetStats() を2回呼び出して統計を取得
-    base_stats = getDatasetStats(base)
-    target_stats = getDatasetStats(target)
+@app.get("/datasets/compare/analysis/stream")
+async def streamCompareDatasetAnalysis(
+    base: int,
+    target: int,
+    version: str = "v1",
+    llm: LLMClient = Depends(getLlmClient),
+    config: LLMConfig = Depends(getLlmConfig),
+):
+    """目的: /datasets/compare/analysis のストリーミング版。生成途中の分析テキストをSSEで逐次返す。
+
+    イベント:
+        meta: base_dataset / target_dataset / comparison_summary / generated_at
+        delta: {"text": "..."}（生成されたチャンク）
+        done: {"generated_at", "analysis_text"}（結合済みの全文）
+        error: {"status", "error": {...}}（ストリーム開始後のLLM例外）
+    """
+    logPrefix = "GET /datasets/compare/analysis/stream"
+    logger.info(f"{logPrefix}?base={base}&target={target}&version={version} - Streaming comparison analysis")
+
+    comparison_data = await loadComparison(base, target)
+    comparison = comparison_data.get("comparison") or {}
+    meta = {
+        "base_dataset": comparison_data.get("base_dataset"),
+        "target_dataset": comparison_data.get("target_dataset"),
+        "comparison_summary": {
+            "rows_change": comparison.get("rows_change") or {},
+            "significant_changes": [],
+        },
+    }
 
-    # 6. 統計差分を計算
-    comparison = calculate_stats_diff(base_stats, target_stats)
+    if not isAnalysisLlmEnabled():
+        logger.info(f"{logPrefix} - Using template analysis (LLM disabled)")
+        template = generate_comparison_template_analysis(comparison_data)
+        return sseResponse(templateAnalysisEvents(meta, template))
 
-    # 7. 価格帯分析を実行（E-2-2改善タスク1）
-    price_range_analysis = compare_price_ranges(
-        base_rows=base_jsonb_rows,
-        target_rows=target_jsonb_rows,
-        price_column="UnitPrice"
+    meta["comparison_summary"]["significant_changes"] = buildSignificantChanges(comparison_data)
+    meta["generated_at"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    logger.info(f"{logPrefix} - Calling LLM (version={version}, stream)")
+    chunks = astream_within_deadline(
+        astream_comparison_analysis_text(comparison_data, llm, version=version), config.request_deadline_seconds
+    )
+    return await startAnalysisStream(
+        chunks, meta, logPrefix, lambda: generate_comparison_template_analysis(comparison_data)
     )
 
-    # 8. キーワード分析を実行（E-2-2改善タスク2）
-    keyword_analysis = compare_keywords(
-        base_rows=base_jsonb_rows,
-        target_rows=target_jsonb_rows,
-        title_column="Title",
-        top_n=10
+@app.get("/datasets/compare")
+def compareDatasets(
+    base: int,
+    target: int,
+    request: Request,
+    include: str | None = Query(default=None, description="stats,price,keywords のうち返す項目（カンマ区切り、省略時は全部）"),
+):
+    """目的: 2つのデータセットの統計情報を比較し、差分を返す（E-0-2）。両データセットは変化しないため ETag で再検証できる。
+
+    include で項目を絞ると、含めない分析とそのための行データの取得を行わない。
+    """
+    return compareSectionsResponse(base, target, request, parseCompareInclude(include))
+
+@app.get("/datasets/compare/stats")
+def compareDatasetStats(base: int, target: int, request: Request):
+    """目的: compare の統計差分（comparison）だけを返す（include=stats と同じ）。"""
+    return compareSectionsResponse(base, target, request, ("stats",))
+
+@app.get("/datasets/compare/price")
+def compareDatasetPrices(base: int, target: int, request: Request):
+    """目的: compare の価格帯分析（price_range_analysis）だけを返す（include=price と同じ）。"""
+    return compareSectionsResponse(base, target, request, ("price",))
+
+@app.get("/datasets/compare/keywords")
+def compareDatasetKeywords(base: int, target: int, request: Request):
+    """目的: compare のキーワード分析（keyword_analysis）だけを返す（include=keywords と同じ）。"""
+    return compareSectionsResponse(base, target, request, ("keywords",))
+
+
+def parseCompareInclude(include: str | None) -> tuple[str, ...]:
+    """目的: include（カンマ区切り）を検証し、COMPARE_SECTIONS の順に並べた項目にする（省略時は全部）。"""
+    if include is None:
+        return COMPARE_SECTIONS
+    requested = {item.strip() for item in include.split(",") if item.strip()}
+    unknown = requested - set(COMPARE_SECTIONS)
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"include must be a comma-separated subset of {','.join(COMPARE_SECTIONS)}",
+        )
+    return tuple(section for section in COMPARE_SECTIONS if section in requested)
+
+
+def compareSectionsResponse(base: int, target: int, request: Request, sections: tuple[str, ...]) -> Response:
+    """目的: 指定した項目の比較結果を ETag 付きで返す（項目の組み合わせごとに ETag・キャッシュを分ける）。"""
+    etag = datasetEtag(f"compare:{','.join(sections)}", base, target) if base != target else None
+    return conditionalGet(request, etag, lambda: cachedComparison(base, target, sections))
+
+
+def cachedComparison(base: int, target: int, sections: tuple[str, ...] = COMPARE_SECTIONS) -> dict:
+    """目的: 比較結果を computeCache を通して返す（推移分析からも使う）。"""
+    return cachedCompute(("compare", base, target, sections), lambda: computeComparison(base, target, sections))
+
+
+def fetchRowColumns(db: Session, dataset_id: int, columns: list[str]) -> list[dict]:
+    """目的: 行データ（JSONB）から分析に使うカラムだけを取り出す（行全体を転送しない。無いカラムは None）。"""
+    statement = (
+        select(func.jsonb_build_object(*[arg for col in columns for arg in (col, DatasetRow.data[col])], type_=JSONB))
+        .where(DatasetRow.dataset_id == dataset_id)
+        .order_by(DatasetRow.row_index)
     )
+    return db.execute(statement).scalars().all()
 
-    # 9. レスポンスを返す
-    logger.info(f"GET /datasets/compare - Success: base={base}, target={target}")
-    return {
+
+def computeComparison(base: int, target: int, sections: tuple[str, ...] = COMPARE_SECTIONS) -> dict:
+    """目的: compareDatasets の比較本体（キャッシュを通さずにDBから計算する）。sections に無い分析は行わない。"""
+    logger.info(f"GET /datasets/compare?base={base}&target={target} - Comparing datasets ({','.join(sections)})")
+    
+    # 1. クエリパラメータの検証（同一ID指定はエラー）
+    if base == target:
+        logger.warning(f"GET /datasets/compare - Same ID specified: base={base}, target={target}")
+        raise HTTPException(
+            status_code=400,
+            detail="Cannot compare dataset with itself. Please specify different dataset IDs."
+        )
+    
+    # 価格帯・キーワード分析に使うカラム（どちらも含めない場合は行データを取得しない）
+    row_columns = [col for section, col in (("price", COMPARE_PRICE_COLUMN), ("keywords", COMPARE_TITLE_COLUMN)) if section in sections]
+
+    # 2〜4. DBからの取得（Server-Timing の fetch）
+    with span("fetch", "DB fetch"):
+        db = SessionLocal()
+        try:
+            # 2. 両データセットの存在チェック
+            base_dataset_statement = select(Dataset.id, Dataset.filename, Dataset.created_at).where(Dataset.id == base)
+            base_dataset_row = db.execute(base_dataset_statement).first()
+            if base_dataset_row is None:
+                logger.warning(f"GET /datasets/compare - Base dataset not found: {base}")
+                raise HTTPException(status_code=404, detail=f"Dataset not found: base={base}")
+        
+            target_dataset_statement = select(Dataset.id, Dataset.filename, Dataset.created_at).where(Dataset.id == target)
+            target_dataset_row = db.execute(target_dataset_statement).first()
+            if target_dataset_row is None:
+                logger.warning(f"GET /datasets/compare - Target dataset not found: {target}")
+                raise HTTPException(status_code=404, detail=f"Dataset not found: target={target}")
+        
+            # 3. 行数を取得
+            base_rows_statement = (
+                select(func.count(DatasetRow.id))
+                .select_from(DatasetRow)
+                .where(DatasetRow.dataset_id == base)
+            )
+            base_rows = db.execute(base_rows_statement).scalar_one()
+        
+            target_rows_statement = (
+                select(func.count(DatasetRow.id))
+                .select_from(DatasetRow)
+                .where(DatasetRow.dataset_id == target)
+            )
+            target_rows = db.execute(target_rows_statement).scalar_one()
+
+            # 4. 価格帯・キーワード分析のために、行データ（JSONB）から使うカラムだけを取得（E-2-2改善タスク1）
+            if row_columns:
+                base_jsonb_rows = fetchRowColumns(db, base, row_columns)
+                target_jsonb_rows = fetchRowColumns(db, target, row_columns)
+
+        except SQLAlchemyError as e:
+            logger.error(f"GET /datasets/compare - DB error: {type(e).__name__}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"DB error: {type(e).__name__}")
+        finally:
+            db.close()
+
+    result = {
         "base_dataset": {
             "dataset_id": base_dataset_row.id,
             "filename": base_dataset_row.filename,
@@ -338,14 +815,45 @@ def compareDatasets(base: int, target: int):
             "created_at": target_dataset_row.created_at,
             "rows": target_rows
         },
-        "comparison": comparison,
-        "price_range_analysis": price_range_analysis,
-        "keyword_analysis": keyword_analysis
     }
 
+    if "stats" in sections:
+        # 5. cachedDatasetStats() を2回呼び出して統計を取得
+        base_stats = cachedDatasetStats(base)
+        target_stats = cachedDatasetStats(target)
+
+        # 6. 統計差分を計算
+        result["comparison"] = calculate_stats_diff(base_stats, target_stats)
+
+    if "price" in sections:
+        # 7. 価格帯分析を実行（E-2-2改善タスク1）
+        result["price_range_analysis"] = compare_price_ranges(
+            base_rows=base_jsonb_rows,
+            target_rows=target_jsonb_rows,
+            price_column=COMPARE_PRICE_COLUMN
+        )
+
+    if "keywords" in sections:
+        # 8. キーワード分析を実行（E-2-2改善タスク2）
+        result["keyword_analysis"] = compare_keywords(
+            base_rows=base_jsonb_rows,
+            target_rows=target_jsonb_rows,
+            title_column=COMPARE_TITLE_COLUMN,
+            top_n=10
+        )
+
+    # 9. レスポンスを返す
+    logger.info(f"GET /datasets/compare - Success: base={base}, target={target}")
+    return result
+
 @app.get("/datasets/{dataset_id}")
-def getDatasetDetail(dataset_id: int):
-    """目的: 指定データセットのメタ情報・行数・先頭N行サンプルを返す。"""
+def getDatasetDetail(dataset_id: int, request: Request):
+    """目的: 指定データセットのメタ情報・行数・先頭N行サンプルを返す（ETag で再検証できる）。"""
+    return conditionalGet(request, datasetEtag("detail", dataset_id), lambda: computeDatasetDetail(dataset_id))
+
+
+def computeDatasetDetail(dataset_id: int) -> dict:
+    """目的: getDatasetDetail の本体（DBから取得する）。"""
     logger.info(f"GET /datasets/{dataset_id} - Fetching dataset detail")
     db = SessionLocal()
     try:
@@ -405,6 +913,8 @@ def deleteDataset(dataset_id: int):
         deleteStatement = delete(Dataset).where(Dataset.id == dataset_id)
         db.execute(deleteStatement)
         db.commit()
+        # 削除したデータセットを含む stats / compare 結果が残らないようにする（削除はまれなので全体を捨てる）
+        computeCache.clear()
         
         logger.info(f"DELETE /datasets/{dataset_id} - Successfully deleted")
         return None  # 204 No Content
@@ -418,8 +928,19 @@ def deleteDataset(dataset_id: int):
         db.close()
 
 @app.get("/datasets/{dataset_id}/stats")
-def getDatasetStats(dataset_id: int):
-    """目的: 指定データセットの行数・カラム一覧・各カラムの簡易要約（数値/文字列/混在）を返す。"""
+def getDatasetStats(dataset_id: int, request: Request):
+    """目的: 指定データセットの行数・カラム一覧・各カラムの簡易要約（数値/文字列/混在）を返す（ETag で再検証できる）。"""
+    return conditionalGet(request, datasetEtag("stats", dataset_id), lambda: cachedDatasetStats(dataset_id))
+
+
+def cachedDatasetStats(dataset_id: int) -> dict:
+    """目的: 集計結果を computeCache を通して返す（compare・分析からも使う）。"""
+    with span("stats", "Stats"):
+        return cachedCompute(("stats", dataset_id), lambda: computeDatasetStats(dataset_id))
+
+
+def computeDatasetStats(dataset_id: int) -> dict:
+    """目的: getDatasetStats の集計本体（キャッシュを通さずにDBから計算する）。"""
     logger.info(f"GET /datasets/{dataset_id}/stats - Computing statistics")
     db = SessionLocal()
     try:
@@ -545,12 +1066,177 @@ def getDatasetStats(dataset_id: int):
         db.close()
 
 
+@app.post("/datasets/stats:batch")
+def getDatasetStatsBatch(
+    dataset_ids: list[int] = Body(..., embed=True, min_length=1, max_length=STATS_BATCH_MAX_IDS),
+):
+    """目的: 複数データセットの stats（GET /datasets/{dataset_id}/stats と同じ形）を1回でまとめて返す。
+
+    computeCache にあるものはそのまま使い、残りは1つのセッションで dataset_id = ANY(:ids) の集合SQLにより
+    データセット数によらず一定のクエリ数で計算する。datasets は指定順（重複は除く）、存在しないIDは not_found に入れる。
+    """
+    datasetIds = list(dict.fromkeys(dataset_ids))
+    logger.info(f"POST /datasets/stats:batch - Fetching stats for {len(datasetIds)} datasets")
+    with span("stats", "Stats"):
+        stats: dict[int, dict] = {}
+        if computeCache.ttl_seconds > 0:
+            stats = {i: cached for i in datasetIds if (cached := computeCache.get(("stats", i))) is not None}
+        computed = computeDatasetStatsBatch([i for i in datasetIds if i not in stats])
+        for datasetId, value in computed.items():
+            if computeCache.ttl_seconds > 0:
+                computeCache.set(("stats", datasetId), value)
+            stats[datasetId] = value
+    return {
+        "datasets": [stats[i] for i in datasetIds if i in stats],
+        "not_found": [i for i in datasetIds if i not in stats],
+    }
+
+
+def computeDatasetStatsBatch(datasetIds: list[int]) -> dict[int, dict]:
+    """目的: computeDatasetStats と同じ集計を、複数データセットについて集合SQL（4クエリ）でまとめて行う。
+
+    カラムごとの要約は行ごとのキー（jsonb_object_keys）に展開して (dataset_id, カラム) で集約する。
+    キーのある行だけを数えるため present_count は (data ? col) と、他の値は全行で数えた場合と一致する。
+    """
+    if not datasetIds:
+        return {}
+    db = SessionLocal()
+    try:
+        # 1) dataset存在チェック
+        existing = db.execute(select(Dataset.id).where(Dataset.id.in_(datasetIds))).scalars().all()
+        if not existing:
+            return {}
+        params = {"ids": list(existing), "numeric_regex": NUMERIC_REGEX}
+
+        # 2) 行数
+        rowCounts = {
+            r.dataset_id: int(r.rows)
+            for r in db.execute(
+                text(
+                    """
+                    SELECT dataset_id, count(*) AS rows
+                    FROM dataset_rows
+                    WHERE dataset_id = ANY(:ids)
+                    GROUP BY dataset_id
+                    """
+                ),
+                params,
+            ).all()
+        }
+
+        # 3) カラム一覧と各カラムの要約（カラム名順）
+        summaryRows = db.execute(
+            text(
+                """
+                WITH extracted AS (
+                  SELECT r.dataset_id, k.col, nullif(btrim(r.data ->> k.col), '') AS v
+                  FROM dataset_rows r
+                  CROSS JOIN LATERAL jsonb_object_keys(r.data) AS k(col)
+                  WHERE r.dataset_id = ANY(:ids)
+                )
+                SELECT
+                  dataset_id,
+                  col,
+                  count(*) AS present_count,
+                  count(*) FILTER (WHERE v IS NOT NULL) AS non_empty_count,
+                  count(*) FILTER (WHERE v ~ :numeric_regex) AS numeric_count,
+                  min(CASE WHEN v ~ :numeric_regex THEN v::double precision END) AS min,
+                  max(CASE WHEN v ~ :numeric_regex THEN v::double precision END) AS max,
+                  avg(CASE WHEN v ~ :numeric_regex THEN v::double precision END) AS avg
+                FROM extracted
+                GROUP BY dataset_id, col
+                ORDER BY dataset_id, col ASC
+                """
+            ),
+            params,
+        ).mappings().all()
+
+        # 4) 非数値の上位頻出値（文字列・混在カラムのみ行が返る）
+        topRows = db.execute(
+            text(
+                """
+                WITH extracted AS (
+                  SELECT r.dataset_id, k.col, nullif(btrim(r.data ->> k.col), '') AS v
+                  FROM dataset_rows r
+                  CROSS JOIN LATERAL jsonb_object_keys(r.data) AS k(col)
+                  WHERE r.dataset_id = ANY(:ids)
+                ),
+                counted AS (
+                  SELECT dataset_id, col, v AS value, count(*) AS count
+                  FROM extracted
+                  WHERE v IS NOT NULL
+                    AND NOT (v ~ :numeric_regex)
+                  GROUP BY dataset_id, col, v
+                ),
+                ranked AS (
+                  SELECT *, row_number() OVER (PARTITION BY dataset_id, col ORDER BY count DESC, value ASC) AS rank
+                  FROM counted
+                )
+                SELECT dataset_id, col, value, count
+                FROM ranked
+                WHERE rank <= :limit
+                ORDER BY dataset_id, col, rank
+                """
+            ),
+            {**params, "limit": STRING_TOP_VALUES_LIMIT},
+        ).all()
+    except SQLAlchemyError as e:
+        logger.error(f"POST /datasets/stats:batch - DB error: {type(e).__name__}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"DB error: {type(e).__name__}")
+    finally:
+        db.close()
+
+    topValues: dict[tuple[int, str], list[dict]] = {}
+    for r in topRows:
+        topValues.setdefault((r.dataset_id, r.col), []).append({"value": r.value, "count": int(r.count)})
+
+    results = {
+        datasetId: {"dataset_id": datasetId, "rows": rowCounts.get(datasetId, 0), "columns": []}
+        for datasetId in existing
+    }
+    for summary in summaryRows:
+        nonEmptyCount = int(summary["non_empty_count"] or 0)
+        numericCount = int(summary["numeric_count"] or 0)
+        if nonEmptyCount == 0:
+            kind = "empty"
+        elif numericCount == nonEmptyCount:
+            kind = "number"
+        elif numericCount == 0:
+            kind = "string"
+        else:
+            kind = "mixed"
+        results[summary["dataset_id"]]["columns"].append(
+            {
+                "name": summary["col"],
+                "kind": kind,
+                "present_count": int(summary["present_count"] or 0),
+                "non_empty_count": nonEmptyCount,
+                "numeric": {
+                    "count": numericCount,
+                    "min": summary["min"],
+                    "max": summary["max"],
+                    "avg": summary["avg"],
+                }
+                if numericCount > 0
+                else None,
+                "top_values": topValues.get((summary["dataset_id"], summary["col"]), [])
+                if kind in ("string", "mixed")
+                else None,
+            }
+        )
+    return results
+
+
 @app.get("/datasets/{dataset_id}/analysis")
-def getDatasetAnalysis(dataset_id: int, llm: LLMClient = Depends(getLlmClient)):
+async def getDatasetAnalysis(
+    dataset_id: int,
+    llm: LLMClient = Depends(getLlmClient),
+    config: LLMConfig = Depends(getLlmConfig),
+):
     """目的: B-1の集計結果を入力として、PoC用の簡易テキスト要約（LLMなし）を返す。"""
     logger.info(f"GET /datasets/{dataset_id}/analysis - Generating analysis")
-    stats = getDatasetStats(dataset_id)
-    useLlm = os.getenv("ANALYSIS_USE_LLM", "0").strip() in ("1", "true", "yes", "on")
+    stats = await loadDatasetStats(dataset_id)
+    useLlm = isAnalysisLlmEnabled()
 
     if not useLlm:
         logger.info(f"GET /datasets/{dataset_id}/analysis - Using template analysis (LLM disabled)")
@@ -561,40 +1247,113 @@ def getDatasetAnalysis(dataset_id: int, llm: LLMClient = Depends(getLlmClient)):
     generatedAt = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     try:
         logger.info(f"GET /datasets/{dataset_id}/analysis - Calling LLM")
-        text = generate_llm_analysis_text(stats, llm)
+        async with llm_deadline(config.request_deadline_seconds):
+            text = await agenerate_llm_analysis_text(stats, llm, max_prompt_tokens=prompt_token_budget(config))
         logger.info(f"GET /datasets/{dataset_id}/analysis - LLM call succeeded (text_length={len(text)})")
+    except LLMCircuitOpenError as e:
+        logger.warning(f"GET /datasets/{dataset_id}/analysis - LLM circuit open; falling back to template analysis")
+        return {"dataset_id": dataset_id, **generate_template_analysis(stats), **degradedFields(e)}
     except LLMError as e:
         logger.error(
             f"GET /datasets/{dataset_id}/analysis - LLM error: {type(e).__name__} - {str(e)}",
             exc_info=True
         )
         # B-2-3: エラーハンドリング（PoCでも最低限）
-        status_code = 500
-        if isinstance(e, LLMTimeoutError):
-            status_code = 504
-        elif isinstance(e, LLMRateLimitError):
-            status_code = 503
-        elif isinstance(e, LLMAuthError):
-            status_code = 503
-        elif isinstance(e, LLMInputTooLargeError):
-            status_code = 413
-        elif isinstance(e, LLMProviderError):
-            status_code = 502
+        raise toLlmHttpException(e)
+    return {"dataset_id": dataset_id, "generated_at": generatedAt, "analysis_text": text}
 
-        raise HTTPException(
-            status_code=status_code,
-            detail={
-                "error": {
-                    "code": getattr(e, "code", "LLM_ERROR"),
-                    "message": str(e),
-                    "retryable": bool(getattr(e, "retryable", False)),
-                }
-            },
+@app.get("/datasets/{dataset_id}/analysis/stream")
+async def streamDatasetAnalysis(
+    dataset_id: int,
+    llm: LLMClient = Depends(getLlmClient),
+    config: LLMConfig = Depends(getLlmConfig),
+):
+    """目的: /datasets/{dataset_id}/analysis のストリーミング版。生成途中の分析テキストをSSEで逐次返す。"""
+    logPrefix = f"GET /datasets/{dataset_id}/analysis/stream"
+    logger.info(f"{logPrefix} - Streaming analysis")
+    stats = await loadDatasetStats(dataset_id)
+    meta = {"dataset_id": dataset_id}
+
+    if not isAnalysisLlmEnabled():
+        logger.info(f"{logPrefix} - Using template analysis (LLM disabled)")
+        return sseResponse(templateAnalysisEvents(meta, generate_template_analysis(stats)))
+
+    meta["generated_at"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    logger.info(f"{logPrefix} - Calling LLM (stream)")
+    chunks = astream_within_deadline(
+        astream_llm_analysis_text(stats, llm, max_prompt_tokens=prompt_token_budget(config)),
+        config.request_deadline_seconds,
+    )
+    return await startAnalysisStream(chunks, meta, logPrefix, lambda: generate_template_analysis(stats))
+
+def isPrewarmEnabled() -> bool:
+    """目的: 取り込み後の分析の事前計算（ANALYSIS_PREWARM）を行うかを判定する。"""
+    return os.getenv("ANALYSIS_PREWARM", "0").strip() in ("1", "true", "yes", "on")
+
+
+def findPreviousDatasetId(dataset_id: int) -> int | None:
+    """目的: 指定データセットの直前に取り込まれたデータセット（前回スナップショット）のIDを返す。"""
+    db = SessionLocal()
+    try:
+        statement = (
+            select(Dataset.id)
+            .where(Dataset.id < dataset_id)
+            .order_by(Dataset.id.desc())
+            .limit(1)
         )
-    return {"dataset_id": dataset_id, "generated_at": generatedAt, "analysis_text": text}
+        return db.execute(statement).scalar_one_or_none()
+    finally:
+        db.close()
+
+
+async def prewarmDatasetAnalyses(datasetId: int) -> None:
+    """目的: 取り込み直後に分析を先に計算し、最初に開いたユーザーがキャッシュヒットするようにする。
+
+    1. stats（computeCache）
+    2. データセット分析（LLM応答キャッシュ。LLM_CACHE_TTL_SECONDS > 0 の場合のみ）
+    3. 前回スナップショットとの compare + v2 推移分析（分析ジョブとして保存。POST .../analysis/jobs で再利用される）
+    失敗しても取り込み自体には影響させず、ログに残すだけにする。
+    """
+    logPrefix = f"prewarm dataset_id={datasetId}"
+    try:
+        stats = await loadDatasetStats(datasetId)
+        logger.info(f"{logPrefix} - Stats computed (columns={len(stats.get('columns') or [])})")
+
+        config = getLlmConfig()
+        llm: LLMClient | None = None
+        if isAnalysisLlmEnabled():
+            try:
+                llm = build_llm_client(config)
+            except LLMError as e:
+                logger.warning(f"{logPrefix} - LLM client unavailable ({e.code}); skipping LLM analyses")
+                return
+
+        if llm is not None and config.cache_ttl_seconds > 0:
+            try:
+                await agenerate_llm_analysis_text(stats, llm, max_prompt_tokens=prompt_token_budget(config))
+                logger.info(f"{logPrefix} - Dataset analysis cached")
+            except LLMError as e:
+                logger.warning(f"{logPrefix} - Dataset analysis failed ({e.code})")
+
+        previousId = await run_in_threadpool(findPreviousDatasetId, datasetId)
+        if previousId is None:
+            logger.info(f"{logPrefix} - No previous snapshot; skipping comparison")
+            return
+        job, created = await run_in_threadpool(
+            create_or_reuse_compare_job, previousId, datasetId, "v2", analysisEngine(config)
+        )
+        if created:
+            await runComparisonAnalysisJob(job["job_id"], previousId, datasetId, "v2", llm)
+        logger.info(f"{logPrefix} - Comparison with dataset_id={previousId} prepared (job_id={job['job_id']})")
+    except HTTPException as e:
+        # 事前計算中にデータセットが削除された場合など
+        logger.warning(f"{logPrefix} - Skipped (status={e.status_code})")
+    except Exception as e:
+        logger.error(f"{logPrefix} - Unexpected error: {type(e).__name__}", exc_info=True)
+
 
 @app.post("/datasets/upload")
-async def upload_dataset(file: UploadFile = File(...)):
+async def upload_dataset(backgroundTasks: BackgroundTasks, file: UploadFile = File(...)):
     """目的: CSVを受け取り、DBへ保存してdataset_idと行数を返す。"""
     logger.info(f"POST /datasets/upload - Uploading file: {file.filename}")
     
@@ -684,6 +1443,9 @@ async def upload_dataset(file: UploadFile = File(...)):
 
         db.commit()
         logger.info(f"POST /datasets/upload - Success: dataset_id={ds.id}, rows={len(rows)}, filename={file.filename}")
+        if isPrewarmEnabled():
+            # レスポンス返却後に実行する（アップロードの応答時間には含めない）
+            backgroundTasks.add_task(prewarmDatasetAnalyses, ds.id)
         return {"dataset_id": ds.id, "rows": len(rows), "filename": file.filename}
     except SQLAlchemyError as e:
         db.rollback()
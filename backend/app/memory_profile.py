@@ -0,0 +1,225 @@
+"""
+リクエストごとのメモリ計測（tracemalloc、MEMORY_PROFILE=1 のときだけ）。
+
+- 起動時に tracemalloc を開始し（MEMORY_PROFILE_FRAMES 段のスタックを記録）、リクエストごとに
+  開始時からのピーク増加量・終了時の残り（retained）を記録する
+- ピークがどこで確保されたかを残すため、処理中に監視スレッドが使用量を見て、
+  開始時から MEMORY_PROFILE_SNAPSHOT_MB 以上増えたら（以後は前回の 1.25 倍を超えるたびに）スナップショットを取り、
+  最後のスナップショットの確保元（ファイル:行）上位を記録する
+- 結果はログ（prism.backend.memory、ピークが MEMORY_PROFILE_WARN_MB を超えたら警告）と GET /admin/memory に出す
+- tracemalloc のピークはプロセス全体の値のため、同時に処理中のリクエストがあった場合は shared=true として記録する
+- tracemalloc は確保のたびに記録するため処理が数倍遅くなる。調査時だけ有効にすること
+- 計測はレスポンス本文を送り終えた時点で締める（送信後に実行する BackgroundTasks の確保は含めない）
+- 無効時はリクエストごとに tracemalloc.is_tracing() を見るだけ
+"""
+
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timezone
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .profiling import short_path
+
+logger = logging.getLogger("prism.backend.memory")
+
+MAX_RECORDS = 100
+TOP_SITES = 10
+POLL_INTERVAL_SECONDS = 0.01
+SNAPSHOT_GROWTH = 1.25
+MB = 1024 * 1024
+
+# tracemalloc 自身と import の確保は確保元の集計から除く
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def is_memory_profile_enabled() -> bool:
+    return os.getenv("MEMORY_PROFILE", "0") == "1"
+
+
+def snapshot_threshold_bytes() -> int:
+    return int(float(os.getenv("MEMORY_PROFILE_SNAPSHOT_MB", "20")) * MB)
+
+
+def warn_threshold_bytes() -> int:
+    return int(float(os.getenv("MEMORY_PROFILE_WARN_MB", "256")) * MB)
+
+
+def start_memory_profile_if_enabled() -> bool:
+    """MEMORY_PROFILE=1 なら tracemalloc を開始する（アプリ生成時に1回呼ぶ）。"""
+    if not is_memory_profile_enabled() or tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(int(os.getenv("MEMORY_PROFILE_FRAMES", "10")))
+    logger.warning("Memory profiling enabled (tracemalloc); requests will be slower")
+    return True
+
+
+def top_sites(snapshot: tracemalloc.Snapshot, limit: int = TOP_SITES) -> list[dict]:
+    """スナップショットの確保元（ファイル:行）を確保量の多い順に返す。"""
+    sites = []
+    for stat in snapshot.filter_traces(SNAPSHOT_FILTERS).statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        sites.append({"site": f"{short_path(frame.filename)}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count})
+    return sites
+
+
+class RequestMemory:
+    """1リクエスト分の計測（監視スレッドでピーク付近のスナップショットを取る）。"""
+
+    def __init__(self, threshold_bytes: int):
+        self.threshold_bytes = threshold_bytes
+        self.start_bytes = tracemalloc.get_traced_memory()[0]
+        self.max_seen_bytes = self.start_bytes
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.snapshot_bytes = 0
+        self.shared = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="request-memory", daemon=True)
+
+    def __enter__(self) -> "RequestMemory":
+        if self.threshold_bytes > 0:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        """監視スレッドを止める（何度呼んでもよい）。"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(POLL_INTERVAL_SECONDS):
+            self.poll()
+
+    def poll(self) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        self.max_seen_bytes = max(self.max_seen_bytes, current)
+        growth = current - self.start_bytes
+        if growth >= self.threshold_bytes and current > self.snapshot_bytes * SNAPSHOT_GROWTH:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_bytes = current
+
+
+class MemoryRecords:
+    def __init__(self, capacity: int = MAX_RECORDS):
+        self._lock = threading.Lock()
+        self._records: deque[dict] = deque(maxlen=capacity)
+        self._active: set[RequestMemory] = set()
+
+    def begin(self, measurement: RequestMemory) -> None:
+        with self._lock:
+            if not self._active:
+                # 他に処理中のリクエストが無いときだけピークを測り直す（あれば互いに shared になる）
+                tracemalloc.reset_peak()
+            else:
+                measurement.shared = True
+                for other in self._active:
+                    other.shared = True
+            self._active.add(measurement)
+
+    def end(self, measurement: RequestMemory) -> None:
+        with self._lock:
+            self._active.discard(measurement)
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def entries(self) -> list[dict]:
+        """新しい順に返す。"""
+        with self._lock:
+            return list(reversed(self._records))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+memory_records = MemoryRecords()
+
+
+def tracing_summary() -> dict:
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    return {"enabled": tracemalloc.is_tracing(), "traced_current_bytes": current, "traced_peak_bytes": peak}
+
+
+def _log_record(record: dict) -> None:
+    sites = ", ".join(f"{s['site']} {s['size_bytes'] / MB:.1f}MB" for s in record["top_sites"][:3])
+    message = (
+        f"{record['method']} {record['route']} - memory peak +{record['peak_bytes'] / MB:.1f}MB "
+        f"(retained {record['retained_bytes'] / MB:+.1f}MB{', shared' if record['shared'] else ''})"
+        + (f" top: {sites}" if sites else "")
+    )
+    if record["peak_bytes"] > warn_threshold_bytes():
+        logger.warning(f"{message} - exceeds MEMORY_PROFILE_WARN_MB")
+    else:
+        logger.info(message)
+
+
+class MemoryProfileMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracemalloc.is_tracing():
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        finished = False
+
+        def finish() -> None:
+            # 最後の本文を送った時点で締める（その後に Starlette が同じ呼び出しの中で実行する
+            # BackgroundTasks の確保と時間は、このリクエストに数えない）
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            measurement.stop()
+            memory_records.end(measurement)
+            current, peak = tracemalloc.get_traced_memory()
+            route = scope.get("route")
+            record = {
+                "recorded_at": recorded_at,
+                "method": scope["method"],
+                "route": getattr(route, "path", scope["path"]),
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started_at) * 1000, 3),
+                "start_bytes": measurement.start_bytes,
+                "peak_bytes": max(peak, measurement.max_seen_bytes) - measurement.start_bytes,
+                "retained_bytes": current - measurement.start_bytes,
+                "shared": measurement.shared,
+                "top_sites": top_sites(measurement.snapshot) if measurement.snapshot is not None else [],
+            }
+            memory_records.add(record)
+            _log_record(record)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        recorded_at = datetime.now(timezone.utc).isoformat()
+        started_at = time.perf_counter()
+        measurement = RequestMemory(snapshot_threshold_bytes())
+        memory_records.begin(measurement)
+        try:
+            with measurement:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
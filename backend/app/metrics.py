@@ -0,0 +1,209 @@
+"""
+プロセス内のメトリクス（カウンタ/ゲージ/ヒストグラム）。
+
+- 外部ライブラリに依存しない最小実装（Prometheus のデータモデルに合わせ、ヒストグラムは累積バケット）
+- ラベル値はメトリクス定義時の labelnames の順で位置引数として渡す（呼び出しごとの dict 生成を避ける）
+- 値はワーカープロセスごとに保持する（複数ワーカーの集計は収集側で行う）
+- render_prometheus で Prometheus のテキスト形式（0.0.4）に書き出す
+"""
+
+import bisect
+import math
+import threading
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # ラベル値 → [バケットごとの件数（非累積、末尾は +Inf）, 合計]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            item = self._values.get(labelvalues)
+            if item is None:
+                item = [[0] * (len(self.buckets) + 1), 0.0]
+                self._values[labelvalues] = item
+            item[0][index] += 1
+            item[1] += value
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, counts, total in items:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                buckets["+Inf" if bound == math.inf else f"{bound:g}"] = cumulative
+            samples.append(
+                {"labels": dict(zip(self.labelnames, key)), "count": cumulative, "sum": total, "buckets": buckets}
+            )
+        return samples
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric name: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def metrics(self, prefix: str = "") -> list:
+        with self._lock:
+            return [m for name, m in sorted(self._metrics.items()) if name.startswith(prefix)]
+
+    def snapshot(self, prefix: str = "") -> dict[str, dict]:
+        return {
+            m.name: {"type": m.type, "help": m.documentation, "samples": m.snapshot()}
+            for m in self.metrics(prefix)
+        }
+
+    def reset(self) -> None:
+        for m in self.metrics():
+            m.reset()
+
+
+registry = MetricsRegistry()
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str], extra: tuple[str, str] | None = None) -> str:
+    items = list(labels.items())
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus(metrics_registry: MetricsRegistry = registry) -> str:
+    """レジストリの全メトリクスを Prometheus のテキスト形式（exposition format 0.0.4）で返す。"""
+    lines = []
+    for m in metrics_registry.metrics():
+        lines.append(f"# HELP {m.name} {m.documentation}")
+        lines.append(f"# TYPE {m.name} {m.type}")
+        for sample in m.snapshot():
+            labels = sample["labels"]
+            if m.type != "histogram":
+                lines.append(f"{m.name}{_format_labels(labels)} {_format_value(sample['value'])}")
+                continue
+            for bound, count in sample["buckets"].items():
+                lines.append(f"{m.name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+            lines.append(f"{m.name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+            lines.append(f"{m.name}_count{_format_labels(labels)} {sample['count']}")
+    return "\n".join(lines) + "\n"
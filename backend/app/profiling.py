@@ -0,0 +1,195 @@
+"""
+リクエスト単位のオンデマンドプロファイル（?profile=1 と X-Admin-Token を付けたリクエストだけ）。
+
+- サンプリング方式: 別スレッドが PROFILE_SAMPLE_INTERVAL_MS ごとに全スレッドのスタックを記録する
+  （同期エンドポイントはスレッドプール、非同期部分はイベントループで動くため、1スレッドだけを見る cProfile では足りない）
+- 結果は flamegraph.pl / speedscope で読める collapsed 形式（"スレッド;関数;関数 件数" の行）
+- 待機中のスレッド（select / queue.get など）のサンプルは除く
+- 同時に処理中の他のリクエストのスタックも混ざる（負荷の低いときに使う想定）
+- 直近 MAX_PROFILES 件をワーカープロセス内に保持し、レスポンスの X-Profile-Id で取り出す
+- ?profile=1 の無いリクエストは、クエリ文字列の確認だけで素通しする
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from types import FrameType
+
+from starlette.datastructures import QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admin import is_admin_token
+
+MAX_PROFILES = 20
+MAX_STACK_DEPTH = 128
+PROFILE_QUERY_PARAM = "profile"
+
+# スタックの先頭（最も内側）がこれらなら、そのスレッドは待機中とみなす
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+}
+
+
+def profile_sample_interval_seconds() -> float:
+    return float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+
+def short_path(filename: str) -> str:
+    for marker in ("site-packages/", "/lib/python"):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _is_idle(frame: FrameType) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class StackSampler:
+    """一定間隔で全スレッドのスタックを集計する（collapsed 形式のキー → サンプル数）。"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        self.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == own or _is_idle(frame):
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}").replace(";", ","))
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    def __init__(self, capacity: int = MAX_PROFILES):
+        self._lock = threading.Lock()
+        self._profiles: deque[dict] = deque(maxlen=capacity)
+        self._next_id = 1
+
+    def next_id(self) -> int:
+        with self._lock:
+            profile_id = self._next_id
+            self._next_id += 1
+            return profile_id
+
+    def add(self, profile: dict) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: int) -> dict | None:
+        with self._lock:
+            return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+    def summaries(self) -> list[dict]:
+        """新しい順に、スタック本体を除いた情報を返す。"""
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "collapsed"} for p in reversed(self._profiles)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+async def _send_forbidden(send: Send) -> None:
+    body = json.dumps({"detail": "Admin token required"}).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 403,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def profile_requested(query_string: bytes) -> bool:
+    """クエリ文字列で profile=1 が指定されているか（profile=10 や xprofile=1 などは対象外。重複時は FastAPI と同じく最後の値）。"""
+    if PROFILE_QUERY_PARAM.encode() not in query_string:
+        return False
+    return QueryParams(query_string).get(PROFILE_QUERY_PARAM) == "1"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not profile_requested(scope.get("query_string", b"")):
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(b"x-admin-token")
+        if not is_admin_token(token.decode("latin-1") if token is not None else None):
+            await _send_forbidden(send)
+            return
+
+        profile_id = profile_store.next_id()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [*message.get("headers", []), (b"x-profile-id", str(profile_id).encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        recorded_at = datetime.now(timezone.utc).isoformat()
+        started_at = time.perf_counter()
+        sampler = StackSampler(profile_sample_interval_seconds())
+        try:
+            with sampler:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            profile_store.add(
+                {
+                    "id": profile_id,
+                    "recorded_at": recorded_at,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 3),
+                    "interval_ms": round(sampler.interval_seconds * 1000, 3),
+                    "samples": sampler.samples,
+                    "collapsed": sampler.collapsed(),
+                }
+            )
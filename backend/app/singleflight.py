@@ -0,0 +1,239 @@
+"""
+同一計算の相乗り（single-flight）。
+
+- 同じキーの計算が実行中なら、新しい呼び出しは計算を始めずにその結果を待つ
+- ワーカー内: asyncio のタスクを共有する（SingleFlight）
+- ワーカー間（任意）: Postgres の advisory lock で先行ワーカーを1つに決め、
+  結果を llm_results テーブル経由で後続ワーカーへ受け渡す（SingleFlightLLMClient）
+- 先行ワーカーはLLM呼び出しの間ロックのコネクションを持ち続けるため、ロックは通常のプールとは別の
+  小さなプール（LLM_SINGLE_FLIGHT_LOCK_POOL_SIZE 本）で取る。使い切っている間の新しい計算は、
+  ワーカー間の協調をせずにそのまま呼ぶ（通常のDBアクセスのコネクションを食い潰さない）
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from typing import Any
+
+from .llm import LLMClient, LLMConfig, agenerate_text, astream_text, prompt_cache_key
+
+logger = logging.getLogger("prism.backend.llm")
+
+
+class SingleFlight:
+    """キーごとに実行中の計算を1つに絞り、同時に来た呼び出しで結果を共有する。"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        # 呼び出し元がキャンセルされても、相乗りしている他の呼び出しのために計算は続ける
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 待ち手が全員キャンセルされた場合でも「例外が取得されなかった」警告を出さない
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+# リクエストごとにクライアントを組み立てるため、実行中の計算はプロセス内で共有する
+llm_flight = SingleFlight()
+
+
+def _advisory_lock_id(key: str) -> int:
+    """sha256 hex キーを pg_advisory_lock 用の符号付き64bit整数に変換する。"""
+    return int.from_bytes(bytes.fromhex(key[:16]), "big", signed=True)
+
+
+def single_flight_lock_pool_size() -> int:
+    return int(os.getenv("LLM_SINGLE_FLIGHT_LOCK_POOL_SIZE", "4"))
+
+
+_lock_engine = None
+_lock_engine_guard = threading.Lock()
+
+
+def lock_engine():
+    """advisory lock 専用のエンジン（空きがなければ待たずに sqlalchemy.exc.TimeoutError）。"""
+    global _lock_engine
+    with _lock_engine_guard:
+        if _lock_engine is None:
+            from sqlalchemy import create_engine
+
+            from .db import DATABASE_URL
+
+            _lock_engine = create_engine(
+                DATABASE_URL,
+                pool_pre_ping=True,
+                pool_size=single_flight_lock_pool_size(),
+                max_overflow=0,
+                pool_timeout=0,
+            )
+        return _lock_engine
+
+
+class _AdvisoryLock:
+    """セッションレベルの advisory lock を専用プールのコネクションで保持する。"""
+
+    def __init__(self, key: str):
+        self.lock_id = _advisory_lock_id(key)
+        self.connection = None
+
+    def try_acquire(self) -> bool:
+        from sqlalchemy import text
+
+        connection = lock_engine().connect()
+        try:
+            acquired = bool(
+                connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": self.lock_id}).scalar()
+            )
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def release(self) -> None:
+        from sqlalchemy import text
+
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": self.lock_id})
+            self.connection.commit()
+        except Exception:
+            # 解放に失敗したコネクションをプールへ戻すとロックが残るため、破棄する
+            logger.warning("Failed to release advisory lock; invalidating connection", exc_info=True)
+            self.connection.invalidate()
+        finally:
+            self.connection.close()
+            self.connection = None
+
+
+def load_shared_result(key: str, max_age_seconds: float) -> str | None:
+    from sqlalchemy import text
+
+    from .db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            text(
+                """
+                SELECT text FROM llm_results
+                WHERE key = :key AND created_at > now() - make_interval(secs => :max_age)
+                """
+            ),
+            {"key": key, "max_age": max_age_seconds},
+        ).first()
+        return row.text if row is not None else None
+    finally:
+        db.close()
+
+
+def store_shared_result(key: str, value: str, max_age_seconds: float) -> None:
+    from sqlalchemy import text
+
+    from .db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            text(
+                """
+                INSERT INTO llm_results (key, text, created_at) VALUES (:key, :text, now())
+                ON CONFLICT (key) DO UPDATE SET text = EXCLUDED.text, created_at = EXCLUDED.created_at
+                """
+            ),
+            {"key": key, "text": value},
+        )
+        # 受け渡し用の一時置き場なので、古い結果はついでに掃除する
+        db.execute(
+            text("DELETE FROM llm_results WHERE created_at < now() - make_interval(secs => :max_age)"),
+            {"max_age": max_age_seconds},
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class SingleFlightLLMClient:
+    """
+    LLMClient をラップし、同一プロンプトの同時呼び出しを1回のLLM呼び出しにまとめる。
+    - 対象は agenerate のみ。astream はチャンクを共有できないため、そのまま内側に渡す
+    """
+
+    def __init__(self, inner: LLMClient, config: LLMConfig, flight: SingleFlight | None = None):
+        self.inner = inner
+        self.config = config
+        self.flight = flight if flight is not None else llm_flight
+
+    def generate(self, prompt: str) -> str:
+        return self.inner.generate(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        key = prompt_cache_key(self.config, prompt)
+        if self.config.single_flight_shared:
+            return await self.flight.run(key, lambda: self._agenerate_shared(key, prompt))
+        return await self.flight.run(key, lambda: agenerate_text(self.inner, prompt))
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in astream_text(self.inner, prompt):
+            yield chunk
+
+    async def _agenerate_shared(self, key: str, prompt: str) -> str:
+        """advisory lock を取れたワーカーだけがLLMを呼び、他のワーカーは結果の書き込みを待つ。"""
+        max_age = self.config.single_flight_wait_seconds
+        deadline = time.monotonic() + self.config.single_flight_wait_seconds
+        from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+        while True:
+            lock = _AdvisoryLock(key)
+            try:
+                acquired = await asyncio.to_thread(lock.try_acquire)
+            except PoolTimeoutError:
+                # 先行中の計算がロック用プールの上限に達している
+                logger.warning("Single-flight lock pool exhausted; calling LLM without coordination")
+                return await agenerate_text(self.inner, prompt)
+            if acquired:
+                try:
+                    # ロック待ちの間に先行ワーカーが書き込んでいれば、それを使う
+                    shared = await asyncio.to_thread(load_shared_result, key, max_age)
+                    if shared is not None:
+                        return shared
+                    text = await agenerate_text(self.inner, prompt)
+                    await asyncio.to_thread(store_shared_result, key, text, max_age)
+                    return text
+                finally:
+                    await asyncio.to_thread(lock.release)
+
+            shared = await asyncio.to_thread(load_shared_result, key, max_age)
+            if shared is not None:
+                return shared
+            if time.monotonic() >= deadline:
+                # 先行ワーカーが戻らない場合は、協調を諦めて自分で呼ぶ
+                logger.warning("Single-flight wait timed out; calling LLM without coordination")
+                return await agenerate_text(self.inner, prompt)
+            await asyncio.sleep(self.config.single_flight_poll_seconds)
@@ -0,0 +1,140 @@
+"""
+遅いSQLの記録（DB_SLOW_QUERY_MS を超えた文の SQL・パラメータ・実行時間・実行計画）。
+
+- 既定は無効（DB_SLOW_QUERY_MS=0）。有効時も閾値未満の文は時間の比較だけで終わる
+- 記録は直近 DB_SLOW_QUERY_LOG_SIZE 件のリングバッファに保持する（ワーカープロセス単位）
+- SELECT / WITH の文は、同じパラメータで EXPLAIN (ANALYZE, BUFFERS) を取り直して実行計画を添える
+  - ANALYZE は文をもう一度実行するため、専用スレッドで非同期に取り、元のリクエストを待たせない
+  - 計画取得は常にロールバックし、statement_timeout で打ち切る（DB_SLOW_QUERY_EXPLAIN=0 で計画取得を無効化）
+  - 取得待ちが溜まっている間に来た文は、計画を取らずに記録だけ残す
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("prism.backend.db")
+
+EXPLAIN_TIMEOUT_MS = 30_000
+MAX_PENDING_EXPLAINS = 4
+MAX_STATEMENT_CHARS = 4000
+MAX_PARAMETER_CHARS = 200
+EXPLAINABLE_OPERATIONS = ("SELECT", "WITH")
+
+# 計画取得スレッド自身が実行するSQL（SET / EXPLAIN）は記録しない
+_explaining: ContextVar[bool] = ContextVar("slow_query_explaining", default=False)
+
+
+def slow_query_threshold_ms() -> float:
+    return float(os.getenv("DB_SLOW_QUERY_MS", "0"))
+
+
+def is_explain_enabled() -> bool:
+    return os.getenv("DB_SLOW_QUERY_EXPLAIN", "1") == "1"
+
+
+def _short_value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) > MAX_PARAMETER_CHARS:
+        return text[:MAX_PARAMETER_CHARS] + f"...({len(text)} chars)"
+    return text
+
+
+def _summarize_parameters(parameters):
+    """JSONで返せる形に縮める（長い文字列は切り詰める）。"""
+    if isinstance(parameters, dict):
+        return {str(k): _short_value(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_short_value(v) for v in parameters]
+    return _short_value(parameters)
+
+
+class SlowQueryLog:
+    """遅いSQLのリングバッファと、実行計画の非同期取得。"""
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries: deque[dict] = deque(maxlen=capacity)
+        self._next_id = 1
+        self._pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    def maybe_record(
+        self, engine: Engine, operation: str, statement: str, parameters, elapsed: float, executemany: bool
+    ) -> dict | None:
+        """elapsed（秒）が閾値を超えていれば記録する（cursor_execute のイベントから呼ぶ）。"""
+        threshold_ms = slow_query_threshold_ms()
+        if threshold_ms <= 0 or elapsed * 1000 < threshold_ms or _explaining.get():
+            return None
+
+        explain = is_explain_enabled() and not executemany and operation in EXPLAINABLE_OPERATIONS
+        entry = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "operation": operation,
+            "statement": statement[:MAX_STATEMENT_CHARS],
+            "parameters": _summarize_parameters(parameters[0] if executemany and parameters else parameters),
+            "executemany": len(parameters) if executemany and parameters else None,
+            "plan": None,
+            "plan_status": "pending" if explain else "skipped",
+        }
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+            if explain and self._pending >= MAX_PENDING_EXPLAINS:
+                entry["plan_status"] = "skipped"
+                explain = False
+            if explain:
+                self._pending += 1
+            self._entries.append(entry)
+
+        logger.warning(
+            f"Slow query ({entry['duration_ms']:.1f}ms > DB_SLOW_QUERY_MS={threshold_ms:g}): "
+            f"{' '.join(statement.split())[:200]}"
+        )
+        if explain:
+            self._explain_executor().submit(self._explain, engine, entry, statement, parameters)
+        return entry
+
+    def _explain_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+            return self._executor
+
+    def _explain(self, engine: Engine, entry: dict, statement: str, parameters) -> None:
+        _explaining.set(True)
+        try:
+            with engine.connect() as conn:
+                # 計画取得は結果を残さない（with を抜けるとロールバックされる）
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                rows = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).all()
+            plan, status = "\n".join(row[0] for row in rows), "ok"
+        except Exception as e:
+            logger.warning(f"EXPLAIN for slow query #{entry['id']} failed: {type(e).__name__}: {e}")
+            plan, status = None, f"error: {type(e).__name__}"
+        with self._lock:
+            entry["plan"] = plan
+            entry["plan_status"] = status
+            self._pending -= 1
+
+    def entries(self) -> list[dict]:
+        """新しい順に返す。"""
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._entries)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(capacity=int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", "100")))
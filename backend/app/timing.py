@@ -0,0 +1,82 @@
+"""
+リクエスト内の処理区間（span）の計測（Server-Timing ヘッダ・ログ用）。
+
+- with span("stats", "Stats"): で囲んだ区間（または @span(...) を付けた関数）の経過時間を、
+  現在のリクエスト（track_spans のブロック）に名前ごとに合算する（同じ名前が複数回なら合計時間と回数）
+- ContextVar で持つため、run_in_threadpool で実行した同期処理の区間も同じリクエストに記録される
+- リクエスト外（ジョブ・事前計算・ベンチマーク）では ContextVar を見るだけで何もしない
+- 区間は入れ子・重複してよい（Server-Timing は各区間を独立に表示する）
+- HttpMetricsMiddleware が Server-Timing ヘッダとログに出す
+  ヘッダはレスポンス開始時点の値のため、SSE の送信中に記録した区間はログにだけ出る
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class SpanTimings:
+    """1リクエスト中の区間ごとの合計時間と回数（スレッドプールからも記録されるためロックで保護する）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: dict[str, dict] = {}
+        self.closed = False
+
+    def close(self) -> None:
+        """以降の記録を無視する（レスポンス送信後に実行する BackgroundTasks の区間を数えないため）。"""
+        with self._lock:
+            self.closed = True
+
+    def record(self, name: str, seconds: float, desc: str | None = None) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            entry = self._spans.setdefault(name, {"seconds": 0.0, "count": 0, "desc": desc})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def items(self) -> list[tuple[str, dict]]:
+        """記録した順（最初に記録した時点の順）に返す。"""
+        with self._lock:
+            return [(name, dict(entry)) for name, entry in self._spans.items()]
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+
+_span_timings: ContextVar[SpanTimings | None] = ContextVar("span_timings", default=None)
+
+
+@contextmanager
+def track_spans():
+    """ブロック内（スレッドプールで実行した処理を含む）の区間を SpanTimings に集計する。"""
+    timings = SpanTimings()
+    token = _span_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _span_timings.reset(token)
+
+
+@contextmanager
+def span(name: str, desc: str | None = None):
+    """区間の経過時間を現在のリクエストに記録する（name は Server-Timing のトークンとして使える英数字）。"""
+    timings = _span_timings.get()
+    if timings is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record(name, time.perf_counter() - started_at, desc)
+
+
+def server_timing_entry(name: str, seconds: float, desc: str | None = None) -> str:
+    entry = f"{name};dur={seconds * 1000:.1f}"
+    if desc:
+        quoted = desc.replace('"', "'")
+        entry += f';desc="{quoted}"'
+    return entry
@@ -0,0 +1,252 @@
+"""
+分析モジュールのホットパスのベンチマーク（処理時間・スループット・ピークメモリ）とベースライン比較。
+
+サンプルCSVを模した合成データ（benchmarks/synthetic.py）を base/target の2つ作り、
+価格抽出・キーワード比較・統計差分・プロンプト組み立てを行数ごとに計測する。
+- 時間は repeat 回（1回が短い関数は合計 MIN_MEASURE_SECONDS 以上）の中央値、スループットは処理した行数（または呼び出し回数）/秒
+- メモリは tracemalloc で計った関数内のピーク（計測は時間とは別の実行で行う）
+- --save-baseline で結果を baselines/bench_analysis.json に保存し、次回以降は比率を表示する
+  --check を付けると、時間かメモリが --tolerance 倍を超えて悪化した項目があれば終了コード1で終わる
+- ベースラインは計測したマシンに依存するため、比較は同じマシン（同じコンテナ設定）で行う
+- 1M行では入力だけで約1.3GBを使い、1CPUで30分ほどかかる（普段は --sizes 10000 100000 で回す）
+
+実行例（backend/ で）:
+    python -m benchmarks.bench_analysis
+    python -m benchmarks.bench_analysis --sizes 10000 100000 --check
+    python -m benchmarks.bench_analysis --save-baseline
+"""
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.analysis import (
+    build_comparison_prompt_v1,
+    build_comparison_prompt_v2,
+    build_prompt_v1,
+    calculate_stats_diff,
+    classify_price_range,
+    compare_keywords,
+    compare_price_ranges,
+    extract_keywords_from_titles,
+    extract_price_value,
+)
+from benchmarks.synthetic import iter_rows, load_sample_pools
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "bench_analysis.json"
+TOP_VALUES_LIMIT = 5
+# 1回が短い関数は、合計がこの秒数に達するまで繰り返して中央値のぶれを抑える
+MIN_MEASURE_SECONDS = 0.2
+
+
+def _is_number(value: str) -> bool:
+    try:
+        return math.isfinite(float(value))
+    except ValueError:
+        return False
+
+
+def stats_from_rows(dataset_id: int, rows: list[dict]) -> dict:
+    """B-1 stats（GET /datasets/{id}/stats）と同じ形の統計をPython側で作る。"""
+    columns = []
+    for name in sorted({key for row in rows[:1] for key in row}):
+        values = [v.strip() for v in (row.get(name) or "" for row in rows) if v.strip()]
+        numbers = [float(v) for v in values if _is_number(v)]
+        if not values:
+            kind = "empty"
+        elif len(numbers) == len(values):
+            kind = "number"
+        elif not numbers:
+            kind = "string"
+        else:
+            kind = "mixed"
+        top_values = None
+        if kind in ("string", "mixed"):
+            counts = Counter(v for v in values if not _is_number(v))
+            top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:TOP_VALUES_LIMIT]
+            top_values = [{"value": v, "count": c} for v, c in top]
+        columns.append(
+            {
+                "name": name,
+                "kind": kind,
+                "present_count": len(rows),
+                "non_empty_count": len(values),
+                "numeric": {
+                    "count": len(numbers),
+                    "min": min(numbers),
+                    "max": max(numbers),
+                    "avg": sum(numbers) / len(numbers),
+                }
+                if numbers
+                else None,
+                "top_values": top_values,
+            }
+        )
+    return {"dataset_id": dataset_id, "rows": len(rows), "columns": columns}
+
+
+def build_cases(rows_count: int) -> list[tuple[str, int, Callable[[], object]]]:
+    """(名前, 1回で処理する件数, 計測する関数) の一覧。compare 系は base/target の両方を処理する。"""
+    pools = load_sample_pools()
+    base_rows = list(iter_rows(rows_count, seed=1, pools=pools))
+    target_rows = list(iter_rows(rows_count, seed=2, pools=pools))
+    prices = [row["UnitPrice"] for row in target_rows]
+    price_values = [extract_price_value(p) for p in prices]
+    base_stats = stats_from_rows(1, base_rows)
+    target_stats = stats_from_rows(2, target_rows)
+    comparison_data = {
+        "base_dataset": {"dataset_id": 1, "filename": "base.csv", "created_at": "2025-12-17T10:28:30Z"},
+        "target_dataset": {"dataset_id": 2, "filename": "target.csv", "created_at": "2025-12-24T10:28:30Z"},
+        "comparison": calculate_stats_diff(base_stats, target_stats),
+        "price_range_analysis": compare_price_ranges(base_rows, target_rows),
+        "keyword_analysis": compare_keywords(base_rows, target_rows),
+    }
+    return [
+        ("extract_price_value", rows_count, lambda: [extract_price_value(p) for p in prices]),
+        ("classify_price_range", rows_count, lambda: [classify_price_range(v) for v in price_values]),
+        ("extract_keywords_from_titles", rows_count, lambda: extract_keywords_from_titles(target_rows)),
+        ("compare_keywords", rows_count * 2, lambda: compare_keywords(base_rows, target_rows)),
+        ("compare_price_ranges", rows_count * 2, lambda: compare_price_ranges(base_rows, target_rows)),
+        ("calculate_stats_diff", 1, lambda: calculate_stats_diff(base_stats, target_stats)),
+        ("build_prompt_v1", 1, lambda: build_prompt_v1(target_stats)),
+        ("build_comparison_prompt_v1", 1, lambda: build_comparison_prompt_v1(comparison_data)),
+        ("build_comparison_prompt_v2", 1, lambda: build_comparison_prompt_v2(comparison_data)),
+    ]
+
+
+def measure_seconds(fn: Callable[[], object], repeat: int) -> float:
+    timings: list[float] = []
+    while len(timings) < repeat or sum(timings) < MIN_MEASURE_SECONDS:
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def measure_peak_bytes(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(
+    sizes: list[int], repeat: int, with_memory: bool, baseline: dict[str, dict[str, dict]]
+) -> dict[str, dict[str, dict]]:
+    """行数 → 関数名 → {seconds, items_per_second, peak_bytes}（行数ごとに計測し終えたら表示する）。"""
+    results: dict[str, dict[str, dict]] = {}
+    print_header()
+    for rows_count in sizes:
+        # 行数が多いほど1回が長いので、10k行を基準に繰り返し回数を減らす
+        size_repeat = max(1, round(repeat * 10_000 / rows_count))
+        cases = build_cases(rows_count)
+        results[str(rows_count)] = {}
+        for name, items, fn in cases:
+            seconds = measure_seconds(fn, size_repeat)
+            results[str(rows_count)][name] = {
+                "seconds": seconds,
+                "items_per_second": items / seconds if seconds > 0 else math.inf,
+                "peak_bytes": measure_peak_bytes(fn) if with_memory else None,
+            }
+        del cases
+        print_results({str(rows_count): results[str(rows_count)]}, baseline)
+    return results
+
+
+def _ratio(current: float | None, baseline: float | None) -> float | None:
+    if current is None or not baseline:
+        return None
+    return current / baseline
+
+
+def compare_with_baseline(
+    results: dict[str, dict[str, dict]], baseline: dict[str, dict[str, dict]], tolerance: float
+) -> list[str]:
+    """時間かピークメモリがベースラインの tolerance 倍を超えた項目（"行数 関数名 指標 xN.NN"）を返す。"""
+    regressions = []
+    for size, cases in results.items():
+        for name, result in cases.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                ratio = _ratio(result.get(metric), base.get(metric))
+                if ratio is not None and ratio > tolerance:
+                    regressions.append(f"{size} {name} {metric} x{ratio:.2f}")
+    return regressions
+
+
+def print_header() -> None:
+    print(f"{'rows':>9} {'function':<30} {'median_ms':>10} {'items/s':>12} {'peak_MB':>8} {'vs_base':>8}", flush=True)
+
+
+def print_results(results: dict[str, dict[str, dict]], baseline: dict[str, dict[str, dict]]) -> None:
+    for size, cases in results.items():
+        for name, result in cases.items():
+            ratio = _ratio(result["seconds"], baseline.get(size, {}).get(name, {}).get("seconds"))
+            peak = "-" if result["peak_bytes"] is None else f"{result['peak_bytes'] / 1e6:.2f}"
+            print(
+                f"{size:>9} {name:<30} {result['seconds'] * 1000:>10.2f} {result['items_per_second']:>12,.0f} "
+                f"{peak:>8} {'-' if ratio is None else f'x{ratio:.2f}':>8}",
+                flush=True,
+            )
+
+
+def load_baseline(path: Path) -> dict[str, dict[str, dict]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))["results"]
+
+
+def save_baseline(path: Path, results: dict[str, dict[str, dict]]) -> None:
+    merged = {**load_baseline(path), **results}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": merged,
+    }
+    path.write_text(json.dumps(document, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5, help="10k行での繰り返し回数（行数に反比例して減らす）")
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc によるピークメモリ計測を省く")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="ベースラインより悪化した項目があれば終了コード1")
+    parser.add_argument("--tolerance", type=float, default=1.3)
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    results = run(args.sizes, args.repeat, not args.no_memory, baseline)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"saved baseline: {args.baseline}")
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"regressions over x{args.tolerance:g}:")
+        for line in regressions:
+            print(f"  {line}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+APIのエンドツーエンドベンチマーク（データ量・テーブルの大きさに対するレイテンシとスループット）。
+
+変化（drift）付きの合成スナップショット（benchmarks/synthetic.py）を N 件取り込み（= upload の計測）、
+続けて stats / compare / list / detail を指定した同時実行数で叩き、
+エンドポイントごとに件数・ステータス内訳・スループット・p50/p95/p99 を表示する。
+- stats / detail は取り込んだデータセットを、compare は隣り合うスナップショットの組を順に使う
+  （同じIDへの同時リクエストは相乗りされるため、ばらして実際の計算を計る）
+- --rows に複数の行数を渡すと、行数ごとに取り込みからやり直す
+- --keep を付けない限り、終了時に取り込んだデータセットを削除する
+- 誤って共有環境に負荷をかけないよう、接続先はループバック（docker compose で公開した localhost）に限る
+  compose ネットワーク内から実行する場合は --allow-host backend のように明示する
+- 結果を比べる場合は backend 側を ANALYSIS_CACHE_TTL_SECONDS=0（既定）で起動し、キャッシュの効果を除く
+
+実行例（backend/ で、docker compose up 済みの状態）:
+    python -m benchmarks.bench_api --rows 1000 10000 --snapshots 8 --concurrency 8 --requests 200
+    python -m benchmarks.bench_api --endpoint stats compare --json /tmp/bench_api.json
+"""
+
+import argparse
+import asyncio
+import io
+import ipaddress
+import json
+import socket
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+
+from benchmarks.load_analysis import EndpointResult, percentile
+from benchmarks.synthetic import write_snapshot_csv
+
+ENDPOINTS = ("stats", "compare", "list", "detail")
+
+
+def ensure_local(base_url: str, allowed_hosts: list[str]) -> None:
+    """接続先がループバック（または明示的に許可したホスト）でなければ終了する。"""
+    host = urlsplit(base_url).hostname or ""
+    if host in allowed_hosts:
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as e:
+        raise SystemExit(f"Cannot resolve {host}: {e}")
+    if not addresses or not all(ipaddress.ip_address(a.split("%")[0]).is_loopback for a in addresses):
+        raise SystemExit(f"Refusing to benchmark non-local host {host} ({', '.join(sorted(addresses))})")
+
+
+def snapshot_csv(rows_count: int, snapshot: int) -> bytes:
+    buffer = io.BytesIO()
+    write_snapshot_csv(buffer, snapshot, rows_count)
+    return buffer.getvalue()
+
+
+async def timed(result: EndpointResult, request) -> httpx.Response | None:
+    started = time.perf_counter()
+    try:
+        resp = await request()
+    except httpx.HTTPError as e:
+        result.errors[type(e).__name__] += 1
+        return None
+    result.latencies.append(time.perf_counter() - started)
+    result.statuses[str(resp.status_code)] += 1
+    return resp
+
+
+async def drive(concurrency: int, jobs: list) -> float:
+    """jobs（引数なしのコルーチン関数）を concurrency 本で順に消化し、経過秒を返す。"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker() -> None:
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await job()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def endpoint_path(name: str, i: int, dataset_ids: list[int]) -> str:
+    dataset_id = dataset_ids[i % len(dataset_ids)]
+    if name == "stats":
+        return f"/datasets/{dataset_id}/stats"
+    if name == "detail":
+        return f"/datasets/{dataset_id}"
+    if name == "compare":
+        pair = i % (len(dataset_ids) - 1)
+        return f"/datasets/compare?base={dataset_ids[pair]}&target={dataset_ids[pair + 1]}"
+    return "/datasets"
+
+
+async def run_size(client: httpx.AsyncClient, rows_count: int, args: argparse.Namespace) -> dict[str, dict]:
+    results: dict[str, EndpointResult] = defaultdict(EndpointResult)
+    elapsed: dict[str, float] = {}
+    dataset_ids: list[int] = []
+
+    # 1) 取り込み（CSVは先に作っておき、生成時間を計測に含めない）
+    payloads = [snapshot_csv(rows_count, snapshot) for snapshot in range(args.snapshots)]
+
+    def upload_job(snapshot: int):
+        async def job() -> None:
+            files = {"file": (f"bench_{rows_count}_{snapshot:03d}.csv", payloads[snapshot], "text/csv")}
+            resp = await timed(results["upload"], lambda: client.post("/datasets/upload", files=files))
+            if resp is not None and resp.status_code == 200:
+                dataset_ids.append(int(resp.json()["dataset_id"]))
+
+        return job
+
+    elapsed["upload"] = await drive(args.upload_concurrency, [upload_job(s) for s in range(args.snapshots)])
+    dataset_ids.sort()
+    if len(dataset_ids) < 2:
+        raise SystemExit(f"Upload failed: {dict(results['upload'].statuses)} {dict(results['upload'].errors)}")
+
+    try:
+        # 2) 読み取り系（エンドポイントごとに順に計測する）
+        for name in args.endpoint:
+
+            def read_job(i: int, name: str = name):
+                path = endpoint_path(name, i, dataset_ids)
+                return lambda: timed(results[name], lambda: client.get(path))
+
+            elapsed[name] = await drive(args.concurrency, [read_job(i) for i in range(args.requests)])
+    finally:
+        if not args.keep:
+            for dataset_id in dataset_ids:
+                await client.delete(f"/datasets/{dataset_id}")
+
+    return {name: summarize(result, elapsed[name]) for name, result in results.items()}
+
+
+def summarize(result: EndpointResult, elapsed: float) -> dict:
+    ms = [v * 1000 for v in result.latencies]
+    statuses = dict(result.statuses)
+    statuses.update({f"error:{k}": v for k, v in result.errors.items()})
+    return {
+        "count": len(ms),
+        "rps": len(ms) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else float("nan"),
+        "statuses": statuses,
+    }
+
+
+def report(rows_count: int, summaries: dict[str, dict]) -> None:
+    for name in ("upload", *ENDPOINTS):
+        s = summaries.get(name)
+        if s is None:
+            continue
+        print(
+            f"{rows_count:>8} {name:<8} {s['count']:>6} {s['rps']:>8.2f} {s['p50_ms']:>8.1f} "
+            f"{s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f}  {json.dumps(s['statuses'])}",
+            flush=True,
+        )
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict[str, dict]]:
+    ensure_local(args.base_url, args.allow_host)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    all_results: dict[str, dict[str, dict]] = {}
+    print(
+        f"base_url={args.base_url} snapshots={args.snapshots} concurrency={args.concurrency} "
+        f"requests={args.requests}"
+    )
+    print(f"{'rows':>8} {'endpoint':<8} {'count':>6} {'rps':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'max_ms':>8}  statuses")
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for rows_count in args.rows:
+            all_results[str(rows_count)] = await run_size(client, rows_count, args)
+            report(rows_count, all_results[str(rows_count)])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": all_results}, f, indent=2, ensure_ascii=False)
+    return all_results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--allow-host", nargs="*", default=[], help="ループバック以外で許可するホスト名")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="スナップショット1件の行数")
+    parser.add_argument("--snapshots", type=int, default=8, help="取り込むスナップショット数（2以上）")
+    parser.add_argument("--endpoint", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upload-concurrency", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=100, help="読み取り系エンドポイントごとのリクエスト数")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--keep", action="store_true", help="取り込んだデータセットを削除しない")
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+    if args.snapshots < 2:
+        parser.error("--snapshots must be at least 2 (compare needs a pair)")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+build_prompt_v1 のベンチマーク（プロンプトサイズと組み立て時間）。
+
+列数が数百〜千のデータセットを模した stats を合成し、ASCII/日本語の頻出値それぞれで
+組み立て時間（中央値）・文字数・推定トークン数・含まれた列数を表示する。
+
+実行例（backend/ で）:
+    python -m benchmarks.bench_prompt
+    python -m benchmarks.bench_prompt --columns 200 500 --budget 4000
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from app.analysis import build_prompt_v1
+from app.llm import DEFAULT_PROMPT_TOKEN_BUDGET, estimate_tokens
+
+VALUE_STYLES = {
+    "ascii": "Senior Python Engineer (Remote) ",
+    "ja": "【急募】Pythonエンジニア募集（リモート可）",
+}
+
+
+def make_stats(columns_count: int, value: str, *, rows: int = 1000, top_values: int = 5) -> dict:
+    """B-1 stats と同じ形の合成データ（数値列と文字列列が交互、埋まり具合は列ごとに変える）。"""
+    columns = []
+    for i in range(columns_count):
+        non_empty = rows - (i * 37) % rows
+        if i % 2 == 0:
+            columns.append(
+                {
+                    "name": f"metric_{i:04d}",
+                    "kind": "number",
+                    "present_count": rows,
+                    "non_empty_count": non_empty,
+                    "numeric": {"count": non_empty, "min": 0.0, "max": float(i * 100), "avg": float(i * 50)},
+                    "top_values": None,
+                }
+            )
+        else:
+            columns.append(
+                {
+                    "name": f"label_{i:04d}",
+                    "kind": "string",
+                    "present_count": rows,
+                    "non_empty_count": non_empty,
+                    "numeric": None,
+                    "top_values": [
+                        {"value": f"{value}{i}-{k}", "count": max(1, non_empty // (k + 2))}
+                        for k in range(top_values)
+                    ],
+                }
+            )
+    return {"rows": rows, "columns": columns}
+
+
+def included_columns(prompt: str) -> int:
+    marker = "stats_summary_json:\n"
+    if marker not in prompt:
+        return 0
+    json_part = prompt.split(marker, 1)[1].split("\n\n注意:", 1)[0].strip()
+    return int(json.loads(json_part)["included_columns_count"])
+
+
+def run(columns_list: list[int], budget: int, repeat: int) -> None:
+    print(f"budget={budget} tokens, repeat={repeat}")
+    print(f"{'columns':>8} {'values':>6} {'median_ms':>10} {'chars':>7} {'tokens':>7} {'included':>8}")
+    for columns_count in columns_list:
+        for style, value in VALUE_STYLES.items():
+            stats = make_stats(columns_count, value)
+            timings = []
+            prompt = ""
+            for _ in range(repeat):
+                started = time.perf_counter()
+                prompt = build_prompt_v1(stats, max_prompt_tokens=budget)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f"{columns_count:>8} {style:>6} {statistics.median(timings):>10.2f} "
+                f"{len(prompt):>7} {estimate_tokens(prompt):>7} {included_columns(prompt):>8}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--columns", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--budget", type=int, default=DEFAULT_PROMPT_TOKEN_BUDGET)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.columns, args.budget, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
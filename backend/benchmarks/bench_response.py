@@ -0,0 +1,119 @@
+"""
+レスポンスの直列化と圧縮のベンチマーク（大きな compare のペイロードの時間と転送バイト数）。
+
+合成データ（benchmarks/synthetic.py）の base/target から GET /datasets/compare と同じ形のペイロードを作る。
+stats の列を --columns の数まで複製して columns_change を大きくし、列数ごとに次を計測する。
+- 直列化（中央値）:
+  json = 以前の経路（jsonable_encoder + Starlette の JSONResponse）
+  encoder+orjson = 既定の ORJSONResponse（jsonable_encoder を通す。LLM分析など一般のエンドポイント）
+  orjson = ORJSONResponse に dict を直接渡す経路（stats / compare / 詳細）
+- 圧縮: app.compression と同じレベルの gzip / br の時間と、圧縮後のバイト数
+
+実行例（backend/ で）:
+    python -m benchmarks.bench_response
+    python -m benchmarks.bench_response --rows 10000 --columns 20 200 1000 --json /tmp/bench_response.json
+"""
+
+import argparse
+import json
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.analysis import calculate_stats_diff, compare_keywords, compare_price_ranges
+from app.compression import COMPRESSORS
+from benchmarks.bench_analysis import measure_seconds, stats_from_rows
+from benchmarks.synthetic import iter_rows, load_sample_pools
+
+SERIALIZERS: dict[str, Callable[[dict], bytes]] = {
+    "json": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+    "encoder+orjson": lambda payload: ORJSONResponse(jsonable_encoder(payload)).body,
+    "orjson": lambda payload: ORJSONResponse(payload).body,
+}
+
+
+def widen_stats(stats: dict, columns: int) -> dict:
+    """列を名前を変えて複製し、columns 列の stats にする（幅の広いCSVを模す）。"""
+    original = stats["columns"]
+    widened = [
+        {**original[i % len(original)], "name": f"{original[i % len(original)]['name']}_{i // len(original)}"}
+        for i in range(max(columns, len(original)))
+    ]
+    return {**stats, "columns": widened}
+
+
+def build_payload(rows_count: int, columns: int) -> dict:
+    """compare のレスポンスと同じ形（created_at は datetime のまま）のペイロードを作る。"""
+    pools = load_sample_pools()
+    base_rows = list(iter_rows(rows_count, seed=1, pools=pools))
+    target_rows = list(iter_rows(rows_count, seed=2, pools=pools))
+    created_at = datetime(2025, 12, 17, 10, 28, 30, tzinfo=timezone.utc)
+    return {
+        "base_dataset": {"dataset_id": 1, "filename": "base.csv", "created_at": created_at, "rows": rows_count},
+        "target_dataset": {
+            "dataset_id": 2,
+            "filename": "target.csv",
+            "created_at": created_at + timedelta(days=7),
+            "rows": rows_count,
+        },
+        "comparison": calculate_stats_diff(
+            widen_stats(stats_from_rows(1, base_rows), columns), widen_stats(stats_from_rows(2, target_rows), columns)
+        ),
+        "price_range_analysis": compare_price_ranges(base_rows, target_rows),
+        "keyword_analysis": compare_keywords(base_rows, target_rows),
+    }
+
+
+def measure(payload: dict, repeat: int) -> dict:
+    result: dict = {}
+    for name, serialize in SERIALIZERS.items():
+        result[f"{name}_seconds"] = measure_seconds(lambda: serialize(payload), repeat)
+    body = SERIALIZERS["orjson"](payload)
+    assert json.loads(body) == json.loads(SERIALIZERS["json"](payload))
+    result["raw_bytes"] = len(body)
+    for encoding, compress in COMPRESSORS.items():
+        result[f"{encoding}_seconds"] = measure_seconds(lambda: compress(body), repeat)
+        result[f"{encoding}_bytes"] = len(compress(body))
+    return result
+
+
+def report(columns: int, r: dict) -> None:
+    print(
+        f"{columns:>7} {r['raw_bytes'] / 1000:>9.1f} {r['json_seconds'] * 1000:>8.2f} "
+        f"{r['encoder+orjson_seconds'] * 1000:>9.2f} {r['orjson_seconds'] * 1000:>8.2f} "
+        f"{r['gzip_seconds'] * 1000:>8.2f} {r['gzip_bytes'] / 1000:>8.1f} "
+        f"{r['br_seconds'] * 1000:>8.2f} {r['br_bytes'] / 1000:>8.1f}",
+        flush=True,
+    )
+
+
+def run(rows_count: int, column_counts: list[int], repeat: int) -> dict[str, dict]:
+    results: dict[str, dict] = {}
+    print(f"rows={rows_count} (times are median ms, sizes are KB)")
+    print(
+        f"{'columns':>7} {'raw_KB':>9} {'json':>8} {'enc+orj':>9} {'orjson':>8} "
+        f"{'gzip':>8} {'gzip_KB':>8} {'br':>8} {'br_KB':>8}"
+    )
+    for columns in column_counts:
+        results[str(columns)] = measure(build_payload(rows_count, columns), repeat)
+        report(columns, results[str(columns)])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="base/target それぞれの行数")
+    parser.add_argument("--columns", type=int, nargs="+", default=[20, 200, 1000], help="stats の列数")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+    results = run(args.rows, args.columns, args.repeat)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
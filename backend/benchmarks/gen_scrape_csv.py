@@ -0,0 +1,62 @@
+"""
+スクレイピングCSVを模した大きな合成CSVの生成（スナップショット間の変化付き）。
+
+benchmarks/synthetic.py の write_snapshot_csv で、スナップショットを1ファイルずつ書き出す。
+ファイル名は scrape_<ingestBatchId>.csv（スナップショットごとに1週間ずつ進む）。
+行数（--rows）か、1ファイルあたりのおおよそのサイズ（--size、例: 500MB / 2GB）で大きさを決める。
+
+実行例（backend/ で）:
+    python -m benchmarks.gen_scrape_csv --out-dir /tmp/scrape --snapshots 4 --rows 1000000
+    python -m benchmarks.gen_scrape_csv --out-dir /tmp/scrape --snapshots 2 --size 1GB --drift 0.2
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import FIRST_SCRAPED_AT, SNAPSHOT_INTERVAL, write_snapshot_csv
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1_000, "MB": 1_000_000, "GB": 1_000_000_000}
+WRITE_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def parse_size(value: str) -> int:
+    """"500MB" / "1.5GB" / "2000" をバイト数にする（10進の単位）。"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", value.upper())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def snapshot_filename(snapshot: int) -> str:
+    scraped_at = FIRST_SCRAPED_AT + SNAPSHOT_INTERVAL * snapshot
+    return f"scrape_{scraped_at.strftime('%Y%m%dT%H%M%SZ')}.csv"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", type=Path, required=True)
+    parser.add_argument("--snapshots", type=int, default=2)
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--rows", type=int, help="1ファイルあたりの行数")
+    size.add_argument("--size", type=parse_size, help="1ファイルあたりのおおよそのサイズ（例: 500MB, 2GB）")
+    parser.add_argument("--drift", type=float, default=0.1, help="スナップショット1つあたりの変化の割合")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for snapshot in range(args.snapshots):
+        path = args.out_dir / snapshot_filename(snapshot)
+        started = time.perf_counter()
+        with open(path, "wb", buffering=WRITE_BUFFER_BYTES) as f:
+            rows = write_snapshot_csv(
+                f, snapshot, args.rows, target_bytes=args.size, seed=args.seed, drift=args.drift
+            )
+        elapsed = time.perf_counter() - started
+        size_mb = path.stat().st_size / 1e6
+        print(f"{path} rows={rows} size={size_mb:.1f}MB {size_mb / elapsed:.1f}MB/s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+分析エンドポイントの負荷試験（スループットとテールレイテンシ）。
+
+指定した同時実行数でリクエストを送り続け、エンドポイントごとに
+件数・ステータス内訳・スループット・p50/p95/p99 を表示する。
+ストリーミング（SSE）エンドポイントは、最初の delta までの時間（TTFT）も計測する。
+
+LLMを実際に待たせるには、backend を mock_gemini に向けて起動しておく（benchmarks/mock_gemini.py 参照）。
+同一プロンプトは相乗り/キャッシュされるため、LLM呼び出しそのものの同時実行を見たい場合は
+backend 側で LLM_SINGLE_FLIGHT=0 / LLM_CACHE_TTL_SECONDS=0 にしておく。
+
+実行例（backend/ で）:
+    python -m benchmarks.load_analysis --upload ../samples/playwright_scrape_sample.csv \\
+        --endpoint analysis compare-analysis-stream --concurrency 16 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+ENDPOINTS = ("analysis", "analysis-stream", "compare-analysis", "compare-analysis-stream")
+
+
+@dataclass
+class EndpointResult:
+    latencies: list[float] = field(default_factory=list)
+    first_chunk_latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """最近接順位法のパーセンタイル（values が空なら nan）。"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def endpoint_path(name: str, dataset_id: int, base: int, target: int, version: str) -> str:
+    if name == "analysis":
+        return f"/datasets/{dataset_id}/analysis"
+    if name == "analysis-stream":
+        return f"/datasets/{dataset_id}/analysis/stream"
+    if name == "compare-analysis":
+        return f"/datasets/compare/analysis?base={base}&target={target}&version={version}"
+    return f"/datasets/compare/analysis/stream?base={base}&target={target}&version={version}"
+
+
+async def send_one(client: httpx.AsyncClient, name: str, path: str, result: EndpointResult) -> None:
+    started = time.perf_counter()
+    try:
+        if name.endswith("-stream"):
+            async with client.stream("GET", path) as resp:
+                status = resp.status_code
+                first_chunk = None
+                async for line in resp.aiter_lines():
+                    if not line.startswith("event:"):
+                        continue
+                    event = line[len("event:"):].strip()
+                    if event == "delta" and first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    elif event == "error":
+                        status = "stream-error"
+                if first_chunk is not None:
+                    result.first_chunk_latencies.append(first_chunk)
+        else:
+            resp = await client.get(path)
+            status = resp.status_code
+    except httpx.HTTPError as e:
+        result.errors[type(e).__name__] += 1
+        return
+    result.latencies.append(time.perf_counter() - started)
+    result.statuses[str(status)] += 1
+
+
+async def upload_datasets(client: httpx.AsyncClient, paths: list[str]) -> list[int]:
+    ids = []
+    for path in paths:
+        p = Path(path)
+        files = {"file": (p.name, p.read_bytes(), "text/csv")}
+        resp = await client.post("/datasets/upload", files=files)
+        resp.raise_for_status()
+        ids.append(int(resp.json()["dataset_id"]))
+    return ids
+
+
+async def run(args: argparse.Namespace) -> dict[str, EndpointResult]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        dataset_ids = list(args.dataset_id or [])
+        if args.upload:
+            dataset_ids += await upload_datasets(client, args.upload)
+        if not dataset_ids:
+            raise SystemExit("Specify --dataset-id or --upload")
+        if len(dataset_ids) == 1 and any(e.startswith("compare") for e in args.endpoint):
+            # 比較には2つ必要なので、同じCSVをもう一度取り込む
+            if not args.upload:
+                raise SystemExit("compare endpoints need two --dataset-id values (or --upload)")
+            dataset_ids += await upload_datasets(client, args.upload[:1])
+        base, target = dataset_ids[0], dataset_ids[-1]
+
+        results: dict[str, EndpointResult] = defaultdict(EndpointResult)
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(args.requests):
+            name = args.endpoint[i % len(args.endpoint)]
+            queue.put_nowait((name, endpoint_path(name, target, base, target, args.version)))
+
+        async def worker() -> None:
+            while True:
+                try:
+                    name, path = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await send_one(client, name, path, results[name])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report(results, elapsed, args)
+    return results
+
+
+def report(results: dict[str, EndpointResult], elapsed: float, args: argparse.Namespace) -> None:
+    print(f"base_url={args.base_url} concurrency={args.concurrency} requests={args.requests} elapsed={elapsed:.2f}s")
+    header = f"{'endpoint':<24} {'count':>6} {'rps':>7} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'ttft_p50':>9} {'ttft_p95':>9}  statuses"
+    print(header)
+    for name, r in sorted(results.items()):
+        ms = [v * 1000 for v in r.latencies]
+        ttft = [v * 1000 for v in r.first_chunk_latencies]
+        statuses = dict(r.statuses)
+        if r.errors:
+            statuses.update({f"error:{k}": v for k, v in r.errors.items()})
+        print(
+            f"{name:<24} {len(ms):>6} {len(ms) / elapsed:>7.2f} "
+            f"{percentile(ms, 50):>8.1f} {percentile(ms, 95):>8.1f} {percentile(ms, 99):>8.1f} "
+            f"{max(ms) if ms else float('nan'):>8.1f} "
+            f"{percentile(ttft, 50):>9.1f} {percentile(ttft, 95):>9.1f}  {json.dumps(statuses)}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--endpoint", nargs="+", choices=ENDPOINTS, default=["analysis"])
+    parser.add_argument("--dataset-id", type=int, nargs="+", help="既存データセット（比較は先頭と末尾を使う）")
+    parser.add_argument("--upload", nargs="+", help="試験前に取り込むCSV")
+    parser.add_argument("--version", default="v2", help="推移分析のプロンプト版")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
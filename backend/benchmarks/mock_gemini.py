@@ -0,0 +1,248 @@
+"""
+Gemini API（Google AI Studio）互換のローカルモックサーバ（負荷試験・レイテンシ試験用）。
+
+StubLLMClient は即座に返るため、LLM待ちの間の同時実行の振る舞いを再現できない。
+このモックは GeminiAiStudioClient から GEMINI_API_BASE_URL 経由で呼べ、実APIのクォータを消費しない。
+
+- POST /v1beta/models/{model}:generateContent
+- POST /v1beta/models/{model}:streamGenerateContent?alt=sse（SSEでチャンクを分けて返す）
+- レイテンシ分布、429/5xx の注入率、Retry-After（RetryInfo.retryDelay）を設定できる
+- GET/PUT /mock/config で実行中に設定を変更、GET /mock/stats で受信数や最大同時実行数を確認できる
+
+起動例（backend/ で）:
+    MOCK_GEMINI_LATENCY=lognormal:800,0.5 MOCK_GEMINI_RATE_429=0.05 \\
+        uvicorn benchmarks.mock_gemini:app --port 8090
+    # backend 側
+    LLM_PROVIDER=gemini LLM_API_KEY=dummy ANALYSIS_USE_LLM=1 GEMINI_API_BASE_URL=http://localhost:8090 ...
+
+レイテンシ指定（ミリ秒）:
+    fixed:MS / uniform:MIN,MAX / normal:MEAN,STD / lognormal:MEDIAN,SIGMA
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+from dataclasses import asdict, dataclass, replace
+
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm import estimate_tokens
+
+LATENCY_KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+
+def parse_latency(spec: str) -> tuple[str, list[float]]:
+    """"lognormal:800,0.5" → ("lognormal", [800.0, 0.5])"""
+    kind, _, args = spec.strip().partition(":")
+    kind = kind.strip().lower()
+    if kind not in LATENCY_KINDS:
+        raise ValueError(f"Unsupported latency distribution: {spec!r}")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    expected = 1 if kind == "fixed" else 2
+    if len(values) != expected:
+        raise ValueError(f"Latency {kind!r} needs {expected} value(s): {spec!r}")
+    return kind, values
+
+
+def sample_latency_seconds(spec: str, rng: random.Random) -> float:
+    kind, values = parse_latency(spec)
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = rng.uniform(values[0], values[1])
+    elif kind == "normal":
+        ms = rng.gauss(values[0], values[1])
+    else:
+        ms = values[0] * math.exp(rng.gauss(0.0, values[1]))
+    return max(0.0, ms) / 1000.0
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    latency: str = "lognormal:800,0.5"
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    status_5xx: int = 503
+    retry_after_seconds: float = 1.0
+    response_chars: int = 600
+    stream_chunks: int = 8
+    # ストリーミング時、最初のチャンクまでにかける時間の割合（残りを後続チャンクに均等に割り振る）
+    first_chunk_ratio: float = 0.3
+
+    @staticmethod
+    def from_env() -> "MockConfig":
+        return MockConfig(
+            latency=os.getenv("MOCK_GEMINI_LATENCY", "lognormal:800,0.5"),
+            rate_429=float(os.getenv("MOCK_GEMINI_RATE_429", "0")),
+            rate_5xx=float(os.getenv("MOCK_GEMINI_RATE_5XX", "0")),
+            status_5xx=int(os.getenv("MOCK_GEMINI_5XX_STATUS", "503")),
+            retry_after_seconds=float(os.getenv("MOCK_GEMINI_RETRY_AFTER_SECONDS", "1")),
+            response_chars=int(os.getenv("MOCK_GEMINI_RESPONSE_CHARS", "600")),
+            stream_chunks=int(os.getenv("MOCK_GEMINI_STREAM_CHUNKS", "8")),
+            first_chunk_ratio=float(os.getenv("MOCK_GEMINI_FIRST_CHUNK_RATIO", "0.3")),
+        )
+
+
+class MockState:
+    def __init__(self, config: MockConfig, seed: int | None = None):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.injected: dict[str, int] = {"429": 0, "5xx": 0}
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "injected": dict(self.injected),
+        }
+
+
+def build_response_text(prompt: str, chars: int) -> str:
+    """分析結果らしい見出し付きの日本語テキストを、おおよそ指定文字数で返す（プロンプトに依存して決まる）。"""
+    seed = sum(prompt.encode("utf-8")) % 997
+    lines = ["## 注目点", f"- モック応答（seed={seed}）"]
+    filler = "- 件数と単価の傾向を確認してください。"
+    while sum(len(line) + 1 for line in lines) < chars:
+        lines.append(filler)
+    lines += ["## 前提・限界", "- これはローカルモックの応答です。"]
+    return "\n".join(lines) + "\n"
+
+
+def _content_chunk(text: str, prompt_tokens: int, output_tokens: int) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+    }
+
+
+def _error_response(status: int, retry_after: float) -> JSONResponse:
+    google_status = "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"
+    body = {
+        "error": {
+            "code": status,
+            "message": f"Injected error from mock Gemini server ({google_status})",
+            "status": google_status,
+            "details": [
+                {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_after:g}s"}
+            ],
+        }
+    }
+    return JSONResponse(status_code=status, content=body)
+
+
+def _extract_prompt(payload: dict) -> str:
+    try:
+        parts = payload["contents"][0]["parts"]
+        return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+    except (KeyError, IndexError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid GenerateContentRequest")
+
+
+def create_app(config: MockConfig | None = None, seed: int | None = None) -> FastAPI:
+    mock_app = FastAPI(title="mock-gemini")
+    state = MockState(config or MockConfig.from_env(), seed=seed)
+    mock_app.state.mock = state
+
+    def _inject_error(cfg: MockConfig) -> JSONResponse | None:
+        roll = state.rng.random()
+        if roll < cfg.rate_429:
+            state.injected["429"] += 1
+            return _error_response(429, cfg.retry_after_seconds)
+        if roll < cfg.rate_429 + cfg.rate_5xx:
+            state.injected["5xx"] += 1
+            return _error_response(cfg.status_5xx, cfg.retry_after_seconds)
+        return None
+
+    @mock_app.post("/v1beta/models/{target}")
+    async def generate(target: str, request: Request):
+        model, _, method = target.partition(":")
+        if method not in ("generateContent", "streamGenerateContent"):
+            raise HTTPException(status_code=404, detail=f"Unknown method: {method}")
+        if not request.query_params.get("key"):
+            return JSONResponse(status_code=403, content={"error": {"code": 403, "message": "API key missing"}})
+
+        prompt = _extract_prompt(await request.json())
+        cfg = state.config
+        latency = sample_latency_seconds(cfg.latency, state.rng)
+        error = _inject_error(cfg)
+
+        state.requests += 1
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+
+        if method == "generateContent" or error is not None:
+            try:
+                await asyncio.sleep(latency)
+            finally:
+                state.in_flight -= 1
+            if error is not None:
+                return error
+            text = build_response_text(prompt, cfg.response_chars)
+            return _content_chunk(text, estimate_tokens(prompt), estimate_tokens(text))
+
+        text = build_response_text(prompt, cfg.response_chars)
+        return StreamingResponse(
+            _stream_chunks(state, cfg, prompt, text, latency), media_type="text/event-stream"
+        )
+
+    @mock_app.get("/mock/config")
+    def get_config():
+        return asdict(state.config)
+
+    @mock_app.put("/mock/config")
+    def update_config(changes: dict = Body(...)):
+        """実行中に設定を部分更新する（例: {"rate_429": 0.2, "latency": "fixed:2000"}）。"""
+        unknown = set(changes) - set(asdict(state.config))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown config keys: {sorted(unknown)}")
+        updated = replace(state.config, **changes)
+        try:
+            parse_latency(updated.latency)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        state.config = updated
+        return asdict(updated)
+
+    @mock_app.get("/mock/stats")
+    def get_stats():
+        return state.stats()
+
+    @mock_app.post("/mock/reset")
+    def reset_stats():
+        state.reset()
+        return state.stats()
+
+    return mock_app
+
+
+async def _stream_chunks(state: MockState, cfg: MockConfig, prompt: str, text: str, latency: float):
+    chunks = max(1, cfg.stream_chunks)
+    size = math.ceil(len(text) / chunks)
+    pieces = [text[i : i + size] for i in range(0, len(text), size)]
+    first_delay = latency * cfg.first_chunk_ratio
+    rest_delay = (latency - first_delay) / max(1, len(pieces) - 1)
+    prompt_tokens = estimate_tokens(prompt)
+    try:
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(first_delay if i == 0 else rest_delay)
+            event = _content_chunk(piece, prompt_tokens, estimate_tokens(piece))
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n"
+    finally:
+        state.in_flight -= 1
+
+
+app = create_app()
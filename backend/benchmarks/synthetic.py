@@ -0,0 +1,270 @@
+"""
+スクレイピングCSV（samples/playwright_scrape_sample.csv）を模した合成データの生成。
+
+iter_rows: サンプルCSVの値を頻度どおりに組み合わせた行（分析ベンチマークのベースラインはこれで取っている）
+- 列構成と各列の値の出現頻度はサンプルCSVから取る（値の組み合わせは行ごとにランダム）
+- 行番号・ページ・URL は行ごとに振り直し、件数を増やしても重複しないようにする
+
+iter_snapshot_csv / write_snapshot_csv: サンプルCSVに依存しない、スナップショット間の変化（drift）付きの行
+- Title は技術キーワード（app/keywords.py）と案件名の定型文の組み合わせ、UnitPrice はサンプルと同じ4形式
+  （"¥ 50万 〜 60万" / "200,000 円 ~ 300,000 円 / 固定" / "2,500 ~ 2,900 円 / 時" / "後で決める"）
+- スナップショット番号が進むごとに、一部のキーワードが増え/減り、新しいキーワードが現れ/消え、
+  単価の水準と WorkStyle の比率が drift の割合で動く
+- Title / UnitPrice はスナップショットごとの候補から引き、CSVの行はバッチ単位で組み立てて逐次書き出す
+  （GB単位の入力も作れる）
+
+どちらも同じ seed（と snapshot）なら同じ内容になる。
+"""
+
+import csv
+import itertools
+import math
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO
+
+from app.keywords import TECH_KEYWORDS
+
+# samples/playwright_scrape_sample.csv の写し（backend のイメージには samples/ が入らないため、ここに置く。元を更新したら合わせて更新する）
+DEFAULT_SAMPLE_CSV = Path(__file__).resolve().parent / "data" / "playwright_scrape_sample.csv"
+ROWS_PER_PAGE = 30
+
+
+def load_sample_pools(path: Path = DEFAULT_SAMPLE_CSV) -> dict[str, list[str]]:
+    """列名 → サンプルCSVに出現した値（重複を含むため、random.choice で頻度どおりに引ける）。"""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        pools: dict[str, list[str]] = {name: [] for name in reader.fieldnames or []}
+        for row in reader:
+            for name in pools:
+                pools[name].append(row.get(name) or "")
+    return pools
+
+
+def iter_rows(count: int, *, seed: int = 0, pools: dict[str, list[str]] | None = None) -> Iterator[dict]:
+    """サンプルCSVと同じ列を持つ行（取り込み後の JSONB と同じ dict）を count 件生成する。"""
+    pools = pools or load_sample_pools()
+    rng = random.Random(seed)
+    columns = list(pools.items())
+    for i in range(count):
+        url = f"https://www.lancers.jp/work/detail/{5_000_000 + i}"
+        generated = {
+            "rowOrder": str(i + 1),
+            "Page": str(i // ROWS_PER_PAGE + 1),
+            "No": str(i % ROWS_PER_PAGE + 1),
+            "urlRaw": url,
+            "urlNormalized": url,
+        }
+        # 列の並びはサンプルCSVと同じにする
+        yield {name: generated[name] if name in generated else rng.choice(values) for name, values in columns}
+
+
+# --- drift 付きスナップショット ---
+
+SCRAPE_COLUMNS = (
+    "ingestBatchId", "rowOrder", "Page", "No", "Title", "urlRaw", "urlNormalized", "UnitPrice",
+    "WorkStyle", "Status", "FeatureTags", "SkillTags", "CategoryText", "Category", "scrapedAtUtc",
+)
+FIRST_SCRAPED_AT = datetime(2025, 12, 17, 10, 28, 30, tzinfo=timezone.utc)
+SNAPSHOT_INTERVAL = timedelta(days=7)
+BATCH_ROWS = 10_000
+# Title / UnitPrice はスナップショットごとにこの件数の候補を drift を反映して作り、行ごとにそこから引く
+# （実データでも同じ案件名・単価表記は繰り返し現れる）
+TITLE_POOL_SIZE = 20_000
+PRICE_POOL_SIZE = 5_000
+
+TITLE_TEMPLATES = (
+    "【急募】{kw}エンジニア募集（{domain}）",
+    "{kw}を使った{domain}の開発",
+    "【週{days}/{place}】{kw}・{kw2}エンジニア募集",
+    "{domain}向け{kw}アプリケーション保守案件",
+    "【リモート可】{kw}開発者募集（経験{years}年以上）",
+    "開発エンジニア（{domain}に伴う{kw}導入）",
+    "{domain}のPM/PMO（{kw}・{kw2}経験者歓迎）",
+    "{kw}で{domain}のデータ連携ツール作成",
+)
+# キーワードを含まない案件（ヘルプデスク・執筆など）
+PLAIN_TITLES = (
+    "【都内・大学ヘルプデスク業務】",
+    "ブログ記事の執筆（月10本）",
+    "建築現場の施工管理アプリのPM",
+    "データ入力・集計作業の依頼",
+    "社内PCのキッティング・設定作業",
+    "Webサイトの画像差し替えと軽微な修正",
+)
+PLAIN_TITLE_RATIO = 0.15
+DOMAINS = (
+    "業務システム刷新", "ECサイト", "社内DX推進", "自社SaaS", "予約管理システム",
+    "データ基盤", "スマホアプリ", "基幹システム移行", "部品管理システム", "SFA",
+)
+PLACES = ("渋谷", "新宿", "恵比寿", "六本木", "品川", "フルリモート", "大阪", "福岡")
+WORK_STYLES = ("求人", "プロジェクト")
+SKILL_TAGS = (("", 0.84), ("NEW", 0.12), ("NEW | 2回目", 0.03), ("NEW | 初回", 0.01))
+FEATURE_TAGS = (("", 0.9), ("急募", 0.05), ("リモート可", 0.04), ("急募 | リモート可", 0.01))
+CATEGORIES = (
+    ("", "/system/development", 0.45),
+    ("IT・通信・インターネット", "/system/development", 0.25),
+    ("Webシステム開発・プログラミング / IT・通信・インターネット", "/system/development", 0.1),
+    ("ソフトウェア・業務システム開発 / IT・通信・インターネット", "/system/development", 0.06),
+    ("サーバー構築・管理・運用 / IT・通信・インターネット", "/system/server", 0.05),
+    ("スマホアプリ・モバイル開発 / IT・通信・インターネット", "/system/app", 0.05),
+    ("ゲーム・アニメ・玩具", "/system/game", 0.04),
+)
+# 単価の形式ごとの出現比率（サンプルCSVの比率に合わせる）
+PRICE_KINDS = (("monthly", 0.55), ("fixed", 0.22), ("hourly", 0.11), ("undecided", 0.12))
+MONTHLY_LOWER_MAN = (0, 10, 20, 30, 40, 50, 60, 70, 80)
+MONTHLY_LOWER_WEIGHTS = (3, 10, 15, 11, 14, 18, 11, 1, 3)
+FIXED_RANGES = (
+    (5_000, 10_000), (20_000, 50_000), (50_000, 100_000), (100_000, 200_000),
+    (200_000, 300_000), (300_000, 500_000), (500_000, 1_000_000), (1_000_000, 3_000_000),
+)
+FIXED_WEIGHTS = (1, 7, 6, 2, 5, 3, 5, 2)
+HOURLY_SPANS = (0, 0, 200, 300, 400, 500, 900)
+
+
+def _csv_field(value: str) -> str:
+    """CSVの1フィールドとして書ける形にする（区切り文字・引用符・改行を含む場合だけ引用する）。"""
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def keyword_weights(snapshot: int, drift: float, keywords: list[str] = TECH_KEYWORDS) -> list[float]:
+    """スナップショットごとのキーワードの出現重み（人気順に減衰し、一部が増減・出現・消滅する）。"""
+    weights = []
+    for rank, _ in enumerate(keywords):
+        w = 1.0 / (rank % 40 + 1)
+        if rank % 7 == 3:  # 増えるキーワード
+            w *= (1 + drift) ** snapshot
+        elif rank % 11 == 5:  # 減るキーワード
+            w *= max(0.05, (1 - drift) ** snapshot)
+        if rank % 29 == 13 and snapshot == 0:  # 2回目以降に現れるキーワード
+            w = 0.0
+        if rank % 31 == 17 and snapshot >= 2:  # 3回目以降に消えるキーワード
+            w = 0.0
+        weights.append(w)
+    return weights
+
+
+def _round_yen(value: float, step: int) -> int:
+    return max(step, int(round(value / step)) * step)
+
+
+def price_pool(rng: random.Random, count: int, level: float) -> list[str]:
+    """単価表記の候補を count 件（level は drift による水準の倍率）。"""
+    kinds = rng.choices([k for k, _ in PRICE_KINDS], weights=[w for _, w in PRICE_KINDS], k=count)
+    prices = []
+    for kind in kinds:
+        if kind == "monthly":
+            lower = min(80, _round_yen(rng.choices(MONTHLY_LOWER_MAN, MONTHLY_LOWER_WEIGHTS)[0] * level, 10))
+            if rng.random() < 0.03:
+                prices.append("¥ 〜 10万")
+            elif lower >= 80:
+                prices.append("¥ 80万 〜")
+            else:
+                prices.append(f"¥ {lower}万 〜 {lower + 10}万")
+        elif kind == "fixed":
+            low, high = rng.choices(FIXED_RANGES, FIXED_WEIGHTS)[0]
+            prices.append(f"{_round_yen(low * level, 1_000):,} 円 ~ {_round_yen(high * level, 1_000):,} 円 / 固定")
+        elif kind == "hourly":
+            low = _round_yen(rng.randrange(2_000, 4_500, 100) * level, 100)
+            span = rng.choice(HOURLY_SPANS)
+            prices.append(f"{low:,} 円 / 時" if span == 0 else f"{low:,} ~ {low + span:,} 円 / 時")
+        else:
+            prices.append("後で決める")
+    return prices
+
+
+def title_pool(rng: random.Random, count: int, keyword_weights: list[float]) -> list[str]:
+    """案件名の候補を count 件（キーワードは keyword_weights の重みで選ぶ）。"""
+    keywords = rng.choices(TECH_KEYWORDS, weights=keyword_weights, k=count * 2)
+    titles = []
+    for i in range(count):
+        if rng.random() < PLAIN_TITLE_RATIO:
+            titles.append(rng.choice(PLAIN_TITLES))
+            continue
+        titles.append(
+            rng.choice(TITLE_TEMPLATES).format(
+                kw=keywords[2 * i],
+                kw2=keywords[2 * i + 1],
+                domain=rng.choice(DOMAINS),
+                place=rng.choice(PLACES),
+                days=rng.randint(2, 5),
+                years=rng.randint(1, 5),
+            )
+        )
+    return titles
+
+
+def iter_snapshot_csv(
+    snapshot: int, rows: int | None, *, seed: int = 0, drift: float = 0.1
+) -> Iterator[tuple[int, str]]:
+    """
+    snapshot 番目（0始まり）のスナップショットを、(行数, CSVテキスト) のバッチで返す（rows=None で無限）。
+    ヘッダ行は含まない。drift はスナップショット1つあたりの変化の割合。
+    """
+    rng = random.Random(f"{seed}:{snapshot}")
+    scraped_at = FIRST_SCRAPED_AT + SNAPSHOT_INTERVAL * snapshot
+    batch_id = scraped_at.strftime("%Y%m%dT%H%M%SZ")
+    scraped_at_text = scraped_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+    level = math.exp(drift * snapshot * 0.5)  # 単価は drift の半分の割合で上がっていく
+    project_ratio = min(0.9, 0.2 * (1 + drift) ** snapshot)
+
+    titles = [_csv_field(t) for t in title_pool(rng, TITLE_POOL_SIZE, keyword_weights(snapshot, drift))]
+    prices = [_csv_field(p) for p in price_pool(rng, PRICE_POOL_SIZE, level)]
+    # 行の後半（WorkStyle 〜 scrapedAtUtc）は組み合わせが少ないので、出現比率どおりに並べた候補から引く
+    tails = []
+    for work_style, work_weight in zip(WORK_STYLES, (1 - project_ratio, project_ratio)):
+        for feature, feature_weight in FEATURE_TAGS:
+            for skill, skill_weight in SKILL_TAGS:
+                for category_text, category, category_weight in CATEGORIES:
+                    fields = (work_style, "募集中", feature, skill, category_text, category, scraped_at_text)
+                    weight = work_weight * feature_weight * skill_weight * category_weight
+                    tails.append((",".join(_csv_field(f) for f in fields), weight))
+    tail_values = [t for t, _ in tails]
+    tail_cum = list(itertools.accumulate(w for _, w in tails))
+
+    url_base = 5_000_000 + snapshot * 10_000_000
+    produced = 0
+    while rows is None or produced < rows:
+        count = BATCH_ROWS if rows is None else min(BATCH_ROWS, rows - produced)
+        batch_titles = rng.choices(titles, k=count)
+        batch_prices = rng.choices(prices, k=count)
+        batch_tails = rng.choices(tail_values, cum_weights=tail_cum, k=count)
+        lines = []
+        for i in range(count):
+            n = produced + i
+            url = f"https://www.lancers.jp/work/detail/{url_base + n}"
+            lines.append(
+                f"{batch_id},{n + 1},{n // ROWS_PER_PAGE + 1},{n % ROWS_PER_PAGE + 1},{batch_titles[i]},"
+                f"{url}?ref=search_result,{url},{batch_prices[i]},{batch_tails[i]}\n"
+            )
+        produced += count
+        yield count, "".join(lines)
+
+
+def write_snapshot_csv(
+    out: BinaryIO,
+    snapshot: int,
+    rows: int | None = None,
+    *,
+    target_bytes: int | None = None,
+    seed: int = 0,
+    drift: float = 0.1,
+) -> int:
+    """
+    スナップショットをUTF-8のCSVとしてバイナリストリームに書き出し、書いた行数を返す。
+    rows 件書くか、書いたバイト数が target_bytes に達したバッチで止める。
+    """
+    if rows is None and target_bytes is None:
+        raise ValueError("rows or target_bytes is required")
+    written_bytes = out.write((",".join(SCRAPE_COLUMNS) + "\n").encode("utf-8"))
+    written = 0
+    for count, text in iter_snapshot_csv(snapshot, rows, seed=seed, drift=drift):
+        written_bytes += out.write(text.encode("utf-8"))
+        written += count
+        if target_bytes is not None and written_bytes >= target_bytes:
+            break
+    return written
@@ -1,3 +1,5 @@
+import asyncio
+import io
 import time
 
 import pytest
@@ -5,7 +7,8 @@ from fastapi.testclient import TestClient
 from sqlalchemy import text
 
 from app.db import engine, SessionLocal
-from app.main import app
+from app.llm import LLMConfig
+from app.main import app, computeCache
 
 
 def waitForDatabaseReady(timeoutSeconds: int = 30) -> None:
@@ -38,6 +41,93 @@ def client() -> TestClient:
         yield testClient
 
 
+@pytest.fixture()
+def uploadCsv(client):
+    """目的: CSVを /datasets/upload で取り込み、dataset_id を返す関数を提供する（取り込みの成功も確認する）。"""
+
+    def upload(csvText: str = "colA,colB\n1,hello\n2,world\n", filename: str = "sample.csv") -> int:
+        files = {"file": (filename, io.BytesIO(csvText.encode("utf-8")), "text/csv")}
+        response = client.post("/datasets/upload", files=files)
+        assert response.status_code == 200
+        return response.json()["dataset_id"]
+
+    return upload
+
+
+class FakeLlm:
+    """
+    テスト共通のLLMのFake（呼び出し回数と受け取ったプロンプトを記録する）。
+    - reply: 応答テキスト（関数ならプロンプトから作る）
+    - chunks: astream で返すチャンク（省略時は応答を1チャンクで返す）
+    - errors: 呼び出しごとに先頭から1つずつ送出する例外（None なら応答を返す。尽きたら応答を返す）
+    - exc: 毎回送出する例外（呼び出しの途中で差し替えてよい）
+    - delay: agenerate / astream で応答までに待つ秒数
+    - syncAllowed=False: generate を呼んだらテストを失敗にする（非同期経路だけを使うことの確認用）
+    """
+
+    def __init__(
+        self,
+        reply="ok",
+        *,
+        chunks: list[str] | None = None,
+        errors: list[Exception | None] | None = None,
+        exc: Exception | None = None,
+        delay: float = 0.0,
+        syncAllowed: bool = True,
+    ):
+        self.reply = reply
+        self.chunks = chunks
+        self.errors = list(errors or [])
+        self.exc = exc
+        self.delay = delay
+        self.syncAllowed = syncAllowed
+        self.calls = 0
+        self.prompts: list[str] = []
+
+    def _respond(self, prompt: str) -> str:
+        self.calls += 1
+        self.prompts.append(prompt)
+        error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        if self.exc is not None:
+            raise self.exc
+        return self.reply(prompt) if callable(self.reply) else self.reply
+
+    def generate(self, prompt: str) -> str:
+        if not self.syncAllowed:
+            raise AssertionError("sync generate must not be called")
+        return self._respond(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def astream(self, prompt: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        text = self._respond(prompt)
+        for chunk in self.chunks if self.chunks is not None else [text]:
+            yield chunk
+
+
+@pytest.fixture()
+def fakeLlm():
+    """目的: テスト共通のLLMのFake（FakeLlm）を作る関数を提供する。"""
+    return FakeLlm
+
+
+@pytest.fixture()
+def llmConfig():
+    """目的: stub プロバイダの LLMConfig を作る関数を提供する（キーワード引数で項目を上書きする）。"""
+
+    def make(**kwargs) -> LLMConfig:
+        return LLMConfig(provider="stub", api_key=None, model="stub", timeout_seconds=1, **kwargs)
+
+    return make
+
+
 @pytest.fixture()
 def db():
     """目的: テスト内で直接DBをクエリできるようにSessionLocalを提供する。"""
@@ -70,4 +160,6 @@ def cleanDatabase() -> None:
     with engine.begin() as connection:
         # dataset_rows -> datasets の順に消す必要があるが、CASCADEで依存も含めて掃除する
         connection.execute(text("TRUNCATE TABLE dataset_rows, datasets RESTART IDENTITY CASCADE"))
+        connection.execute(text("TRUNCATE TABLE llm_results"))
+    computeCache.clear()
 
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.analysis_jobs import create_or_reuse_compare_job
+from app.main import app, getLlmClient
+
+
+JOB_LLM_OUTPUT = "## 変化の概要\n- JOB_LLM_OUTPUT\n"
+
+
+def _uploadPair(uploadCsv) -> tuple[int, int]:
+    return (
+        uploadCsv("price,stock\n100,10\n200,20\n", "base.csv"),
+        uploadCsv("price,stock\n150,15\n250,25\n300,30\n", "target.csv"),
+    )
+
+
+def testCompareAnalysisJobReturns202AndPersistsResult(client, monkeypatch, uploadCsv, fakeLlm):
+    """目的: POSTが202とjob_idを返し、ジョブ完了後にGETで結果を取得できる（再取得でLLMを呼ばない）ことを確認する。"""
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    base, target = _uploadPair(uploadCsv)
+    fake = fakeLlm(JOB_LLM_OUTPUT, syncAllowed=False)
+    app.dependency_overrides[getLlmClient] = lambda: fake
+    try:
+        response = client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}&version=v2")
+        assert response.status_code == 202
+        body = response.json()
+        jobId = body["job_id"]
+        assert body["status_url"] == f"/analysis-jobs/{jobId}"
+        assert response.headers["location"] == body["status_url"]
+
+        # TestClient ではバックグラウンドタスクがレスポンス返却前に完了している
+        job = client.get(f"/analysis-jobs/{jobId}").json()
+        assert job["status"] == "succeeded"
+        assert job["params"] == {"base": base, "target": target, "version": "v2"}
+        assert job["result"]["analysis_text"] == JOB_LLM_OUTPUT
+        assert job["result"]["comparison_summary"]["rows_change"]["diff"] == 1
+        assert job["started_at"] is not None and job["finished_at"] is not None
+        assert fake.calls == 1
+
+        # 同じ条件で再度POSTすると、成功済みジョブを再利用しLLMを呼ばない
+        again = client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}&version=v2")
+        assert again.status_code == 202
+        assert again.json()["job_id"] == jobId
+        assert again.json()["status"] == "succeeded"
+        assert client.get(f"/analysis-jobs/{jobId}").json()["result"] == job["result"]
+        assert fake.calls == 1
+
+        # プロンプト版が違えば別ジョブ
+        other = client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}&version=v1")
+        assert other.json()["job_id"] != jobId
+        assert fake.calls == 2
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testCompareAnalysisJobRecordsLlmError(client, monkeypatch, uploadCsv, fakeLlm):
+    """目的: LLM例外で失敗したジョブは、同期APIと同じ形式のエラーを保存し、次のPOSTで作り直されることを確認する。"""
+    from app.llm import LLMTimeoutError
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    base, target = _uploadPair(uploadCsv)
+    fake = fakeLlm(JOB_LLM_OUTPUT, exc=LLMTimeoutError("timeout"), syncAllowed=False)
+    app.dependency_overrides[getLlmClient] = lambda: fake
+    try:
+        jobId = client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}").json()["job_id"]
+        job = client.get(f"/analysis-jobs/{jobId}").json()
+        assert job["status"] == "failed"
+        assert job["result"] is None
+        assert job["error"]["status"] == 504
+        assert job["error"]["detail"]["error"]["code"] == "LLM_TIMEOUT"
+
+        retried = client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}").json()
+        assert retried["job_id"] != jobId
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testCompareAnalysisJobValidatesDatasets(client, db, uploadCsv):
+    """目的: 存在しないデータセット/同一ID/未知のプロンプト版の指定はジョブを作らずにエラーとなり、未知のjob_idは404となることを確認する。"""
+    base, target = _uploadPair(uploadCsv)
+
+    assert client.post(f"/datasets/compare/analysis/jobs?base={base}&target=999999").status_code == 404
+    assert client.post(f"/datasets/compare/analysis/jobs?base={base}&target={base}").status_code == 400
+    assert client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}&version=v3").status_code == 400
+    assert db.execute(text("SELECT count(*) FROM analysis_jobs")).scalar_one() == 0
+    assert client.get("/analysis-jobs/00000000-0000-0000-0000-000000000000").status_code == 404
+
+
+def testStaleRunningJobIsReportedAsFailed(client, db, uploadCsv):
+    """目的: ワーカー停止で running のまま残ったジョブが、一定時間後に failed（再試行可）として扱われることを確認する。"""
+    base, target = _uploadPair(uploadCsv)
+    jobId = client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}").json()["job_id"]
+    old = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.execute(
+        text("UPDATE analysis_jobs SET status = 'running', result = NULL, created_at = :old WHERE id = :id"),
+        {"old": old, "id": jobId},
+    )
+    db.commit()
+
+    job = client.get(f"/analysis-jobs/{jobId}").json()
+    assert job["status"] == "failed"
+    assert job["error"]["detail"]["error"]["code"] == "ANALYSIS_JOB_STALE"
+    assert job["error"]["detail"]["error"]["retryable"] is True
+
+    # 期限切れのジョブは再利用されない
+    assert client.post(f"/datasets/compare/analysis/jobs?base={base}&target={target}").json()["job_id"] != jobId
+
+
+def testConcurrentJobRequestsCreateSingleJob(client, db, uploadCsv):
+    """目的: 同じ条件のジョブ登録が同時に来ても、ジョブは1件だけ作られ他はそれを再利用することを確認する。"""
+    base, target = _uploadPair(uploadCsv)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(
+            pool.map(lambda _: create_or_reuse_compare_job(base, target, "v1", "template"), range(8))
+        )
+
+    assert len({job["job_id"] for job, _ in results}) == 1
+    assert sum(created for _, created in results) == 1
+    assert db.execute(text("SELECT count(*) FROM analysis_jobs")).scalar_one() == 1
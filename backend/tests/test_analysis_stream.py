@@ -0,0 +1,151 @@
+import json
+
+from app.main import app
+
+
+def parseSseEvents(body: str) -> list[tuple[str, dict]]:
+    """目的: SSEレスポンス本文を (event, data) のリストに変換する。"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = None
+        data = None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+class StreamingFakeLlm:
+    def __init__(self, chunks: list[str], exc: Exception | None = None, fail_after: int = 0):
+        self.chunks = chunks
+        self.exc = exc
+        self.fail_after = fail_after
+        self.last_prompt: str | None = None
+
+    def generate(self, prompt: str) -> str:
+        raise AssertionError("sync generate must not be called")
+
+    async def astream(self, prompt: str):
+        self.last_prompt = prompt
+        for i, chunk in enumerate(self.chunks):
+            if self.exc is not None and i == self.fail_after:
+                raise self.exc
+            yield chunk
+        if self.exc is not None and self.fail_after >= len(self.chunks):
+            raise self.exc
+
+
+def testStreamDatasetAnalysisReturnsTemplateWhenLlmDisabled(client, uploadCsv):
+    """目的: LLM無効時もストリーミング版が meta → delta → done の形式でテンプレ分析を返すことを確認する。"""
+    datasetId = uploadCsv("colA,colB\n1,hello\n2,world\n")
+
+    response = client.get(f"/datasets/{datasetId}/analysis/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parseSseEvents(response.text)
+    assert [e for e, _ in events] == ["meta", "delta", "done"]
+    assert events[0][1]["dataset_id"] == datasetId
+    assert "行数: 2" in events[2][1]["analysis_text"]
+    assert events[1][1]["text"] == events[2][1]["analysis_text"]
+
+
+def testStreamDatasetAnalysisForwardsLlmChunks(client, monkeypatch, uploadCsv):
+    """目的: LLMのチャンクが delta イベントとして逐次転送され、done に全文が入ることを確認する。"""
+    from app.main import getLlmClient
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    fake = StreamingFakeLlm(["## 注目点\n", "- A\n", "- B\n"])
+    app.dependency_overrides[getLlmClient] = lambda: fake
+    try:
+        datasetId = uploadCsv("colA,colB\n1,hello\n2,world\n")
+        response = client.get(f"/datasets/{datasetId}/analysis/stream")
+        assert response.status_code == 200
+
+        events = parseSseEvents(response.text)
+        assert [e for e, _ in events] == ["meta", "delta", "delta", "delta", "done"]
+        assert [d["text"] for e, d in events if e == "delta"] == ["## 注目点\n", "- A\n", "- B\n"]
+        assert events[-1][1]["analysis_text"] == "## 注目点\n- A\n- B\n"
+        assert events[-1][1]["generated_at"] == events[0][1]["generated_at"]
+        assert "stats_summary_json:" in fake.last_prompt
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testStreamDatasetAnalysisMapsErrorBeforeFirstChunkToHttpStatus(client, monkeypatch, uploadCsv):
+    """目的: 最初のチャンク前のLLM例外は、非ストリーミング版と同じHTTPエラーになることを確認する。"""
+    from app.llm import LLMTimeoutError
+    from app.main import getLlmClient
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    app.dependency_overrides[getLlmClient] = lambda: StreamingFakeLlm([], exc=LLMTimeoutError("timeout"))
+    try:
+        datasetId = uploadCsv("colA\n1\n")
+        response = client.get(f"/datasets/{datasetId}/analysis/stream")
+        assert response.status_code == 504
+        assert response.json()["detail"]["error"]["code"] == "LLM_TIMEOUT"
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testStreamDatasetAnalysisEmitsErrorEventMidStream(client, monkeypatch, uploadCsv):
+    """目的: ストリーム開始後のLLM例外は error イベントとして通知されることを確認する。"""
+    from app.llm import LLMProviderError
+    from app.main import getLlmClient
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    app.dependency_overrides[getLlmClient] = lambda: StreamingFakeLlm(
+        ["partial"], exc=LLMProviderError("upstream"), fail_after=1
+    )
+    try:
+        datasetId = uploadCsv("colA\n1\n")
+        response = client.get(f"/datasets/{datasetId}/analysis/stream")
+        assert response.status_code == 200
+
+        events = parseSseEvents(response.text)
+        assert [e for e, _ in events] == ["meta", "delta", "error"]
+        assert events[-1][1]["status"] == 502
+        assert events[-1][1]["error"]["code"] == "LLM_PROVIDER_ERROR"
+        assert events[-1][1]["error"]["retryable"] is True
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testStreamDatasetAnalysisReturns404ForMissingDataset(client):
+    """目的: 存在しないdataset_idではストリーム開始前に 404 が返ることを確認する。"""
+    response = client.get("/datasets/999999/analysis/stream")
+    assert response.status_code == 404
+
+
+def testStreamComparisonAnalysisUsesPromptVersion(client, monkeypatch, uploadCsv):
+    """目的: 比較分析のストリーミング版が version を反映したプロンプトでLLMを呼ぶことを確認する。"""
+    from app.main import getLlmClient
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    fake = StreamingFakeLlm(["## ビジネス動向サマリー\n", "..."])
+    app.dependency_overrides[getLlmClient] = lambda: fake
+    try:
+        baseId = uploadCsv("Title,UnitPrice\nPython案件,80万円\n", "base.csv")
+        targetId = uploadCsv("Title,UnitPrice\nGo案件,60万円\nAI案件,90万円\n", "target.csv")
+
+        response = client.get(f"/datasets/compare/analysis/stream?base={baseId}&target={targetId}&version=v2")
+        assert response.status_code == 200
+
+        events = parseSseEvents(response.text)
+        assert events[0][0] == "meta"
+        assert events[0][1]["comparison_summary"]["rows_change"]["diff"] == 1
+        assert events[-1][0] == "done"
+        assert events[-1][1]["analysis_text"] == "## ビジネス動向サマリー\n..."
+        assert "ビジネスアナリスト" in fake.last_prompt
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testStreamComparisonAnalysisReturns400ForSameId(client, uploadCsv):
+    """目的: 比較分析のストリーミング版でも同一ID指定は 400 になることを確認する。"""
+    datasetId = uploadCsv("col1\n1\n")
+    response = client.get(f"/datasets/compare/analysis/stream?base={datasetId}&target={datasetId}")
+    assert response.status_code == 400
@@ -0,0 +1,42 @@
+from app.analysis import extract_price_value
+from benchmarks.bench_analysis import compare_with_baseline, stats_from_rows
+from benchmarks.synthetic import iter_rows, load_sample_pools
+
+
+def testSyntheticRowsFollowSampleColumnsAndAreDeterministic():
+    """目的: 合成行がサンプルCSVと同じ列順を持ち、URLは行ごとに一意で、同じ seed なら同じ内容になることを確認する。"""
+    pools = load_sample_pools()
+    rows = list(iter_rows(100, seed=3, pools=pools))
+
+    assert list(rows[0]) == list(pools)
+    assert len({row["urlNormalized"] for row in rows}) == 100
+    assert rows[-1]["Page"] == "4" and rows[-1]["No"] == "10"
+    assert rows == list(iter_rows(100, seed=3, pools=pools))
+    assert {row["UnitPrice"] for row in rows} <= set(pools["UnitPrice"])
+    assert any(extract_price_value(row["UnitPrice"]) is not None for row in rows)
+
+
+def testStatsFromRowsMatchesDatasetStatsShape():
+    """目的: ベンチ用の統計が B-1 stats と同じ形（kind / numeric / top_values）で作られることを確認する。"""
+    stats = stats_from_rows(7, [{"n": "1", "s": "a"}, {"n": "3", "s": "a"}, {"n": "", "s": "b"}])
+
+    assert stats["dataset_id"] == 7 and stats["rows"] == 3
+    n, s = stats["columns"]
+    assert n["kind"] == "number" and n["non_empty_count"] == 2
+    assert n["numeric"] == {"count": 2, "min": 1.0, "max": 3.0, "avg": 2.0}
+    assert s["kind"] == "string"
+    assert s["top_values"] == [{"value": "a", "count": 2}, {"value": "b", "count": 1}]
+
+
+def testCompareWithBaselineReportsRegressionsOverTolerance():
+    """目的: 時間かピークメモリがベースラインの許容倍率を超えた項目だけが悪化として報告されることを確認する。"""
+    baseline = {"10000": {"compare_keywords": {"seconds": 1.0, "peak_bytes": 1000}}}
+    results = {
+        "10000": {
+            "compare_keywords": {"seconds": 1.2, "peak_bytes": 2000},
+            "build_prompt_v1": {"seconds": 9.0, "peak_bytes": None},
+        }
+    }
+
+    assert compare_with_baseline(results, baseline, tolerance=1.3) == ["10000 compare_keywords peak_bytes x2.00"]
+    assert compare_with_baseline(results, {}, tolerance=1.3) == []
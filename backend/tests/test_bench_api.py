@@ -0,0 +1,40 @@
+import csv
+import io
+
+import pytest
+
+from benchmarks.bench_api import endpoint_path, ensure_local, snapshot_csv
+
+
+def testEnsureLocalAllowsOnlyLoopbackOrExplicitHosts():
+    """目的: ベンチマークの接続先がループバックか明示的に許可したホストに限られることを確認する。"""
+    ensure_local("http://localhost:8001", [])
+    ensure_local("http://127.0.0.1:8001", [])
+    ensure_local("http://backend:8000", ["backend"])
+
+    with pytest.raises(SystemExit, match="non-local"):
+        ensure_local("http://10.0.0.5:8001", [])
+    with pytest.raises(SystemExit, match="non-local"):
+        ensure_local("http://192.168.1.20:8001", ["backend"])
+
+
+def testEndpointPathsSpreadOverSnapshotsAndCompareNeighbours(client):
+    """目的: 読み取り系のリクエストがデータセットに分散し、compare は隣り合うスナップショットの組を使い、合成CSVは取り込めることを確認する。"""
+    ids = [11, 12, 13]
+    assert [endpoint_path("stats", i, ids) for i in range(4)] == [
+        "/datasets/11/stats",
+        "/datasets/12/stats",
+        "/datasets/13/stats",
+        "/datasets/11/stats",
+    ]
+    assert [endpoint_path("compare", i, ids) for i in range(3)] == [
+        "/datasets/compare?base=11&target=12",
+        "/datasets/compare?base=12&target=13",
+        "/datasets/compare?base=11&target=12",
+    ]
+
+    payload = snapshot_csv(20, snapshot=1)
+    assert len(list(csv.DictReader(io.StringIO(payload.decode("utf-8"))))) == 20
+    response = client.post("/datasets/upload", files={"file": ("bench.csv", payload, "text/csv")})
+    assert response.status_code == 200
+    assert response.json()["rows"] == 20
@@ -0,0 +1,14 @@
+from benchmarks.bench_response import measure, widen_stats
+
+
+def testWidenStatsAndMeasureCompareSerializers():
+    """目的: stats の列を指定数まで複製でき、各直列化の結果が同じJSONになり、圧縮後のバイト数が記録されることを確認する。"""
+    stats = {"dataset_id": 1, "rows": 2, "columns": [{"name": "a", "kind": "number"}, {"name": "b", "kind": "string"}]}
+    widened = widen_stats(stats, 5)
+    assert [c["name"] for c in widened["columns"]] == ["a_0", "b_0", "a_1", "b_1", "a_2"]
+    assert widened["columns"][3]["kind"] == "string"
+
+    result = measure({"comparison": widened, "keywords": [{"keyword": "Python", "count": 3}] * 50}, repeat=1)
+    assert result["raw_bytes"] > result["gzip_bytes"] > 0
+    assert result["br_bytes"] > 0
+    assert all(result[f"{name}_seconds"] > 0 for name in ("json", "encoder+orjson", "orjson", "gzip", "br"))
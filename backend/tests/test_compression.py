@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import brotli
+
+from app.compression import negotiate_encoding
+
+
+def _wideCsv(columns: int, rows: int) -> str:
+    header = ",".join(f"col{i:03d}" for i in range(columns))
+    lines = [",".join(f"value {r} {i}" for i in range(columns)) for r in range(rows)]
+    return "\n".join([header, *lines]) + "\n"
+
+
+def testNegotiateEncodingFollowsQValuesAndPreference():
+    """目的: Accept-Encoding の q 値に従い、同じ重みなら br を優先し、受け付けないものは選ばないことを確認する。"""
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+
+def testLargeJsonIsCompressedWithWeakEtagAndStill304(client, monkeypatch, uploadCsv):
+    """目的: 閾値以上の JSON が br / gzip で圧縮され（Vary 付き・弱い ETag）、その ETag でも 304 になり、閾値未満は圧縮されないことを確認する。"""
+    monkeypatch.setenv("HTTP_COMPRESSION_MIN_BYTES", "1024")
+    datasetId = uploadCsv(_wideCsv(30, 5))
+    path = f"/datasets/{datasetId}/stats"
+
+    identity = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Accept-Encoding"
+    assert len(identity.content) >= 1024
+
+    for encoding, decompress in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+        # 本文を自動で展開させず、送られたバイト列を確かめる
+        with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            raw = b"".join(response.iter_raw())
+        assert response.headers["content-encoding"] == encoding
+        assert int(response.headers["content-length"]) == len(raw) < len(identity.content)
+        assert json.loads(decompress(raw)) == identity.json()
+        assert response.headers["etag"] == f"W/{identity.headers['etag']}"
+
+        cached = client.get(path, headers={"Accept-Encoding": encoding, "If-None-Match": response.headers["etag"]})
+        assert cached.status_code == 304
+
+    small = client.get("/datasets", headers={"Accept-Encoding": "br"})
+    assert len(small.content) < 1024
+    assert "content-encoding" not in small.headers
+
+
+def testStreamingAndDisabledCompressionPassThrough(client, monkeypatch, uploadCsv):
+    """目的: SSE はストリーミングのまま圧縮されず、HTTP_COMPRESSION_MIN_BYTES=0 なら圧縮しないことを確認する。"""
+    monkeypatch.setenv("HTTP_COMPRESSION_MIN_BYTES", "1")
+    datasetId = uploadCsv(_wideCsv(30, 5))
+
+    stream = client.get(f"/datasets/{datasetId}/analysis/stream", headers={"Accept-Encoding": "gzip"})
+    assert stream.status_code == 200
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in stream.headers
+
+    monkeypatch.setenv("HTTP_COMPRESSION_MIN_BYTES", "0")
+    response = client.get(f"/datasets/{datasetId}/stats", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
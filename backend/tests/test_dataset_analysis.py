@@ -117,3 +117,31 @@ def testGetDatasetAnalysisReturns404ForMissingDataset(client):
     assert response.json()["detail"] == "Dataset not found"
 
 
+
+
+def testGetDatasetAnalysisPrefersAsyncAgenerate(client, monkeypatch):
+    """目的: LLMクライアントが agenerate を持つ場合、/analysis は同期 generate ではなくそれを使うことを確認する。"""
+
+    class AsyncFakeLlm:
+        def generate(self, prompt: str) -> str:
+            raise AssertionError("sync generate must not be called")
+
+        async def agenerate(self, prompt: str) -> str:
+            return "ASYNC_LLM_OUTPUT"
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+
+    from app.main import getLlmClient
+
+    app.dependency_overrides[getLlmClient] = lambda: AsyncFakeLlm()
+    try:
+        csvText = "colA,colB\n1,hello\n2,world\n"
+        files = {"file": ("sample.csv", io.BytesIO(csvText.encode("utf-8")), "text/csv")}
+        uploadResponse = client.post("/datasets/upload", files=files)
+        datasetId = uploadResponse.json()["dataset_id"]
+
+        response = client.get(f"/datasets/{datasetId}/analysis")
+        assert response.status_code == 200
+        assert response.json()["analysis_text"] == "ASYNC_LLM_OUTPUT"
+    finally:
+        app.dependency_overrides.clear()
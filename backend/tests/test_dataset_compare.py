@@ -1,4 +1,5 @@
 import io
+import re
 
 import pytest
 
@@ -345,3 +346,48 @@ def testGetDatasetCompareIncludesKeywordAnalysis(client):
     disappeared = ka["disappeared_keywords"]
     assert "PHP" in disappeared
     assert "Laravel" in disappeared
+
+
+def testGetDatasetCompareIncludeSelectsSectionsAndSkipsRowFetch(client, uploadCsv):
+    """目的: include= と各サブエンドポイントが指定した項目だけを全件取得時と同じ内容で返し、統計だけなら行データを取得しないことを確認する。"""
+    base_id = uploadCsv("Title,UnitPrice,stock\nPython開発,5000円,1\nJava保守,80万円,2\n")
+    target_id = uploadCsv("Title,UnitPrice,stock\nPython AI,3000円,3\nGo開発,,4\n")
+    query = f"base={base_id}&target={target_id}"
+    full = client.get(f"/datasets/compare?{query}").json()
+    assert list(full) == ["base_dataset", "target_dataset", "comparison", "price_range_analysis", "keyword_analysis"]
+
+    cases = {
+        "stats": ["comparison"],
+        "price": ["price_range_analysis"],
+        "keywords": ["keyword_analysis"],
+        "keywords, stats": ["comparison", "keyword_analysis"],
+    }
+    for include, keys in cases.items():
+        body = client.get(f"/datasets/compare?{query}&include={include}").json()
+        assert list(body) == ["base_dataset", "target_dataset", *keys]
+        assert all(body[key] == full[key] for key in body)
+
+    for section, key in (("stats", "comparison"), ("price", "price_range_analysis"), ("keywords", "keyword_analysis")):
+        response = client.get(f"/datasets/compare/{section}?{query}")
+        assert response.status_code == 200
+        assert response.json() == {"base_dataset": full["base_dataset"], "target_dataset": full["target_dataset"], key: full[key]}
+        # 項目ごとに ETag を分ける
+        assert response.headers["etag"] != client.get(f"/datasets/compare?{query}").headers["etag"]
+
+    def queryCount(path: str) -> int:
+        timing = client.get(path).headers["server-timing"]
+        return int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+
+    # 統計だけなら行データ（2件）を取得しない
+    assert queryCount(f"/datasets/compare/stats?{query}") == queryCount(f"/datasets/compare?{query}") - 2
+    # ETag用の確認 + 存在確認2件 + 行数2件 + 行データ2件（統計は計算しない）
+    assert queryCount(f"/datasets/compare/keywords?{query}") == 7
+
+def testGetDatasetCompareRejectsUnknownInclude(client, uploadCsv):
+    """目的: include に未知の項目や空の指定があれば 400 を返すことを確認する。"""
+    base_id = uploadCsv("Title\nPython\n")
+    target_id = uploadCsv("Title\nGo\n")
+    for include in ("stats,foo", ",", ""):
+        response = client.get(f"/datasets/compare?base={base_id}&target={target_id}&include={include}")
+        assert response.status_code == 400
+        assert "stats,price,keywords" in response.json()["detail"]
@@ -81,3 +81,46 @@ def testGetDatasetStatsReturns404ForMissingDataset(client):
     assert response.json()["detail"] == "Dataset not found"
 
 
+def _dbQueryCount(response) -> int:
+    entry = response.headers["server-timing"].split(", ")[0]
+    return int(entry.split('desc="')[1].split(" ")[0])
+
+
+def testStatsBatchMatchesSingleStatsWithConstantQueries(client, uploadCsv):
+    """目的: POST /datasets/stats:batch が個別の stats と同じ内容を指定順で返し、存在しないIDは not_found に入り、SQL件数がデータセット数によらないことを確認する。"""
+    ids = [
+        uploadCsv("project,amount,score,mixed,empty\n案件A,100,1.5,1,\n案件B,200,2.5,x,\n案件A,,3.0,2,\n,300,,3,\n"),
+        uploadCsv("Title,UnitPrice\nPython,5000円\nGo,\nPython,1e3\n"),
+        uploadCsv("only,blank\nx,\n"),
+    ]
+    single = {i: client.get(f"/datasets/{i}/stats").json() for i in ids}
+
+    response = client.post("/datasets/stats:batch", json={"dataset_ids": [ids[2], 999, ids[0], ids[1], ids[0]]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [s["dataset_id"] for s in body["datasets"]] == [ids[2], ids[0], ids[1]]
+    assert body["not_found"] == [999]
+    for stats in body["datasets"]:
+        assert stats == single[stats["dataset_id"]]
+
+    one = client.post("/datasets/stats:batch", json={"dataset_ids": [ids[0]]})
+    # 存在確認 + 行数 + カラム要約 + 頻出値（データセット数・カラム数によらない）
+    assert _dbQueryCount(one) == _dbQueryCount(response) == 4
+
+
+def testStatsBatchUsesCacheAndValidatesIds(client, monkeypatch, uploadCsv):
+    """目的: キャッシュ済みのデータセットはSQLを使わずに返し、IDの指定が空・上限超えなら 422 になることを確認する。"""
+    from app import main
+
+    monkeypatch.setattr(main.computeCache, "ttl_seconds", 60)
+    datasetId = uploadCsv("colA,colB\n1,hello\n")
+    expected = client.get(f"/datasets/{datasetId}/stats").json()
+
+    response = client.post("/datasets/stats:batch", json={"dataset_ids": [datasetId]})
+    assert response.json() == {"datasets": [expected], "not_found": []}
+    # キャッシュから返すため、Server-Timing に db（SQL）の項目が無い
+    assert not response.headers["server-timing"].startswith("db;")
+
+    assert client.post("/datasets/stats:batch", json={"dataset_ids": []}).status_code == 422
+    tooMany = list(range(1, main.STATS_BATCH_MAX_IDS + 2))
+    assert client.post("/datasets/stats:batch", json={"dataset_ids": tooMany}).status_code == 422
@@ -153,3 +153,188 @@ def testGeminiClientDetectsTooLargeFrom400Message(monkeypatch):
         client.generate("prompt")
 
 
+
+
+def testGeminiClientAgenerateParsesSuccessResponse(monkeypatch):
+    """目的: agenerate が httpx.AsyncClient 経由で正常レスポンスを parse できることを確認する。"""
+    import asyncio
+
+    from app.llm import GeminiAiStudioClient, LLMConfig
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"candidates": [{"content": {"parts": [{"text": "async hello"}]}}]}
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def post(self, url, params=None, json=None):
+            assert ":generateContent" in url
+            return FakeResponse()
+
+    import app.llm as llm_mod
+
+    monkeypatch.setattr(llm_mod.httpx, "AsyncClient", FakeAsyncClient)
+
+    client = GeminiAiStudioClient(
+        LLMConfig(provider="gemini", api_key="dummy", model="gemini-2.0-flash", timeout_seconds=1)
+    )
+    assert asyncio.run(client.agenerate("prompt")) == "async hello"
+
+
+def testGeminiClientAgenerateMapsHttpErrorsAndTimeout(monkeypatch):
+    """目的: agenerate でも HTTPエラー/timeout が分類例外にマップされることを確認する。"""
+    import asyncio
+
+    import httpx
+
+    from app.llm import GeminiAiStudioClient, LLMConfig, LLMRateLimitError, LLMTimeoutError
+
+    class FakeResponse:
+        status_code = 429
+
+        def json(self):
+            return {"error": {"message": "rate limit"}}
+
+    mode = {"timeout": False}
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def post(self, url, params=None, json=None):
+            if mode["timeout"]:
+                raise httpx.TimeoutException("timeout")
+            return FakeResponse()
+
+    import app.llm as llm_mod
+
+    monkeypatch.setattr(llm_mod.httpx, "AsyncClient", FakeAsyncClient)
+
+    client = GeminiAiStudioClient(
+        LLMConfig(provider="gemini", api_key="dummy", model="gemini-2.0-flash", timeout_seconds=1)
+    )
+    with pytest.raises(LLMRateLimitError):
+        asyncio.run(client.agenerate("prompt"))
+
+    mode["timeout"] = True
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(client.agenerate("prompt"))
+
+
+def testGeminiClientAstreamParsesSseChunks(monkeypatch):
+    """目的: streamGenerateContent（alt=sse）のイベントからテキストチャンクを順に取り出せることを確認する。"""
+    import asyncio
+    import json as jsonlib
+
+    from app.llm import GeminiAiStudioClient, LLMConfig
+
+    captured = {}
+
+    class FakeStreamResponse:
+        status_code = 200
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def aiter_lines(self):
+            for text in ("hel", "lo"):
+                yield "data: " + jsonlib.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]})
+                yield ""
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        def stream(self, method, url, params=None, json=None):
+            captured["url"] = url
+            captured["params"] = params
+            return FakeStreamResponse()
+
+    import app.llm as llm_mod
+
+    monkeypatch.setattr(llm_mod.httpx, "AsyncClient", FakeAsyncClient)
+
+    client = GeminiAiStudioClient(
+        LLMConfig(provider="gemini", api_key="dummy", model="gemini-2.0-flash", timeout_seconds=1)
+    )
+
+    async def collect():
+        return [chunk async for chunk in client.astream("prompt")]
+
+    assert asyncio.run(collect()) == ["hel", "lo"]
+    assert ":streamGenerateContent" in captured["url"]
+    assert captured["params"]["alt"] == "sse"
+
+
+def testGeminiClientAstreamMapsHttpError(monkeypatch):
+    """目的: ストリーミング呼び出しでもHTTPエラーが分類例外にマップされることを確認する。"""
+    import asyncio
+
+    from app.llm import GeminiAiStudioClient, LLMConfig, LLMRateLimitError
+
+    class FakeStreamResponse:
+        status_code = 429
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def aread(self):
+            return b""
+
+        def json(self):
+            return {"error": {"message": "quota"}}
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        def stream(self, method, url, params=None, json=None):
+            return FakeStreamResponse()
+
+    import app.llm as llm_mod
+
+    monkeypatch.setattr(llm_mod.httpx, "AsyncClient", FakeAsyncClient)
+
+    client = GeminiAiStudioClient(
+        LLMConfig(provider="gemini", api_key="dummy", model="gemini-2.0-flash", timeout_seconds=1)
+    )
+
+    async def collect():
+        return [chunk async for chunk in client.astream("prompt")]
+
+    with pytest.raises(LLMRateLimitError):
+        asyncio.run(collect())
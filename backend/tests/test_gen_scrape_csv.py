@@ -0,0 +1,60 @@
+import csv
+import io
+
+import pytest
+
+from app.analysis import compare_keywords, compare_price_ranges, extract_price_value
+from app.keywords import TECH_KEYWORDS
+from benchmarks.gen_scrape_csv import parse_size, snapshot_filename
+from benchmarks.synthetic import SCRAPE_COLUMNS, keyword_weights, write_snapshot_csv
+
+
+def _snapshotRows(snapshot: int, rows: int, drift: float = 0.1) -> list[dict]:
+    out = io.BytesIO()
+    assert write_snapshot_csv(out, snapshot, rows, drift=drift) == rows
+    return list(csv.DictReader(io.StringIO(out.getvalue().decode("utf-8"))))
+
+
+def testSnapshotCsvHasScrapeColumnsAndParseablePrices():
+    """目的: 生成したCSVがスクレイピングCSVと同じ列を持ち、単価は「後で決める」以外すべて数値として解釈できることを確認する。"""
+    rows = _snapshotRows(0, 2000)
+
+    assert tuple(rows[0]) == SCRAPE_COLUMNS
+    assert rows[0]["ingestBatchId"] == "20251217T102830Z"
+    assert rows[-1]["rowOrder"] == "2000"
+    assert all(
+        extract_price_value(r["UnitPrice"]) is not None for r in rows if r["UnitPrice"] != "後で決める"
+    )
+    assert {r["WorkStyle"] for r in rows} == {"求人", "プロジェクト"}
+    assert sum(any(k.lower() in r["Title"].lower() for k in ("Python", "Java", "PHP", "React")) for r in rows) > 0
+    assert _snapshotRows(0, 2000) == rows
+
+
+def testSnapshotsDriftInKeywordsPricesAndWorkStyle():
+    """目的: スナップショットが進むと、キーワードの出現・消滅、単価水準、WorkStyle の比率が変化することを確認する。"""
+    base, target = _snapshotRows(0, 5000, drift=0.3), _snapshotRows(3, 5000, drift=0.3)
+
+    keywords = compare_keywords(base, target)
+    weights0, weights3 = keyword_weights(0, 0.3), keyword_weights(3, 0.3)
+    emerging = {k for k, w0, w3 in zip(TECH_KEYWORDS, weights0, weights3) if w0 == 0 and w3 > 0}
+    assert emerging & set(keywords["new_keywords"])
+    assert keywords["increased_keywords"] and keywords["decreased_keywords"]
+
+    prices = compare_price_ranges(base, target)
+    assert prices["target"]["high"] > prices["base"]["high"]
+    assert sum(r["WorkStyle"] == "プロジェクト" for r in target) > sum(r["WorkStyle"] == "プロジェクト" for r in base)
+
+
+def testTargetBytesAndSizeParsing():
+    """目的: target_bytes 指定でおおよそのサイズで止まり、--size の単位表記がバイト数に変換されることを確認する。"""
+    out = io.BytesIO()
+    rows = write_snapshot_csv(out, 1, target_bytes=1_000_000)
+    assert 1_000_000 <= len(out.getvalue()) < 1_000_000 + 10_000 * 400
+    assert rows % 10_000 == 0
+    with pytest.raises(ValueError):
+        write_snapshot_csv(io.BytesIO(), 0)
+
+    assert parse_size("500MB") == 500_000_000
+    assert parse_size("1.5gb") == 1_500_000_000
+    assert parse_size("2048") == 2048
+    assert snapshot_filename(1) == "scrape_20251224T102830Z.csv"
@@ -0,0 +1,69 @@
+from app.http_cache import etag_matches
+from app.http_metrics import http_request_db_queries
+from app.metrics import registry
+
+SNAPSHOT_CSV = "Title,UnitPrice\nPython 開発,5000円\nJava 保守,12000円\n"
+
+
+def testEtagMatchesHandlesListsWildcardAndWeakPrefix():
+    """目的: If-None-Match のカンマ区切り・"*"・W/ 付きの ETag を一致と判定し、それ以外は一致としないことを確認する。"""
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches(None, etag)
+
+
+def testDatasetGetsReturnEtagAnd304WithoutRecomputing(client, monkeypatch, uploadCsv):
+    """目的: 詳細・stats・compare に ETag と Cache-Control が付き、If-None-Match が一致すれば本文なしの 304（SQLは存在確認の1件だけ）を返すことを確認する。"""
+    monkeypatch.setenv("DATASET_CACHE_MAX_AGE_SECONDS", "120")
+    # 圧縮すると弱い ETag になるため、ここでは無圧縮で受け取る
+    client.headers["Accept-Encoding"] = "identity"
+    base = uploadCsv(SNAPSHOT_CSV)
+    target = uploadCsv("Title,UnitPrice\nGo 開発,30000円\n")
+
+    paths = [f"/datasets/{base}", f"/datasets/{base}/stats", f"/datasets/compare?base={base}&target={target}"]
+    etags = set()
+    for path in paths:
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+        assert first.headers["cache-control"] == "public, max-age=120"
+        assert client.get(path).headers["etag"] == etag
+        etags.add(etag)
+
+        registry.reset()
+        cached = client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+        assert sum(s["sum"] for s in http_request_db_queries.snapshot()) == 1
+
+    # 種類ごとに ETag が異なり、compare は base/target の順も区別する
+    assert len(etags) == 3
+    swapped = client.get(f"/datasets/compare?base={target}&target={base}")
+    assert swapped.headers["etag"] not in etags
+
+
+def testEtagChangesWhenDatasetIsReplacedAndMissingDatasetIs404(client, monkeypatch, uploadCsv):
+    """目的: 削除したデータセットは If-None-Match があっても 404 になり、別のデータセットには別の ETag が付き、max-age=0 なら no-cache になることを確認する。"""
+    monkeypatch.setenv("DATASET_CACHE_MAX_AGE_SECONDS", "0")
+    datasetId = uploadCsv(SNAPSHOT_CSV)
+    response = client.get(f"/datasets/{datasetId}/stats")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    assert client.delete(f"/datasets/{datasetId}").status_code == 204
+    assert client.get(f"/datasets/{datasetId}/stats", headers={"If-None-Match": etag}).status_code == 404
+
+    otherId = uploadCsv(SNAPSHOT_CSV)
+    other = client.get(f"/datasets/{otherId}/stats", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+    # 同一IDの比較は ETag を付けずに 400 を返す
+    same = client.get(f"/datasets/compare?base={otherId}&target={otherId}", headers={"If-None-Match": "*"})
+    assert same.status_code == 400
+    assert "etag" not in same.headers
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.llm import build_llm_client
+from app.llm_cache import CachingLLMClient, ResponseCache
+
+
+def testCachingClientReusesResultForSamePrompt(fakeLlm, llmConfig):
+    """目的: 同一プロンプトの2回目以降は内側のLLMを呼ばずキャッシュを返すことを確認する。"""
+    inner = fakeLlm(lambda prompt: f"out:{prompt}")
+    client = CachingLLMClient(inner, llmConfig(), cache=ResponseCache(ttl_seconds=60, max_entries=8))
+
+    assert client.generate("a") == "out:a"
+    assert client.generate("a") == "out:a"
+    assert asyncio.run(client.agenerate("a")) == "out:a"
+    assert inner.calls == 1
+
+    assert client.generate("b") == "out:b"
+    assert inner.calls == 2
+
+
+def testCachingClientStoresAssembledStreamText(fakeLlm, llmConfig):
+    """目的: ストリーミング完了時に結合済みテキストがキャッシュされ、非ストリーミング呼び出しで再利用できることを確認する。"""
+    inner = fakeLlm(chunks=["out:", "p"])
+    client = CachingLLMClient(inner, llmConfig(), cache=ResponseCache(ttl_seconds=60, max_entries=8))
+
+    async def collect():
+        return [chunk async for chunk in client.astream("p")]
+
+    assert asyncio.run(collect()) == ["out:", "p"]
+    assert client.generate("p") == "out:p"
+    # キャッシュヒット時は全文が1チャンクで返る
+    assert asyncio.run(collect()) == ["out:p"]
+    assert inner.calls == 1
+
+
+def testResponseCacheExpiresAndEvicts(monkeypatch):
+    """目的: TTL切れのエントリは返さず、上限を超えた場合は古いものから追い出すことを確認する。"""
+    import app.llm_cache as cache_mod
+
+    now = {"t": 100.0}
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: now["t"])
+
+    cache = ResponseCache(ttl_seconds=10, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.set("c", "3")
+    assert cache.get("a") is None
+    assert cache.get("c") == "3"
+
+    now["t"] += 11
+    assert cache.get("b") is None
+    assert len(cache) == 1
+
+
+def testBuildLlmClientWrapsWithCacheWhenTtlConfigured(llmConfig):
+    """目的: cache_ttl_seconds > 0 の場合のみキャッシュ層が組み込まれることを確認する。"""
+    assert not isinstance(build_llm_client(llmConfig()), CachingLLMClient)
+    client = build_llm_client(llmConfig(cache_ttl_seconds=30))
+    assert isinstance(client, CachingLLMClient)
+    assert client.generate("x") == "STUB_LLM_RESPONSE"
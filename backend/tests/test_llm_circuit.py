@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from app.llm import LLMAuthError, LLMRateLimitError, LLMTimeoutError, build_llm_client
+from app.llm_circuit import (
+    CircuitBreaker,
+    CircuitBreakerLLMClient,
+    LLMCircuitOpenError,
+    reset_circuit_breakers,
+)
+from app.main import app
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    import app.llm_circuit as circuit_mod
+
+    now = {"t": 1000.0}
+    monkeypatch.setattr(circuit_mod.time, "monotonic", lambda: now["t"])
+    return now
+
+
+@pytest.fixture(autouse=True)
+def resetBreakers():
+    reset_circuit_breakers()
+    yield
+    reset_circuit_breakers()
+
+
+def testCircuitOpensAfterConsecutiveRetryableFailures(clock, fakeLlm):
+    """目的: retryable な失敗が閾値回数連続すると open になり、以降はLLMを呼ばずに即座に失敗することを確認する。"""
+    inner = fakeLlm(exc=LLMTimeoutError("timeout"))
+    client = CircuitBreakerLLMClient(inner, CircuitBreaker(failure_threshold=3, open_seconds=30))
+
+    for _ in range(3):
+        with pytest.raises(LLMTimeoutError):
+            client.generate("x")
+    assert client.breaker.state == "open"
+
+    with pytest.raises(LLMCircuitOpenError) as excinfo:
+        client.generate("x")
+    assert inner.calls == 3
+    assert excinfo.value.retry_after == pytest.approx(30)
+
+
+def testCircuitHalfOpenProbeClosesOnSuccessAndReopensOnFailure(clock, fakeLlm):
+    """目的: open 期間後は probe を1件だけ通し、成功で closed、失敗で再び open になることを確認する。"""
+    inner = fakeLlm(exc=LLMTimeoutError("timeout"))
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10)
+    client = CircuitBreakerLLMClient(inner, breaker)
+
+    with pytest.raises(LLMTimeoutError):
+        client.generate("x")
+    assert breaker.state == "open"
+
+    # probe 失敗 → 再び open
+    clock["t"] += 11
+    with pytest.raises(LLMTimeoutError):
+        client.generate("x")
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+
+    # probe 成功 → closed
+    clock["t"] += 11
+    inner.exc = None
+    assert client.generate("x") == "ok"
+    assert breaker.state == "closed"
+    assert breaker.consecutive_failures == 0
+
+
+def testCircuitAllowsOnlyOneConcurrentProbe(clock):
+    """目的: half-open 中は probe 実行中の他の呼び出しを即座に拒否することを確認する。"""
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10)
+    breaker.record_failure(LLMTimeoutError("timeout"))
+    clock["t"] += 11
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(LLMCircuitOpenError):
+        breaker.before_call()
+
+
+def testCircuitIgnoresNonRetryableFailures(clock, fakeLlm):
+    """目的: 認証エラーなど非retryableな失敗は open の判定に数えないことを確認する。"""
+    inner = fakeLlm(exc=LLMAuthError("auth"))
+    client = CircuitBreakerLLMClient(inner, CircuitBreaker(failure_threshold=1, open_seconds=10))
+
+    for _ in range(3):
+        with pytest.raises(LLMAuthError):
+            asyncio.run(client.agenerate("x"))
+    assert client.breaker.state == "closed"
+    assert inner.calls == 3
+
+
+def testCircuitIgnoresLocalRateLimitRejections(tmp_path, llmConfig):
+    """目的: LLM_RATE_LIMIT_RPM によるクライアント側の拒否（プロバイダに送っていない）は open の判定に数えないことを確認する。"""
+    config = llmConfig(
+        max_retries=0,
+        single_flight=False,
+        rate_limit_rpm=1,
+        rate_limit_max_wait_seconds=0,
+        rate_limit_state_dir=str(tmp_path),
+        circuit_failure_threshold=1,
+    )
+    client = build_llm_client(config)
+    assert isinstance(client, CircuitBreakerLLMClient)
+
+    assert asyncio.run(client.agenerate("x")) == "STUB_LLM_RESPONSE"
+    for _ in range(3):
+        with pytest.raises(LLMRateLimitError):
+            asyncio.run(client.agenerate("x"))
+    assert client.breaker.state == "closed"
+    assert client.breaker.consecutive_failures == 0
+
+
+def testBuildLlmClientSharesBreakerPerProviderModel(llmConfig):
+    """目的: リクエストごとにクライアントを作っても、ブレーカーの状態は provider/model 単位で共有されることを確認する。"""
+    config = llmConfig(max_retries=0, single_flight=False)
+    first = build_llm_client(config)
+    second = build_llm_client(config)
+    assert isinstance(first, CircuitBreakerLLMClient)
+    assert first.breaker is second.breaker
+
+
+def testAnalysisEndpointsFallBackToTemplateWhenCircuitOpen(client, monkeypatch, uploadCsv, fakeLlm):
+    """目的: ブレーカー open 時は、各分析エンドポイントがテンプレート分析を degraded として即答することを確認する。"""
+    from app.main import getLlmClient
+
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    app.dependency_overrides[getLlmClient] = lambda: fakeLlm(exc=LLMCircuitOpenError("open"))
+    try:
+        baseId = uploadCsv("price\n100\n200\n")
+        targetId = uploadCsv("price\n150\n250\n300\n")
+
+        response = client.get(f"/datasets/{baseId}/analysis")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["degraded"] is True
+        assert body["degraded_reason"] == "LLM_CIRCUIT_OPEN"
+        assert "LLM未接続" in body["analysis_text"]
+
+        response = client.get(f"/datasets/compare/analysis?base={baseId}&target={targetId}")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["degraded"] is True
+        assert "## 変化の概要" in body["analysis_text"]
+        assert body["comparison_summary"]["rows_change"]["diff"] == 1
+
+        response = client.get(f"/datasets/compare/analysis/stream?base={baseId}&target={targetId}")
+        assert response.status_code == 200
+        assert '"degraded": true' in response.text
+        assert "event: done" in response.text
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testGetLlmCircuitStateEndpoint(client, monkeypatch, llmConfig):
+    """目的: GET /llm/circuit が管理者にだけブレーカーの状態を返すことを確認する。"""
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin-token")
+    build_llm_client(llmConfig())
+
+    assert client.get("/llm/circuit").status_code == 403
+    response = client.get("/llm/circuit", headers={"X-Admin-Token": "test-admin-token"})
+    assert response.status_code == 200
+    assert response.json()["breakers"]["stub/stub"]["state"] == "closed"
@@ -34,3 +34,40 @@ def testBuildLlmClientReturnsGeminiClientWhenConfigured():
     assert hasattr(client, "generate")
 
 
+
+
+def testStubLlmClientAgenerateReturnsStubResponse():
+    """目的: スタブ実装の agenerate が generate と同じ結果を返すことを確認する。"""
+    import asyncio
+
+    config = LLMConfig(provider="stub", api_key=None, model="stub", timeout_seconds=1)
+    client = build_llm_client(config)
+    assert asyncio.run(client.agenerate("x")) == "STUB_LLM_RESPONSE"
+
+
+def testAgenerateTextFallsBackToSyncGenerate():
+    """目的: agenerate を持たない同期実装でも agenerate_text で呼び出せることを確認する。"""
+    import asyncio
+
+    from app.llm import agenerate_text
+
+    class SyncOnlyLlm:
+        def generate(self, prompt: str) -> str:
+            return f"sync:{prompt}"
+
+    assert asyncio.run(agenerate_text(SyncOnlyLlm(), "p")) == "sync:p"
+
+
+def testPromptTokenBudgetUsesModelDefaultsAndOverride():
+    """目的: プロンプトのトークン予算がモデル別の既定値になり、設定値で上書きできることを確認する。"""
+    from app.llm import DEFAULT_PROMPT_TOKEN_BUDGET, prompt_token_budget
+
+    def config(model: str, budget: int = 0) -> LLMConfig:
+        return LLMConfig(
+            provider="gemini", api_key="dummy", model=model, timeout_seconds=1, prompt_token_budget=budget
+        )
+
+    assert prompt_token_budget(config("gemini-1.5-pro")) == 8000
+    assert prompt_token_budget(config("models/gemini-1.5-flash-002")) == 4000
+    assert prompt_token_budget(config("unknown-model")) == DEFAULT_PROMPT_TOKEN_BUDGET
+    assert prompt_token_budget(config("gemini-1.5-pro", budget=1200)) == 1200
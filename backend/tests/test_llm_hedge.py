@@ -0,0 +1,222 @@
+import asyncio
+import time
+
+import pytest
+
+from app.llm import (
+    LLMProviderError,
+    LLMTimeoutError,
+    astream_within_deadline,
+    attempt_timeout_seconds,
+    build_llm_client,
+    llm_deadline,
+)
+from app.llm_hedge import HedgedLLMClient, get_latency_tracker, reset_latency_trackers
+from app.llm_retry import RetryingLLMClient, RetryPolicy
+from app.main import app, getLlmClient, getLlmConfig
+
+
+class SlowFirstLlm:
+    """呼び出しごとに指定した秒数だけ待って応答するFake（キャンセルされた呼び出しも記録する）。"""
+
+    def __init__(self, delays: list[float], errors: dict[int, Exception] | None = None):
+        self.delays = list(delays)
+        self.errors = errors or {}
+        self.calls = 0
+        self.cancelled = 0
+
+    def generate(self, prompt: str) -> str:
+        raise AssertionError("sync generate must not be called")
+
+    async def agenerate(self, prompt: str) -> str:
+        index = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[index])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if index in self.errors:
+            raise self.errors[index]
+        return f"answer-{index}"
+
+    async def astream(self, prompt: str):
+        index = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[index])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if index in self.errors:
+            raise self.errors[index]
+        for part in ("a", "b", "c"):
+            yield f"{part}{index}"
+
+
+HEDGE_SETTINGS = {"hedge_percentile": 95, "hedge_initial_delay_seconds": 0.05, "hedge_min_samples": 3}
+
+
+@pytest.fixture()
+def makeConfig(llmConfig):
+    """目的: ヘッジの既定値（HEDGE_SETTINGS）を入れた LLMConfig を作る関数を提供する。"""
+    return lambda **kwargs: llmConfig(**{**HEDGE_SETTINGS, **kwargs})
+
+
+@pytest.fixture(autouse=True)
+def resetTrackers():
+    reset_latency_trackers()
+    yield
+    reset_latency_trackers()
+
+
+def testHedgedClientReturnsFasterSecondAttempt(makeConfig):
+    """目的: 1本目が遅延の閾値を過ぎると2本目を投げ、先に返った2本目を採用して1本目をキャンセルすることを確認する。"""
+    config = makeConfig()
+    fake = SlowFirstLlm([1.0, 0.01])
+    hedged = HedgedLLMClient(fake, config)
+
+    started = time.monotonic()
+    assert asyncio.run(hedged.agenerate("p")) == "answer-1"
+    assert time.monotonic() - started < 0.5
+    assert fake.calls == 2
+    assert fake.cancelled == 1
+    assert get_latency_tracker(config, "generate").snapshot() == {
+        "samples": 1,
+        "calls": 1,
+        "hedged": 1,
+        "hedge_won": 1,
+    }
+
+
+def testHedgedClientDoesNotHedgeFastOrFailedFirstAttempt(makeConfig):
+    """目的: 閾値内に返った呼び出し（成功/失敗とも）は2本目を投げず、そのまま返すことを確認する。"""
+    fake = SlowFirstLlm([0.0, 0.0], errors={1: LLMProviderError("boom")})
+    hedged = HedgedLLMClient(fake, makeConfig())
+
+    assert asyncio.run(hedged.agenerate("p")) == "answer-0"
+    with pytest.raises(LLMProviderError):
+        asyncio.run(hedged.agenerate("p"))
+    assert fake.calls == 2
+
+
+def testHedgedClientWaitsForFirstAttemptWhenHedgeFails(makeConfig):
+    """目的: 2本目が失敗しても、1本目が成功すればその結果を返すことを確認する。"""
+    fake = SlowFirstLlm([0.1, 0.0], errors={1: LLMProviderError("boom")})
+    hedged = HedgedLLMClient(fake, makeConfig(hedge_initial_delay_seconds=0.02))
+    assert asyncio.run(hedged.agenerate("p")) == "answer-0"
+    assert fake.calls == 2
+
+
+def testHedgeDelayUsesObservedPercentile(makeConfig):
+    """目的: サンプルが揃うまでは初期値、揃った後は直近の応答時間の pN を遅延の閾値に使うことを確認する。"""
+    config = makeConfig(hedge_percentile=50, hedge_initial_delay_seconds=2.0)
+    hedged = HedgedLLMClient(SlowFirstLlm([]), config)
+    tracker = get_latency_tracker(config, "generate")
+
+    tracker.record(0.1)
+    tracker.record(0.3)
+    assert hedged.hedge_delay(tracker) == 2.0
+    tracker.record(0.2)
+    assert hedged.hedge_delay(tracker) == 0.2
+
+
+def testHedgedStreamFollowsFirstAttemptToYieldChunk(makeConfig):
+    """目的: ストリーミングでは最初のチャンクを返した試行に従い、チャンクが混ざらないことを確認する。"""
+    fake = SlowFirstLlm([1.0, 0.01])
+    hedged = HedgedLLMClient(fake, makeConfig())
+
+    async def collect() -> list[str]:
+        return [chunk async for chunk in hedged.astream("p")]
+
+    assert asyncio.run(collect()) == ["a1", "b1", "c1"]
+    assert fake.cancelled == 1
+
+
+def testBuildLlmClientAddsHedgeLayerInsideRetry(makeConfig):
+    """目的: LLM_HEDGE_PERCENTILE > 0 の場合、ヘッジ層が再試行層の内側に組み込まれることを確認する。"""
+    config = makeConfig(single_flight=False, circuit_failure_threshold=0)
+    client = build_llm_client(config)
+    assert isinstance(client, RetryingLLMClient)
+    assert isinstance(client.inner, HedgedLLMClient)
+
+    client = build_llm_client(makeConfig(hedge_percentile=0, single_flight=False, circuit_failure_threshold=0))
+    assert not isinstance(client.inner, HedgedLLMClient)
+
+
+def testLlmDeadlineCancelsSlowCallAndBoundsTimeouts():
+    """目的: 締め切りを過ぎた呼び出しがキャンセルされ LLMTimeoutError になり、試行のタイムアウトも残り時間で切り詰められることを確認する。"""
+    fake = SlowFirstLlm([5.0])
+
+    async def call() -> str:
+        async with llm_deadline(0.05):
+            assert attempt_timeout_seconds(20) <= 0.05
+            return await fake.agenerate("p")
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(call())
+    assert time.monotonic() - started < 1.0
+    assert fake.cancelled == 1
+    assert attempt_timeout_seconds(20) == 20
+
+
+def testRetryStopsAtRequestDeadline():
+    """目的: リクエストの締め切りまでに再試行の待機が収まらない場合は、再試行せずに直前の例外を返すことを確認する。"""
+    fake = SlowFirstLlm([0.0, 0.0], errors={0: LLMProviderError("boom", retry_after=5)})
+    retrying = RetryingLLMClient(
+        fake, RetryPolicy(max_retries=3, base_delay_seconds=0.01, max_delay_seconds=1, deadline_seconds=60)
+    )
+
+    async def call() -> str:
+        async with llm_deadline(1.0):
+            return await retrying.agenerate("p")
+
+    with pytest.raises(LLMProviderError):
+        asyncio.run(call())
+    assert fake.calls == 1
+
+
+def testStreamDeadlineStopsSlowStream():
+    """目的: ストリーミングにも全体の締め切りがかかり、超過時は LLMTimeoutError になることを確認する。"""
+
+    async def slowChunks():
+        yield "first"
+        await asyncio.sleep(5)
+        yield "never"
+
+    async def collect() -> list[str]:
+        chunks = []
+        async for chunk in astream_within_deadline(slowChunks(), 0.05):
+            chunks.append(chunk)
+        return chunks
+
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(collect())
+
+
+def testAnalysisEndpointReturns504AtRequestDeadline(client, monkeypatch, makeConfig, uploadCsv):
+    """目的: LLM_REQUEST_DEADLINE_SECONDS を過ぎた分析リクエストが、タイムアウトを待たずに504を返すことを確認する。"""
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    datasetId = uploadCsv("a\n1\n")
+
+    app.dependency_overrides[getLlmConfig] = lambda: makeConfig(request_deadline_seconds=0.05)
+    app.dependency_overrides[getLlmClient] = lambda: SlowFirstLlm([5.0])
+    try:
+        started = time.monotonic()
+        response = client.get(f"/datasets/{datasetId}/analysis")
+        assert response.status_code == 504
+        assert response.json()["detail"]["error"]["code"] == "LLM_TIMEOUT"
+        assert time.monotonic() - started < 2.0
+    finally:
+        app.dependency_overrides.clear()
+
+
+def testGetLlmHedgeStatsEndpoint(client, monkeypatch, makeConfig):
+    """目的: GET /llm/hedge-stats が管理者にだけ provider/model/種類別のヘッジ統計を返すことを確認する。"""
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin-token")
+    get_latency_tracker(makeConfig(), "stream").count("hedged")
+    assert client.get("/llm/hedge-stats").status_code == 403
+    response = client.get("/llm/hedge-stats", headers={"X-Admin-Token": "test-admin-token"})
+    assert response.status_code == 200
+    assert response.json()["hedges"]["stub/stub:stream"]["hedged"] == 1
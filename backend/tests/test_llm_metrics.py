@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.analysis import agenerate_comparison_analysis_text, astream_llm_analysis_text
+from app.llm import LLMTimeoutError, build_llm_client
+from app.llm_metrics import InstrumentedLLMClient, llm_call_duration, llm_calls, llm_first_chunk, llm_prompt_chars
+from app.metrics import Counter, Histogram, registry
+
+
+@pytest.fixture(autouse=True)
+def resetMetrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def testHistogramKeepsCumulativeBucketsPerLabelSet():
+    """目的: ヒストグラムがラベル値ごとに累積バケット・件数・合計を返し、境界値は le 側に入ることを確認する。"""
+    histogram = Histogram("h", "help", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.1, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(3.0, "/a")
+    histogram.observe(0.01, "/b")
+
+    samples = {s["labels"]["route"]: s for s in histogram.snapshot()}
+    assert samples["/a"]["buckets"] == {"0.1": 1, "1": 2, "+Inf": 3}
+    assert samples["/a"]["count"] == 3
+    assert samples["/a"]["sum"] == pytest.approx(3.6)
+    assert samples["/b"]["buckets"] == {"0.1": 1, "1": 1, "+Inf": 1}
+
+    counter = Counter("c", "help", ("code",))
+    counter.inc("OK")
+    counter.inc("OK", amount=2)
+    assert counter.snapshot() == [{"labels": {"code": "OK"}, "value": 3.0}]
+
+
+def testInstrumentedClientRecordsLabelsFromAnalysis(llmConfig):
+    """目的: 分析関数を通した呼び出しが provider/model/分析の種類/プロンプト版のラベル付きで記録されることを確認する。"""
+    llm = build_llm_client(llmConfig())
+    comparison = {"base_dataset": {}, "target_dataset": {}, "comparison": {}}
+    asyncio.run(agenerate_comparison_analysis_text(comparison, llm, version="v2"))
+
+    labels = ("stub", "stub", "compare", "v2")
+    assert llm_calls.value(*labels, "OK") == 1
+    [prompt] = llm_prompt_chars.snapshot()
+    assert prompt["labels"]["prompt_version"] == "v2"
+    assert prompt["sum"] > 0
+    assert llm_call_duration.snapshot()[0]["count"] == 1
+
+
+def testInstrumentedClientRecordsErrorCodeAndStreamFirstChunk(fakeLlm, llmConfig):
+    """目的: LLM例外は LLMError.code で数え、ストリーミングは最初のチャンクまでの時間も記録することを確認する。"""
+    failing = InstrumentedLLMClient(fakeLlm(exc=LLMTimeoutError("timeout")), llmConfig())
+    with pytest.raises(LLMTimeoutError):
+        failing.generate("p")
+    assert llm_calls.value("stub", "stub", "unknown", "unknown", "LLM_TIMEOUT") == 1
+
+    streaming = InstrumentedLLMClient(fakeLlm("abc", chunks=["ab", "c"]), llmConfig())
+    stats = {"dataset_id": 1, "rows": 1, "columns": []}
+
+    async def collect() -> str:
+        return "".join([chunk async for chunk in astream_llm_analysis_text(stats, streaming)])
+
+    assert asyncio.run(collect()) == "abc"
+    assert llm_calls.value("stub", "stub", "dataset", "v1", "OK") == 1
+    [firstChunk] = llm_first_chunk.snapshot()
+    assert firstChunk["labels"]["analysis"] == "dataset"
+    assert firstChunk["count"] == 1
+
+
+def testGetLlmMetricsEndpoint(client, monkeypatch, uploadCsv):
+    """目的: GET /llm/metrics が分析エンドポイント経由のLLM呼び出しの計測値を返すことを確認する。"""
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    datasetId = uploadCsv("a\n1\n")
+    assert client.get(f"/datasets/{datasetId}/analysis").status_code == 200
+
+    metrics = client.get("/llm/metrics").json()["metrics"]
+    assert metrics["llm_calls_total"]["type"] == "counter"
+    [sample] = metrics["llm_calls_total"]["samples"]
+    assert sample["labels"] == {
+        "provider": "stub",
+        "model": "stub",
+        "analysis": "dataset",
+        "prompt_version": "v1",
+        "code": "OK",
+    }
+    assert sample["value"] == 1
+    assert metrics["llm_output_chars"]["samples"][0]["sum"] == len("STUB_LLM_RESPONSE")
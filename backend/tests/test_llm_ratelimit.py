@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from app.llm import LLMConfig, LLMRateLimitError, build_llm_client, estimate_tokens
+from app.llm_ratelimit import FileTokenBucket, RateLimit, RateLimitedLLMClient
+from app.llm_retry import RetryingLLMClient
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    """目的: バケットの時刻を固定し、補充量を決定的にする。"""
+    import app.llm_ratelimit as ratelimit_mod
+
+    now = {"t": 1_000_000.0}
+    monkeypatch.setattr(ratelimit_mod.time, "time", lambda: now["t"])
+    return now
+
+
+def makeLimit(**kwargs) -> RateLimit:
+    values = {"requests_per_minute": 2, "tokens_per_minute": 0, "max_wait_seconds": 10, "output_tokens_reserve": 0}
+    values.update(kwargs)
+    return RateLimit(**values)
+
+
+def testFileTokenBucketLimitsRequestsPerMinute(tmp_path, clock):
+    """目的: RPMを使い切ると待機秒数が返り、時間経過で補充されることを確認する。"""
+    bucket = FileTokenBucket(str(tmp_path / "bucket.json"), makeLimit(requests_per_minute=2))
+
+    assert bucket.try_acquire(0) == 0
+    assert bucket.try_acquire(0) == 0
+    assert bucket.try_acquire(0) == pytest.approx(30.0)
+
+    clock["t"] += 30
+    assert bucket.try_acquire(0) == 0
+
+
+def testFileTokenBucketLimitsTokensPerMinute(tmp_path, clock):
+    """目的: TPMの残量が足りない場合に、不足分に応じた待機秒数が返ることを確認する。"""
+    bucket = FileTokenBucket(
+        str(tmp_path / "bucket.json"), makeLimit(requests_per_minute=0, tokens_per_minute=600)
+    )
+
+    assert bucket.try_acquire(500) == 0
+    # 残り100トークン、300必要 → 不足200 / (600/60 per sec) = 20s
+    assert bucket.try_acquire(300) == pytest.approx(20.0)
+
+
+def testFileTokenBucketIsSharedAcrossInstances(tmp_path, clock):
+    """目的: 同じファイルを使う別インスタンス（別ワーカー相当）と残量を共有することを確認する。"""
+    path = str(tmp_path / "bucket.json")
+    workerA = FileTokenBucket(path, makeLimit(requests_per_minute=1))
+    workerB = FileTokenBucket(path, makeLimit(requests_per_minute=1))
+
+    assert workerA.try_acquire(0) == 0
+    assert workerB.try_acquire(0) > 0
+
+
+def testRateLimitedClientWaitsBrieflyThenCalls(tmp_path, clock, monkeypatch, fakeLlm):
+    """目的: 枠が空くまで待ってから内側のLLMを呼ぶことを確認する。"""
+    import app.llm_ratelimit as ratelimit_mod
+
+    sleeps = []
+
+    def fakeSleep(seconds):
+        sleeps.append(seconds)
+        clock["t"] += seconds
+
+    monkeypatch.setattr(ratelimit_mod.time, "sleep", fakeSleep)
+
+    inner = fakeLlm()
+    bucket = FileTokenBucket(str(tmp_path / "bucket.json"), makeLimit(requests_per_minute=60))
+    client = RateLimitedLLMClient(inner, bucket)
+
+    for _ in range(61):
+        assert client.generate("x") == "ok"
+    assert inner.calls == 61
+    assert len(sleeps) == 1
+    assert sleeps[0] == pytest.approx(1.0)
+
+
+def testRateLimitedClientRejectsWithoutCallingWhenWaitTooLong(tmp_path, clock, fakeLlm):
+    """目的: 待機上限を超える場合はプロバイダを呼ばずに LLMRateLimitError（retry_after付き）を返すことを確認する。"""
+    inner = fakeLlm()
+    bucket = FileTokenBucket(
+        str(tmp_path / "bucket.json"), makeLimit(requests_per_minute=1, max_wait_seconds=5)
+    )
+    client = RateLimitedLLMClient(inner, bucket)
+
+    assert asyncio.run(client.agenerate("x")) == "ok"
+    with pytest.raises(LLMRateLimitError) as excinfo:
+        asyncio.run(client.agenerate("x"))
+    assert excinfo.value.retry_after == pytest.approx(60.0)
+    assert inner.calls == 1
+
+
+def testRateLimitedClientAcquiresOffEventLoop(tmp_path, clock, fakeLlm):
+    """目的: 非同期の呼び出しでは、バケットの確保（flock とファイルI/O）をイベントループのスレッド外で行うことを確認する。"""
+    import threading
+
+    threads = []
+
+    class RecordingBucket(FileTokenBucket):
+        def try_acquire(self, tokens: int) -> float:
+            threads.append(threading.current_thread())
+            return super().try_acquire(tokens)
+
+    client = RateLimitedLLMClient(fakeLlm(), RecordingBucket(str(tmp_path / "bucket.json"), makeLimit()))
+
+    async def run():
+        return await client.agenerate("x"), threading.current_thread()
+
+    result, loopThread = asyncio.run(run())
+    assert result == "ok"
+    assert threads and all(t is not loopThread for t in threads)
+
+
+def testEstimateTokensCountsJapaneseHigherThanAscii():
+    """目的: トークン概算が日本語（非ASCII）を1文字1トークン程度として数えることを確認する。"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("価格帯") == 3
+
+
+def testBuildLlmClientAddsRateLimitInsideRetry(tmp_path):
+    """目的: RPM/TPMが設定された場合、レート制限層が再試行層の内側に組み込まれることを確認する。"""
+    config = LLMConfig(
+        provider="stub",
+        api_key=None,
+        model="stub",
+        timeout_seconds=1,
+        rate_limit_rpm=10,
+        rate_limit_state_dir=str(tmp_path),
+        single_flight=False,
+        circuit_failure_threshold=0,
+    )
+    client = build_llm_client(config)
+    assert isinstance(client, RetryingLLMClient)
+    assert isinstance(client.inner, RateLimitedLLMClient)
+    assert client.generate("x") == "STUB_LLM_RESPONSE"
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from app.llm import (
+    LLMAuthError,
+    LLMProviderError,
+    LLMRateLimitError,
+    LLMTimeoutError,
+    build_llm_client,
+)
+from app.llm_retry import RetryingLLMClient, RetryPolicy, llm_retries, retry_stats
+
+
+@pytest.fixture(autouse=True)
+def recordSleeps(monkeypatch):
+    """目的: 実際には待たず、待機秒数だけを記録する。"""
+    import app.llm_retry as retry_mod
+
+    sleeps: list[float] = []
+
+    async def fakeAsyncSleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(retry_mod.time, "sleep", lambda seconds: sleeps.append(seconds))
+    monkeypatch.setattr(retry_mod.asyncio, "sleep", fakeAsyncSleep)
+    llm_retries.reset()
+    yield sleeps
+    llm_retries.reset()
+
+
+def makePolicy(**kwargs) -> RetryPolicy:
+    values = {"max_retries": 3, "base_delay_seconds": 0.5, "max_delay_seconds": 4, "deadline_seconds": 60}
+    values.update(kwargs)
+    return RetryPolicy(**values)
+
+
+def testRetryingClientRecoversFromRetryableErrors(recordSleeps, fakeLlm):
+    """目的: retryable な例外は再試行され、成功すれば結果を返すことを確認する。"""
+    inner = fakeLlm(errors=[LLMTimeoutError("t"), LLMProviderError("p")])
+    client = RetryingLLMClient(inner, makePolicy())
+
+    assert client.generate("x") == "ok"
+    assert inner.calls == 3
+    assert len(recordSleeps) == 2
+    # full jitter: 0 <= delay <= base * 2^(n-1)
+    assert 0 <= recordSleeps[0] <= 0.5
+    assert 0 <= recordSleeps[1] <= 1.0
+
+    stats = retry_stats()
+    assert stats["LLM_TIMEOUT"]["retried"] == 1
+    assert stats["LLM_PROVIDER_ERROR"]["retried"] == 1
+    assert stats["LLM_PROVIDER_ERROR"]["recovered"] == 1
+
+
+def testRetryingClientDoesNotRetryNonRetryableErrors(recordSleeps, fakeLlm):
+    """目的: retryable=False の例外（認証エラー等）は再試行せず即座に送出することを確認する。"""
+    inner = fakeLlm(errors=[LLMAuthError("auth")])
+    client = RetryingLLMClient(inner, makePolicy())
+
+    with pytest.raises(LLMAuthError):
+        client.generate("x")
+    assert inner.calls == 1
+    assert recordSleeps == []
+    assert retry_stats() == {}
+
+
+def testRetryingClientGivesUpAfterMaxRetries(recordSleeps, fakeLlm):
+    """目的: 再試行回数の上限に達したら最後の例外を送出し、exhausted として記録することを確認する。"""
+    inner = fakeLlm(errors=[LLMRateLimitError("r")] * 5)
+    client = RetryingLLMClient(inner, makePolicy(max_retries=2))
+
+    with pytest.raises(LLMRateLimitError):
+        asyncio.run(client.agenerate("x"))
+    assert inner.calls == 3
+    stats = retry_stats()["LLM_RATE_LIMIT"]
+    assert stats == {"retried": 2, "recovered": 0, "exhausted": 1}
+
+
+def testRetryingClientHonorsRetryAfterAndDeadline(recordSleeps, fakeLlm):
+    """目的: Retry-After の秒数以上待つこと、締め切りを超える待機はせずに諦めることを確認する。"""
+    inner = fakeLlm(errors=[LLMRateLimitError("r", retry_after=3.0)])
+    client = RetryingLLMClient(inner, makePolicy())
+    assert client.generate("x") == "ok"
+    assert recordSleeps == [3.0]
+
+    inner = fakeLlm(errors=[LLMRateLimitError("r", retry_after=120.0)])
+    client = RetryingLLMClient(inner, makePolicy(deadline_seconds=10))
+    with pytest.raises(LLMRateLimitError):
+        client.generate("x")
+    assert inner.calls == 1
+
+
+def testRetryingClientRetriesStreamOnlyBeforeFirstChunk(recordSleeps, fakeLlm):
+    """目的: ストリーミングは最初のチャンク前の失敗のみ再試行することを確認する。"""
+    inner = fakeLlm(errors=[LLMTimeoutError("t")], chunks=["o", "k"])
+    client = RetryingLLMClient(inner, makePolicy())
+
+    async def collect():
+        return [chunk async for chunk in client.astream("x")]
+
+    assert asyncio.run(collect()) == ["o", "k"]
+    assert inner.calls == 2
+
+
+def testGeminiRateLimitCarriesRetryAfter(monkeypatch):
+    """目的: Gemini の 429 で Retry-After ヘッダ / RetryInfo が LLMRateLimitError.retry_after に入ることを確認する。"""
+    from app.llm import GeminiAiStudioClient
+
+    class FakeResponse:
+        status_code = 429
+
+        def __init__(self, headers, body):
+            self.headers = headers
+            self.body = body
+
+        def json(self):
+            return self.body
+
+    with pytest.raises(LLMRateLimitError) as excinfo:
+        GeminiAiStudioClient._raise_for_status(FakeResponse({"retry-after": "5"}, {"error": {"message": "quota"}}))
+    assert excinfo.value.retry_after == 5.0
+
+    body = {
+        "error": {
+            "message": "quota",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "7s"}],
+        }
+    }
+    with pytest.raises(LLMRateLimitError) as excinfo:
+        GeminiAiStudioClient._raise_for_status(FakeResponse({}, body))
+    assert excinfo.value.retry_after == 7.0
+
+
+def testBuildLlmClientAddsRetryLayerFromConfig(llmConfig):
+    """目的: max_retries > 0 の場合に再試行層が組み込まれ、0 の場合は組み込まれないことを確認する。"""
+    config = llmConfig(max_retries=2, single_flight=False, circuit_failure_threshold=0)
+    assert isinstance(build_llm_client(config), RetryingLLMClient)
+
+    config = llmConfig(max_retries=0, single_flight=False, circuit_failure_threshold=0)
+    assert not isinstance(build_llm_client(config), RetryingLLMClient)
+
+
+def testGetLlmRetryStatsEndpoint(client):
+    """目的: GET /llm/retry-stats と /metrics（llm_retries_total）が同じ再試行統計を返すことを確認する。"""
+    llm_retries.reset()
+    llm_retries.inc("LLM_TIMEOUT", "retried")
+    response = client.get("/llm/retry-stats")
+    assert response.status_code == 200
+    assert response.json()["retries"] == {"LLM_TIMEOUT": {"retried": 1, "recovered": 0, "exhausted": 0}}
+    assert 'llm_retries_total{code="LLM_TIMEOUT",outcome="retried"} 1' in client.get("/metrics").text
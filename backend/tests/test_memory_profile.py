@@ -0,0 +1,88 @@
+import io
+import logging
+import time
+import tracemalloc
+
+import pytest
+
+from app.memory_profile import RequestMemory, memory_records, top_sites
+
+ADMIN_HEADERS = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin-token")
+    memory_records.clear()
+    tracemalloc.start(5)
+    yield
+    tracemalloc.stop()
+    memory_records.clear()
+
+
+def allocateBlocks(count: int) -> list[bytearray]:
+    return [bytearray(64 * 1024) for _ in range(count)]
+
+
+def testRequestMemorySnapshotPointsAtAllocationSite(tracing):
+    """目的: 開始時からの増加が閾値を超えたときのスナップショットで、確保元の関数の行が上位に出ることを確認する。"""
+    with RequestMemory(threshold_bytes=1024 * 1024) as measurement:
+        blocks = allocateBlocks(64)  # 約4MB
+        measurement.poll()
+
+    assert measurement.max_seen_bytes - measurement.start_bytes >= 4 * 1024 * 1024
+    assert measurement.snapshot is not None
+    sites = top_sites(measurement.snapshot)
+    assert sites[0]["site"].startswith("tests/test_memory_profile.py:")
+    assert sites[0]["size_bytes"] >= 4 * 1024 * 1024
+    assert sites[0]["count"] >= 64
+    del blocks
+
+
+def testMemoryProfileRecordsRequestsAndAdminEndpoint(client, tracing, caplog):
+    """目的: tracemalloc 有効時にリクエストごとのピーク確保量がルート付きで記録・ログ出力され、/admin/memory で確認・消去できることを確認する。"""
+    csv_text = "colA,colB\n" + "".join(f"{i},{'x' * 50}\n" for i in range(2000))
+    dataset_id = client.post(
+        "/datasets/upload", files={"file": ("a.csv", io.BytesIO(csv_text.encode("utf-8")), "text/csv")}
+    ).json()["dataset_id"]
+    with caplog.at_level(logging.INFO, logger="prism.backend.memory"):
+        assert client.get(f"/datasets/{dataset_id}/stats").status_code == 200
+
+    assert any("/datasets/{dataset_id}/stats - memory peak" in r.getMessage() for r in caplog.records)
+
+    assert client.get("/admin/memory").status_code == 403
+    body = client.get("/admin/memory", headers=ADMIN_HEADERS).json()
+    assert body["enabled"] is True
+    assert body["traced_peak_bytes"] >= body["traced_current_bytes"] > 0
+    stats = next(r for r in body["requests"] if r["route"] == "/datasets/{dataset_id}/stats")
+    assert stats["path"] == f"/datasets/{dataset_id}/stats"
+    assert stats["status"] == 200
+    assert stats["peak_bytes"] > 0
+    assert stats["shared"] is False
+    upload = next(r for r in body["requests"] if r["route"] == "/datasets/upload")
+    assert upload["peak_bytes"] >= len(csv_text)
+
+    assert client.delete("/admin/memory", headers=ADMIN_HEADERS).status_code == 204
+    # 消去の直後に記録されるのは消去リクエスト自身だけ
+    assert [r["route"] for r in memory_records.entries()] == ["/admin/memory"]
+
+
+def testMemoryProfileExcludesBackgroundTasks(client, tracing, monkeypatch, uploadCsv):
+    """目的: レスポンス送信後に実行する BackgroundTasks（取り込み後の事前計算）の確保と時間を、リクエストの記録に含めないことを確認する。"""
+    import app.main as main_mod
+
+    ran = []
+
+    async def allocatingPrewarm(datasetId: int) -> None:
+        blocks = allocateBlocks(512)  # 約32MB
+        time.sleep(0.3)
+        ran.append(len(blocks))
+
+    monkeypatch.setenv("ANALYSIS_PREWARM", "1")
+    monkeypatch.setattr(main_mod, "prewarmDatasetAnalyses", allocatingPrewarm)
+    uploadCsv()
+
+    assert ran == [512]
+    upload = next(r for r in memory_records.entries() if r["route"] == "/datasets/upload")
+    assert upload["peak_bytes"] < 16 * 1024 * 1024
+    assert upload["duration_ms"] < 300
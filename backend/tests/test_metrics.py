@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.http_metrics import (
+    http_in_flight,
+    http_request_db_queries,
+    http_request_duration,
+    http_request_size,
+    http_requests,
+    http_response_size,
+)
+from app.metrics import MetricsRegistry, registry, render_prometheus
+
+
+@pytest.fixture(autouse=True)
+def resetMetrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def _sample(metric, **labels) -> dict:
+    [sample] = [s for s in metric.snapshot() if s["labels"] == labels]
+    return sample
+
+
+def testHttpMetricsUseRouteTemplateAndStatus(client, uploadCsv):
+    """目的: リクエスト数がパスのテンプレート・メソッド・ステータス別に数えられ、未定義のパスは1系列にまとまることを確認する。"""
+    datasetId = uploadCsv()
+    assert client.get(f"/datasets/{datasetId}/stats").status_code == 200
+    assert client.get("/datasets/999999/stats").status_code == 404
+    assert client.get("/no/such/path").status_code == 404
+    assert client.get("/also/missing").status_code == 404
+
+    assert http_requests.value("GET", "/datasets/{dataset_id}/stats", "200") == 1
+    assert http_requests.value("GET", "/datasets/{dataset_id}/stats", "404") == 1
+    assert http_requests.value("GET", "<unmatched>", "404") == 2
+    assert http_requests.value("POST", "/datasets/upload", "200") == 1
+    assert _sample(http_request_size, method="POST", route="/datasets/upload")["sum"] > 0
+    assert http_in_flight.value("GET", "/datasets/{dataset_id}/stats") == 0
+
+
+def testHttpMetricsCountStreamedResponseBody(client, uploadCsv):
+    """目的: SSEのストリーミングレスポンスも、送信した本文の合計サイズが記録されることを確認する。"""
+    datasetId = uploadCsv()
+    response = client.get(f"/datasets/{datasetId}/analysis/stream")
+    assert response.status_code == 200
+
+    sample = _sample(http_response_size, method="GET", route="/datasets/{dataset_id}/analysis/stream")
+    assert sample["count"] == 1
+    assert sample["sum"] == len(response.content)
+
+
+def testHttpMetricsExcludeBackgroundTasks(client, monkeypatch, uploadCsv):
+    """目的: レスポンス送信後に実行する BackgroundTasks（取り込み後の事前計算）の時間とSQLを、リクエストの計測に含めないことを確認する。"""
+    import app.main as main_mod
+
+    ran = []
+
+    def slowQueries() -> None:
+        with SessionLocal() as session:
+            for _ in range(60):
+                session.execute(text("SELECT 1"))
+        time.sleep(0.3)
+
+    async def slowPrewarm(datasetId: int) -> None:
+        await run_in_threadpool(slowQueries)
+        ran.append(datasetId)
+
+    monkeypatch.setenv("ANALYSIS_PREWARM", "1")
+    monkeypatch.setattr(main_mod, "prewarmDatasetAnalyses", slowPrewarm)
+    datasetId = uploadCsv()
+
+    assert ran == [datasetId]
+    assert _sample(http_request_duration, method="POST", route="/datasets/upload")["sum"] < 0.3
+    assert _sample(http_request_db_queries, method="POST", route="/datasets/upload")["sum"] < 60
+    assert http_in_flight.value("POST", "/datasets/upload") == 0
+
+
+def testMetricsEndpointRendersPrometheusText(client):
+    """目的: GET /metrics が Prometheus のテキスト形式でHTTP/スレッドプールのメトリクスを返すことを確認する。"""
+    assert client.get("/health").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_requests_total{method="GET",route="/health",status="200"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"} 1' in body
+    assert "threadpool_tokens_total " in body
+    assert "# TYPE llm_calls_total counter" in body
+
+
+def testRenderPrometheusFormatsHistogramsAndEscapesLabels():
+    """目的: ヒストグラムが _bucket/_sum/_count で出力され、ラベル値の引用符/改行がエスケープされることを確認する。"""
+    local = MetricsRegistry()
+    histogram = local.histogram("demo_seconds", "Demo latency", ("route",), buckets=(0.5,))
+    histogram.observe(0.25, '/a"b')
+    histogram.observe(2, '/a"b')
+    local.gauge("demo_level", "Demo gauge").set(1.5)
+
+    assert render_prometheus(local).splitlines() == [
+        "# HELP demo_level Demo gauge",
+        "# TYPE demo_level gauge",
+        "demo_level 1.5",
+        "# HELP demo_seconds Demo latency",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{route="/a\\"b",le="0.5"} 1',
+        'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 2',
+        'demo_seconds_sum{route="/a\\"b"} 2.25',
+        'demo_seconds_count{route="/a\\"b"} 2',
+    ]
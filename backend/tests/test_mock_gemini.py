@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.llm import GeminiAiStudioClient, LLMProviderError, LLMRateLimitError
+from benchmarks.load_analysis import percentile
+from benchmarks.mock_gemini import MockConfig, create_app, parse_latency
+
+PAYLOAD = {"contents": [{"role": "user", "parts": [{"text": "stats summary"}]}]}
+
+
+def _mockClient(**overrides) -> TestClient:
+    config = MockConfig(latency="fixed:0", **overrides)
+    return TestClient(create_app(config, seed=1))
+
+
+def testMockGenerateContentIsParsedByGeminiClient():
+    """目的: モックの generateContent 応答を、本番の Gemini クライアントがそのまま解釈できることを確認する。"""
+    client = _mockClient(response_chars=200)
+    resp = client.post("/v1beta/models/gemini-2.0-flash:generateContent?key=dummy", json=PAYLOAD)
+    assert resp.status_code == 200
+
+    GeminiAiStudioClient._raise_for_status(resp)
+    text = GeminiAiStudioClient._parse_response(resp)
+    assert text.startswith("## 注目点")
+    assert len(text) >= 200
+    assert client.get("/mock/stats").json()["requests"] == 1
+
+    assert client.post("/v1beta/models/gemini-2.0-flash:generateContent", json=PAYLOAD).status_code == 403
+
+
+def testMockStreamChunksReassembleToFullText():
+    """目的: streamGenerateContent のSSEチャンクを連結すると、非ストリーミングと同じ本文になることを確認する。"""
+    client = _mockClient(response_chars=300, stream_chunks=5)
+    full = GeminiAiStudioClient._parse_response(
+        client.post("/v1beta/models/m:generateContent?key=dummy", json=PAYLOAD)
+    )
+
+    resp = client.post("/v1beta/models/m:streamGenerateContent?alt=sse&key=dummy", json=PAYLOAD)
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data:"):]) for line in resp.text.splitlines() if line.startswith("data:")]
+    assert len(events) == 5
+    assert "".join(GeminiAiStudioClient._extract_chunk_text(e) for e in events) == full
+    assert client.get("/mock/stats").json()["in_flight"] == 0
+
+
+def testMockInjectedErrorsMapToClassifiedExceptions():
+    """目的: 注入した 429/5xx が、Retry-After 付きの分類例外（レート制限/プロバイダ障害）に対応付くことを確認する。"""
+    client = _mockClient(rate_429=1.0, retry_after_seconds=2.5)
+    resp = client.post("/v1beta/models/m:generateContent?key=dummy", json=PAYLOAD)
+    assert resp.status_code == 429
+    with pytest.raises(LLMRateLimitError) as excInfo:
+        GeminiAiStudioClient._raise_for_status(resp)
+    assert excInfo.value.retry_after == 2.5
+
+    assert client.put("/mock/config", json={"rate_429": 0.0, "rate_5xx": 1.0}).status_code == 200
+    resp = client.post("/v1beta/models/m:generateContent?key=dummy", json=PAYLOAD)
+    assert resp.status_code == 503
+    with pytest.raises(LLMProviderError):
+        GeminiAiStudioClient._raise_for_status(resp)
+    assert client.get("/mock/stats").json()["injected"] == {"429": 1, "5xx": 1}
+
+
+def testMockConfigValidation():
+    """目的: レイテンシ指定の検証と、実行中の設定更新で未知のキー/不正な分布を拒否することを確認する。"""
+    assert parse_latency("lognormal:800,0.5") == ("lognormal", [800.0, 0.5])
+    assert parse_latency("fixed:20") == ("fixed", [20.0])
+    for spec in ("exponential:10", "uniform:10", "fixed:"):
+        with pytest.raises(ValueError):
+            parse_latency(spec)
+
+    client = _mockClient()
+    assert client.put("/mock/config", json={"unknown": 1}).status_code == 400
+    assert client.put("/mock/config", json={"latency": "normal:1"}).status_code == 400
+    assert client.put("/mock/config", json={"latency": "uniform:1,5"}).json()["latency"] == "uniform:1,5"
+
+
+def testLoadTestPercentileUsesNearestRank():
+    """目的: 負荷試験の集計が最近接順位法のパーセンタイルを返すことを確認する。"""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 50) != percentile([], 50)  # nan
@@ -0,0 +1,80 @@
+from sqlalchemy import text
+
+import app.main as main
+from app.llm import LLMConfig
+from app.llm_cache import clear_response_caches
+
+
+def _failIfComputed(*args, **kwargs):
+    raise AssertionError("expected a cache hit")
+
+
+def testPrewarmCachesStatsAndPersistsComparisonJob(client, db, monkeypatch, uploadCsv):
+    """目的: 取り込み後の事前計算で stats がキャッシュされ、前回スナップショットとのv2推移分析ジョブが保存されることを確認する。"""
+    monkeypatch.setenv("ANALYSIS_PREWARM", "1")
+    monkeypatch.setattr(main.computeCache, "ttl_seconds", 60)
+
+    firstId = uploadCsv("Title,UnitPrice\nPython開発,5000\n", "snap1.csv")
+    secondId = uploadCsv("Title,UnitPrice\nPython開発,6000\nGo開発,7000\n", "snap2.csv")
+
+    rows = db.execute(
+        text("SELECT base_dataset_id, target_dataset_id, prompt_version, status FROM analysis_jobs")
+    ).all()
+    assert [tuple(r) for r in rows] == [(firstId, secondId, "v2", "succeeded")]
+
+    # 事前計算済みのため、利用者のリクエストでは再計算しない
+    monkeypatch.setattr(main, "computeDatasetStats", _failIfComputed)
+    monkeypatch.setattr(main, "computeComparison", _failIfComputed)
+    assert client.get(f"/datasets/{secondId}/stats").json()["rows"] == 2
+    assert client.get(f"/datasets/compare?base={firstId}&target={secondId}").status_code == 200
+
+    jobResponse = client.post(f"/datasets/compare/analysis/jobs?base={firstId}&target={secondId}&version=v2")
+    assert jobResponse.json()["status"] == "succeeded"
+
+
+def testPrewarmWarmsLlmResponseCache(client, monkeypatch, uploadCsv, fakeLlm, llmConfig):
+    """目的: LLM有効かつ応答キャッシュ有効時、事前計算したデータセット分析が利用者のリクエストでキャッシュヒットすることを確認する。"""
+    monkeypatch.setenv("ANALYSIS_PREWARM", "1")
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    config = llmConfig(cache_ttl_seconds=60)
+    # エンドポイントは Depends 経由、事前計算は直接呼び出しで設定を参照する
+    main.app.dependency_overrides[main.getLlmConfig] = lambda: config
+    monkeypatch.setattr(main, "getLlmConfig", lambda: config)
+
+    inner = fakeLlm("PREWARMED_ANALYSIS")
+
+    def buildClient(cfg: LLMConfig):
+        from app.llm_cache import CachingLLMClient
+
+        return CachingLLMClient(inner, cfg)
+
+    monkeypatch.setattr(main, "build_llm_client", buildClient)
+    clear_response_caches()
+    try:
+        datasetId = uploadCsv("colA,colB\n1,hello\n2,world\n", "snap.csv")
+        assert inner.calls == 1
+
+        response = client.get(f"/datasets/{datasetId}/analysis")
+        assert response.status_code == 200
+        assert response.json()["analysis_text"] == "PREWARMED_ANALYSIS"
+        assert inner.calls == 1
+    finally:
+        main.app.dependency_overrides.clear()
+        clear_response_caches()
+
+
+def testPrewarmIsDisabledByDefault(client, db, uploadCsv):
+    """目的: ANALYSIS_PREWARM 未設定では、取り込み時に分析ジョブを作らないことを確認する。"""
+    uploadCsv("a\n1\n", "snap1.csv")
+    uploadCsv("a\n2\n", "snap2.csv")
+    assert db.execute(text("SELECT count(*) FROM analysis_jobs")).scalar_one() == 0
+
+
+def testDeleteDatasetEvictsCachedStats(client, monkeypatch, uploadCsv):
+    """目的: キャッシュ有効時でも、削除したデータセットの stats が返らない（404になる）ことを確認する。"""
+    monkeypatch.setattr(main.computeCache, "ttl_seconds", 60)
+    datasetId = uploadCsv("a\n1\n", "snap.csv")
+    assert client.get(f"/datasets/{datasetId}/stats").status_code == 200
+
+    assert client.delete(f"/datasets/{datasetId}").status_code == 204
+    assert client.get(f"/datasets/{datasetId}/stats").status_code == 404
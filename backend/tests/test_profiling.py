@@ -0,0 +1,80 @@
+import re
+import threading
+import time
+
+import pytest
+
+from app.profiling import StackSampler, profile_store
+
+ADMIN_HEADERS = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture(autouse=True)
+def profilingSettings(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin-token")
+    monkeypatch.setenv("PROFILE_SAMPLE_INTERVAL_MS", "1")
+    profile_store.clear()
+    yield
+    profile_store.clear()
+
+
+def busyLoop(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def testStackSamplerProducesCollapsedStacks():
+    """目的: サンプラーが実行中のスレッドのスタックを collapsed 形式（スレッド名;呼び出し元;...;関数 件数）で集計することを確認する。"""
+    worker = threading.Thread(target=busyLoop, args=(0.2,), name="busy-worker")
+    with StackSampler(0.002) as sampler:
+        worker.start()
+        worker.join()
+
+    lines = sampler.collapsed().splitlines()
+    assert sampler.samples > 0
+    assert all(re.fullmatch(r".+ \d+", line) for line in lines)
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy
+    assert "busyLoop (tests/test_profiling.py:" in busy[0]
+
+
+def testProfileQueryRecordsProfileForAdmin(client, uploadCsv):
+    """目的: 管理者が ?profile=1 を付けると通常のレスポンスに X-Profile-Id が付き、一覧と collapsed 形式で取り出せることを確認する。"""
+    datasetId = uploadCsv()
+    response = client.get(f"/datasets/{datasetId}/stats?profile=1", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["dataset_id"] == datasetId
+    profileId = int(response.headers["x-profile-id"])
+
+    [summary] = client.get("/admin/profiles", headers=ADMIN_HEADERS).json()["profiles"]
+    assert summary["id"] == profileId
+    assert summary["path"] == f"/datasets/{datasetId}/stats"
+    assert summary["status"] == 200
+    assert "collapsed" not in summary
+
+    profile = client.get(f"/admin/profiles/{profileId}", headers=ADMIN_HEADERS)
+    assert profile.status_code == 200
+    assert profile.headers["content-type"].startswith("text/plain")
+    assert client.get("/admin/profiles/999999", headers=ADMIN_HEADERS).status_code == 404
+
+
+def testProfileQueryRequiresAdminAndIsSkippedOtherwise(client):
+    """目的: トークン無しの ?profile=1 は 403 になり、?profile=1 の無いリクエストはプロファイルされないことを確認する。"""
+    forbidden = client.get("/health?profile=1")
+    assert forbidden.status_code == 403
+    assert forbidden.json() == {"detail": "Admin token required"}
+
+    plain = client.get("/health", headers=ADMIN_HEADERS)
+    assert plain.status_code == 200
+    assert "x-profile-id" not in plain.headers
+    assert profile_store.summaries() == []
+
+
+@pytest.mark.parametrize("query", ["profile=10", "xprofile=1", "user_profile=1", "profile=true"])
+def testProfileQueryIgnoresNearMissParameters(client, query):
+    """目的: profile=1 ちょうどでないクエリ（値違い・似た名前の別パラメータ）は、管理者でなくても 403 にならずプロファイルもされないことを確認する。"""
+    response = client.get(f"/health?{query}")
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert profile_store.summaries() == []
@@ -1,6 +1,7 @@
 import json
 
 from app.analysis import build_prompt_v1
+from app.llm import estimate_tokens
 
 
 def _extract_stats_summary_json(prompt: str) -> dict:
@@ -68,12 +69,7 @@ def testBuildPromptV1RespectsMaxPromptChars():
     stats = {"rows": 100, "columns": columns}
 
     max_chars = 1600
-    prompt = build_prompt_v1(
-        stats,
-        max_prompt_chars=max_chars,
-        max_columns=30,
-        max_top_values_per_column=3,
-    )
+    prompt = build_prompt_v1(stats, max_prompt_chars=max_chars, max_top_values_per_column=3)
 
     assert len(prompt) <= max_chars
     assert "注意: 入力サイズ上限" in prompt
@@ -81,5 +77,104 @@ def testBuildPromptV1RespectsMaxPromptChars():
     # 省略は入るが、JSON は壊れていないこと
     summary = _extract_stats_summary_json(prompt)
     assert summary["columns_count"] == 50
-    assert summary["included_columns_count"] <= 30
+    assert summary["included_columns_count"] < 50
 
+
+def _wide_stats(columns_count: int, *, value: str = "x" * 40) -> dict:
+    columns = []
+    for i in range(columns_count):
+        columns.append(
+            {
+                "name": f"col_{i:03d}",
+                "kind": "string",
+                "present_count": 100,
+                "non_empty_count": 100 - (i % 100),
+                "numeric": None,
+                "top_values": [
+                    {"value": f"{value}{i}a", "count": 50},
+                    {"value": f"{value}{i}b", "count": 20},
+                    {"value": f"{value}{i}c", "count": 5},
+                ],
+            }
+        )
+    return {"rows": 100, "columns": columns}
+
+
+def testBuildPromptV1RespectsMaxPromptTokens():
+    """目的: 数百列でも推定トークン数が予算内に収まり、省略が明記されること（日本語の値も含む）。"""
+    for value in ("x" * 40, "案件名称" * 10):
+        stats = _wide_stats(300, value=value)
+        prompt = build_prompt_v1(stats, max_prompt_tokens=2000)
+
+        assert estimate_tokens(prompt) <= 2000
+        assert "注意: 入力サイズ上限" in prompt
+        summary = _extract_stats_summary_json(prompt)
+        assert summary["columns_count"] == 300
+        assert 0 < summary["included_columns_count"] < 300
+
+
+def testBuildPromptV1BudgetsAllColumnsWithoutColumnCap():
+    """目的: 予算に余裕があれば上位30列より後の列も含まれ、組み立てたJSONが json.dumps(sort_keys=True) と同じ形であること。"""
+    stats = _wide_stats(80, value="v")
+    prompt = build_prompt_v1(stats, max_prompt_tokens=100_000)
+
+    assert "注意: 入力サイズ上限" not in prompt
+    summary = _extract_stats_summary_json(prompt)
+    assert summary["included_columns_count"] == 80
+    assert json.dumps(summary, ensure_ascii=False, sort_keys=True) in prompt
+
+    # 予算がない場合だけ max_columns で列数を抑える
+    summary = _extract_stats_summary_json(build_prompt_v1(stats, max_columns=30, max_prompt_tokens=0))
+    assert summary["included_columns_count"] == 30
+
+
+def testBuildPromptV1PrefersInformativeColumnsAndTopValues():
+    """目的: 予算が足りない場合、値が埋まった列・数値統計のある列を、疎な列の頻出値より優先すること。"""
+    stats = {
+        "rows": 100,
+        "columns": [
+            {
+                "name": "sparse",
+                "kind": "string",
+                "present_count": 100,
+                "non_empty_count": 5,
+                "numeric": None,
+                "top_values": [{"value": "s" * 200, "count": 5}],
+            },
+            {
+                "name": "price",
+                "kind": "number",
+                "present_count": 100,
+                "non_empty_count": 100,
+                "numeric": {"count": 100, "min": 1.0, "max": 9.0, "avg": 5.0},
+                "top_values": None,
+            },
+            {
+                "name": "title",
+                "kind": "string",
+                "present_count": 100,
+                "non_empty_count": 100,
+                "numeric": None,
+                "top_values": [{"value": "案件A", "count": 60}, {"value": "案件B", "count": 30}],
+            },
+        ],
+    }
+    unlimited = build_prompt_v1(stats)
+    budget = estimate_tokens(unlimited) - 10
+    prompt = build_prompt_v1(stats, max_prompt_tokens=budget)
+
+    assert estimate_tokens(prompt) <= budget
+    summary = _extract_stats_summary_json(prompt)
+    by_name = {c["name"]: c for c in summary["columns"]}
+    assert by_name["price"]["numeric"]["max"] == 9.0
+    assert [t["value"] for t in by_name["title"]["top_values"]] == ["案件A", "案件B"]
+    # 疎な列の長い頻出値が最初に省略される
+    assert by_name.get("sparse", {}).get("top_values") is None
+
+
+def testBuildPromptV1FallsBackWhenInstructionsExceedBudget():
+    """目的: 指示文だけで予算を超える場合は、statsのJSONを省略した指示文のみを返すこと。"""
+    prompt = build_prompt_v1(_wide_stats(3), max_prompt_tokens=50)
+
+    assert "stats_summary_json は省略されました" in prompt
+    assert "stats_summary_json:\n" not in prompt
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from app.db import track_queries
+from app.http_metrics import http_request_db_queries, http_request_db_query_warnings
+from app.metrics import registry
+
+STATS_ROUTE = "/datasets/{dataset_id}/stats"
+
+
+@pytest.fixture(autouse=True)
+def resetMetrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def testTrackQueriesCountsStatementsAndSlowest(db):
+    """目的: ブロック内のSQLの件数・合計時間・最も遅い文が集計され、失敗した文は数えないことを確認する。"""
+    with track_queries() as stats:
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT pg_sleep(0.02)"))
+        with pytest.raises(ProgrammingError):
+            db.execute(text("SELECT * FROM no_such_table"))
+        db.rollback()
+        db.execute(text("SELECT 2"))
+
+    assert stats.count == 3
+    assert stats.slowest_statement == "SELECT pg_sleep(0.02)"
+    assert stats.slowest_seconds >= 0.02
+    assert stats.total_seconds >= stats.slowest_seconds
+
+
+def testStatsResponseHasServerTimingWithQueryCount(client, uploadCsv):
+    """目的: stats のレスポンスに DB時間と件数の Server-Timing ヘッダが付き、件数がルート別に記録されることを確認する。"""
+    datasetId = uploadCsv()
+    registry.reset()
+
+    response = client.get(f"/datasets/{datasetId}/stats")
+    assert response.status_code == 200
+    # ETag用の取り込み日時 + 存在確認 + 行数 + カラム一覧 + カラムごとの要約（2カラム）+ 非数値カラムの頻出値（1カラム）
+    db_entry = response.headers["server-timing"].split(", ")[0]
+    assert db_entry.startswith("db;dur=")
+    assert db_entry.endswith('desc="7 queries"')
+
+    [sample] = [s for s in http_request_db_queries.snapshot() if s["labels"]["route"] == STATS_ROUTE]
+    assert sample["sum"] == 7
+    assert "server-timing" not in client.get("/health").headers
+
+
+def testQueryCountAboveThresholdLogsWarning(client, monkeypatch, caplog, uploadCsv):
+    """目的: SQL件数が DB_QUERY_WARN_THRESHOLD を超えたリクエストで、N+1 の疑いとして警告ログが出ることを確認する。"""
+    datasetId = uploadCsv()
+    monkeypatch.setenv("DB_QUERY_WARN_THRESHOLD", "4")
+
+    with caplog.at_level(logging.INFO, logger="prism.backend.http"):
+        client.get(f"/datasets/{datasetId}/stats")
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert f"GET {STATS_ROUTE} - DB: 7 queries" in warnings[0].getMessage()
+    assert "possible N+1" in warnings[0].getMessage()
+    assert http_request_db_query_warnings.value("GET", STATS_ROUTE) == 1
+
+    caplog.clear()
+    monkeypatch.setenv("DB_QUERY_WARN_THRESHOLD", "50")
+    with caplog.at_level(logging.INFO, logger="prism.backend.http"):
+        client.get(f"/datasets/{datasetId}/stats")
+    assert not [r for r in caplog.records if r.levelno == logging.WARNING]
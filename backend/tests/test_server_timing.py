@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import re
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.main import app, getLlmClient
+from app.timing import span, track_spans
+
+
+def _serverTiming(response) -> dict[str, tuple[float, str | None]]:
+    entries = {}
+    for entry in response.headers["server-timing"].split(", "):
+        match = re.fullmatch(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', entry)
+        assert match is not None, entry
+        entries[match.group(1)] = (float(match.group(2)), match.group(3))
+    return entries
+
+
+def testSpansAggregateByNameAcrossThreadpool():
+    """目的: 同じ名前の区間が合計時間と回数にまとまり、スレッドプールで実行した区間も記録され、リクエスト外では何もしないことを確認する。"""
+
+    @span("work", "Work")
+    def work() -> int:
+        return 1
+
+    assert work() == 1  # track_spans の外では記録先が無いだけ
+
+    async def request() -> None:
+        work()
+        await run_in_threadpool(work)
+        with span("outer"):
+            work()
+
+    with track_spans() as spans:
+        asyncio.run(request())
+
+    items = dict(spans.items())
+    assert list(items) == ["work", "outer"]
+    assert items["work"]["count"] == 3
+    assert items["work"]["desc"] == "Work"
+    assert items["outer"]["seconds"] >= 0
+
+
+def testCompareResponseHasServerTimingBreakdown(client, caplog, uploadCsv):
+    """目的: compare のレスポンスの Server-Timing に DB取得・統計（2回）・価格帯・キーワード分析と合計が並び、内訳がログにも出ることを確認する。"""
+    base = uploadCsv("Title,UnitPrice\nPython 開発,5000円\nJava 保守,12000円\n")
+    target = uploadCsv("Title,UnitPrice\nPython 分析,8000円\nGo 開発,30000円\n")
+
+    with caplog.at_level(logging.INFO, logger="prism.backend.http"):
+        response = client.get(f"/datasets/compare?base={base}&target={target}")
+    assert response.status_code == 200
+
+    timing = _serverTiming(response)
+    assert list(timing) == ["db", "fetch", "stats", "price", "keywords", "total"]
+    assert timing["fetch"][1] == "DB fetch"
+    assert timing["stats"][1] == "Stats x2"
+    assert timing["price"][1] == "Price analysis"
+    assert timing["keywords"][1] == "Keyword analysis"
+    assert timing["total"][0] >= timing["fetch"][0]
+
+    [record] = [r for r in caplog.records if "timings:" in r.getMessage()]
+    assert record.getMessage().startswith("GET /datasets/compare - timings: status=200 total_ms=")
+    assert set(record.timings_ms) == {"total", "db", "fetch", "stats", "price", "keywords"}
+
+
+def testAnalysisResponseTimesPromptAndLlmCall(client, monkeypatch, uploadCsv, fakeLlm):
+    """目的: LLM分析のレスポンスの Server-Timing に統計・プロンプト生成・LLM呼び出しの区間が出ることを確認する。"""
+    monkeypatch.setenv("ANALYSIS_USE_LLM", "1")
+    app.dependency_overrides[getLlmClient] = lambda: fakeLlm("FAKE_LLM_OUTPUT")
+    try:
+        datasetId = uploadCsv()
+        response = client.get(f"/datasets/{datasetId}/analysis")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    timing = _serverTiming(response)
+    assert {"db", "stats", "prompt", "llm", "total"} <= set(timing)
+    assert timing["prompt"][1] == "Prompt build"
+    assert timing["llm"][1] == "LLM call"
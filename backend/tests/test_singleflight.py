@@ -0,0 +1,111 @@
+import asyncio
+
+from sqlalchemy import text
+
+import app.singleflight as singleflight_mod
+from app.llm import LLMProviderError, build_llm_client, prompt_cache_key
+from app.singleflight import SingleFlight, SingleFlightLLMClient, _AdvisoryLock
+
+
+def testSingleFlightSharesResultBetweenConcurrentCalls():
+    """目的: 同じキーの同時呼び出しは計算を1回だけ実行し、結果を共有することを確認する。"""
+    flight = SingleFlight()
+    calls = {"n": 0}
+
+    async def compute():
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+
+    async def main():
+        return await asyncio.gather(*[flight.run(("compare", 1, 2), compute) for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert calls["n"] == 1
+    assert all(r == {"value": 42} for r in results)
+    assert flight.leaders == 1
+    assert flight.followers == 4
+    assert len(flight) == 0
+
+
+def testSingleFlightPropagatesErrorsAndDoesNotCacheThem():
+    """目的: 先行計算の例外は相乗りした全員に伝わり、完了後の呼び出しは再計算されることを確認する。"""
+    flight = SingleFlight()
+    calls = {"n": 0}
+
+    async def failing():
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        raise LLMProviderError("upstream")
+
+    async def main():
+        return await asyncio.gather(*[flight.run("k", failing) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, LLMProviderError) for r in results)
+    assert calls["n"] == 1
+
+    asyncio.run(main())
+    assert calls["n"] == 2
+
+
+def testSingleFlightLlmClientCoalescesIdenticalPrompts(fakeLlm, llmConfig):
+    """目的: 同一プロンプトの同時 agenerate はLLM呼び出し1回にまとまり、別プロンプトはまとまらないことを確認する。"""
+    inner = fakeLlm(lambda prompt: f"out:{prompt}", delay=0.05)
+    client = SingleFlightLLMClient(inner, llmConfig(), flight=SingleFlight())
+
+    async def main():
+        return await asyncio.gather(
+            client.agenerate("same"),
+            client.agenerate("same"),
+            client.agenerate("same"),
+            client.agenerate("other"),
+        )
+
+    results = asyncio.run(main())
+    assert results == ["out:same", "out:same", "out:same", "out:other"]
+    assert inner.calls == 2
+
+
+def testSingleFlightLlmClientCoalescesAcrossWorkersWithAdvisoryLock(db, fakeLlm, llmConfig):
+    """目的: shared モードでは、別ワーカー（別の SingleFlight）同士でもLLM呼び出しが1回になることを確認する。"""
+    inner = fakeLlm(lambda prompt: f"out:{prompt}", delay=0.05)
+    config = llmConfig(single_flight_shared=True, single_flight_poll_seconds=0.01)
+    workerA = SingleFlightLLMClient(inner, config, flight=SingleFlight())
+    workerB = SingleFlightLLMClient(inner, config, flight=SingleFlight())
+
+    async def main():
+        return await asyncio.gather(workerA.agenerate("p"), workerB.agenerate("p"))
+
+    assert asyncio.run(main()) == ["out:p", "out:p"]
+    assert inner.calls == 1
+
+    # 結果は llm_results に受け渡し用として残り、advisory lock は解放されている
+    assert db.execute(text("SELECT count(*) FROM llm_results")).scalar_one() == 1
+    assert db.execute(text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'")).scalar_one() == 0
+
+
+def testSingleFlightSharedCallsWithoutCoordinationWhenLockPoolIsFull(db, monkeypatch, fakeLlm, llmConfig):
+    """目的: ロック用プールを使い切っている間は、通常のプールに手を付けず協調なしでLLMを呼ぶことを確認する。"""
+    monkeypatch.setenv("LLM_SINGLE_FLIGHT_LOCK_POOL_SIZE", "1")
+    monkeypatch.setattr(singleflight_mod, "_lock_engine", None)
+    inner = fakeLlm(lambda prompt: f"out:{prompt}", delay=0.05)
+    config = llmConfig(single_flight_shared=True, single_flight_poll_seconds=0.01)
+    client = SingleFlightLLMClient(inner, config, flight=SingleFlight())
+
+    held = _AdvisoryLock(prompt_cache_key(config, "held"))
+    assert held.try_acquire()
+    try:
+        assert asyncio.run(client.agenerate("p")) == "out:p"
+    finally:
+        held.release()
+        singleflight_mod.lock_engine().dispose()
+    assert inner.calls == 1
+    # 協調していないため、受け渡し用の結果は書き込まれない
+    assert db.execute(text("SELECT count(*) FROM llm_results")).scalar_one() == 0
+
+
+def testBuildLlmClientAddsSingleFlightLayerByDefault(llmConfig):
+    """目的: 既定では single-flight 層が組み込まれ、無効化もできることを確認する。"""
+    assert isinstance(build_llm_client(llmConfig(max_retries=0)), SingleFlightLLMClient)
+    assert not isinstance(build_llm_client(llmConfig(max_retries=0, single_flight=False)), SingleFlightLLMClient)
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app.db import engine
+from app.slow_queries import SlowQueryLog, slow_query_log
+
+ADMIN_HEADERS = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture(autouse=True)
+def slowQuerySettings(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin-token")
+    monkeypatch.setenv("DB_SLOW_QUERY_MS", "10")
+    slow_query_log.clear()
+    yield
+    slow_query_log.clear()
+
+
+def _waitForPlan(client, timeoutSeconds: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeoutSeconds
+    while True:
+        [entry] = client.get("/admin/slow-queries", headers=ADMIN_HEADERS).json()["queries"]
+        if entry["plan_status"] != "pending" or time.monotonic() > deadline:
+            return entry
+        time.sleep(0.05)
+
+
+def testSlowSelectIsRecordedWithExplainAnalyzePlan(client, db):
+    """目的: 閾値を超えたSELECTが SQL・パラメータ・実行時間とともに記録され、EXPLAIN (ANALYZE, BUFFERS) の計画が付くことを確認する。"""
+    db.execute(text("SELECT 1"))
+    db.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": 0.02})
+
+    entry = _waitForPlan(client)
+    assert entry["statement"] == "SELECT pg_sleep(%(seconds)s)"
+    assert entry["parameters"] == {"seconds": 0.02}
+    assert entry["duration_ms"] >= 20
+    assert entry["plan_status"] == "ok"
+    assert "Execution Time" in entry["plan"]
+
+    assert client.delete("/admin/slow-queries", headers=ADMIN_HEADERS).status_code == 204
+    assert client.get("/admin/slow-queries", headers=ADMIN_HEADERS).json()["queries"] == []
+
+
+def testSlowQueryRecorderIsOffByDefault(client, db, monkeypatch):
+    """目的: DB_SLOW_QUERY_MS=0（既定）では遅いSQLも記録されないことを確認する。"""
+    monkeypatch.setenv("DB_SLOW_QUERY_MS", "0")
+    db.execute(text("SELECT pg_sleep(0.02)"))
+
+    body = client.get("/admin/slow-queries", headers=ADMIN_HEADERS).json()
+    assert body["threshold_ms"] == 0
+    assert body["queries"] == []
+
+
+def testSlowQueryEndpointRequiresAdminToken(client, monkeypatch):
+    """目的: トークンが無い/違う場合、および ADMIN_TOKEN 未設定の場合は 403 になることを確認する。"""
+    assert client.get("/admin/slow-queries").status_code == 403
+    assert client.get("/admin/slow-queries", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.delete("/admin/slow-queries").status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "")
+    assert client.get("/admin/slow-queries", headers={"X-Admin-Token": ""}).status_code == 403
+
+
+def testSlowQueryLogKeepsLatestEntriesAndSkipsPlanForWrites(monkeypatch):
+    """目的: リングバッファが直近の件数だけを新しい順に保持し、SELECT以外・executemany は計画を取らないことを確認する。"""
+    monkeypatch.setenv("DB_SLOW_QUERY_EXPLAIN", "0")
+    log = SlowQueryLog(capacity=2)
+    for seconds in (0.011, 0.012, 0.013):
+        log.maybe_record(engine, "SELECT", "SELECT 1", {}, seconds, False)
+    assert log.maybe_record(engine, "SELECT", "SELECT 1", {}, 0.005, False) is None
+    assert [e["duration_ms"] for e in log.entries()] == [13, 12]
+    assert [e["id"] for e in log.entries()] == [3, 2]
+
+    monkeypatch.setenv("DB_SLOW_QUERY_EXPLAIN", "1")
+    entry = log.maybe_record(
+        engine, "INSERT", "INSERT INTO t VALUES (%(v)s)", [{"v": "x" * 500}, {"v": "y"}], 0.05, True
+    )
+    assert entry["plan_status"] == "skipped"
+    assert entry["executemany"] == 2
+    assert entry["parameters"]["v"].endswith("...(500 chars)")
@@ -51,6 +51,9 @@ export type DatasetAnalysis = {
     dataset_id: number;
     generated_at: string;
     analysis_text: string;
+    // LLM障害時にテンプレート分析で代替した場合のみ付与される
+    degraded?: boolean;
+    degraded_reason?: string;
 };
 
 export type DatasetComparisonResponse = {
@@ -114,6 +117,38 @@ export type ComparisonAnalysisResponse = {
     };
     analysis_text: string;
     generated_at: string;
+    // LLM障害時にテンプレート分析で代替した場合のみ付与される
+    degraded?: boolean;
+    degraded_reason?: string;
+};
+
+export type AnalysisJobStatus = "queued" | "running" | "succeeded" | "failed";
+
+export type CreateAnalysisJobResponse = {
+    job_id: string;
+    status: AnalysisJobStatus;
+    status_url: string;
+};
+
+export type AnalysisJob = {
+    job_id: string;
+    kind: string;
+    status: AnalysisJobStatus;
+    params: {
+        base: number;
+        target: number;
+        version: string;
+    };
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+    // status=succeeded の場合のみ
+    result: ComparisonAnalysisResponse | null;
+    // status=failed の場合のみ（同期APIの HTTP ステータスと detail）
+    error: {
+        status: number;
+        detail: unknown;
+    } | null;
 };
 
 export type UploadDatasetOptions = {
@@ -278,6 +313,47 @@ export async function getComparisonAnalysis(baseId: number, targetId: number, op
     return json;
 }
 
+export async function createComparisonAnalysisJob(
+    baseId: number,
+    targetId: number,
+    version: string = "v1",
+    options?: UploadDatasetOptions,
+): Promise<CreateAnalysisJobResponse> {
+    /** 目的: `POST /datasets/compare/analysis/jobs` で推移分析をジョブとして開始し、job_id を得る。 */
+    const apiBaseUrl = getApiBaseUrl(options);
+
+    const response = await fetch(`${apiBaseUrl}/datasets/compare/analysis/jobs?base=${baseId}&target=${targetId}&version=${encodeURIComponent(version)}`, {
+        method: "POST",
+        signal: options?.signal,
+    });
+
+    if (!response.ok) {
+        const detail = await parseErrorDetail(response);
+        throw new Error(detail);
+    }
+
+    const json = (await response.json()) as CreateAnalysisJobResponse;
+    return json;
+}
+
+export async function getAnalysisJob(jobId: string, options?: UploadDatasetOptions): Promise<AnalysisJob> {
+    /** 目的: `GET /analysis-jobs/{job_id}` で分析ジョブの状態と結果を取得する（ポーリング用）。 */
+    const apiBaseUrl = getApiBaseUrl(options);
+
+    const response = await fetch(`${apiBaseUrl}/analysis-jobs/${encodeURIComponent(jobId)}`, {
+        method: "GET",
+        signal: options?.signal,
+    });
+
+    if (!response.ok) {
+        const detail = await parseErrorDetail(response);
+        throw new Error(detail);
+    }
+
+    const json = (await response.json()) as AnalysisJob;
+    return json;
+}
+
 export async function deleteDataset(datasetId: number, options?: UploadDatasetOptions): Promise<void> {
     /** 目的: `DELETE /datasets/{dataset_id}` でデータセットを削除する（E-1-1）。 */
     const apiBaseUrl = getApiBaseUrl(options);